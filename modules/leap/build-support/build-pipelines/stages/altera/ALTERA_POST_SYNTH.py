@@ -2,6 +2,8 @@ import os
 import re
 import sys
 import SCons.Script
+import li_module
+import quartus_partitions
 from model import  *
 
 class PostSynthesize():
@@ -42,23 +44,64 @@ class PostSynthesize():
         newPrjFile.write('set_global_assignment -name SDC_FILE ' + moduleList.topModule.wrapperName() + '.scf\n')
         newPrjFile.close()
 
-        # Concatenate altera QSF files
+        incremental = moduleList.getAWBParamSafe('post_synthesis_tool', 'QUARTUS_INCREMENTAL')
+
+        # Concatenate altera QSF files.  In incremental builds Quartus
+        # gets a copy extended with the design partitions.
+        altera_qsf_name = altera_apm_name + '.qsf'
+        if (incremental):
+            altera_qsf_name = altera_apm_name + '.leap.qsf'
+
         altera_qsf = moduleList.env.Command(
-          altera_apm_name + '.qsf',
+          altera_qsf_name,
           [altera_apm_name + '.temp.qsf'] + Utils.clean_split(moduleList.env['DEFS']['GIVEN_QSFS'], sep = ' '),
           ['cat $SOURCES > $TARGET',
            'rm ' + altera_apm_name + '.temp.qsf'])
 
+        quartus_commands = ['quartus_map --lib_path=`pwd` ' + altera_apm_name,
+                            'quartus_fit ' + altera_apm_name,
+                            'quartus_sta ' + altera_apm_name,
+                            'quartus_asm ' + altera_apm_name]
+
+        # Partition each synthesis boundary, preserving post-fit
+        # netlists of unchanged ones.
+        altera_partition_deps = []
+        if (incremental):
+            hierarchyScript = altera_apm_name + '.hierarchy.tcl'
+            hierarchyFile = altera_apm_name + '.hierarchy'
+            quartus_partitions.writeHierarchyScript(hierarchyScript, altera_apm_name,
+                                                    [os.path.basename(vqm)[:-len('.vqm')] for vqm in vqms
+                                                     if os.path.basename(vqm) != moduleList.topModule.wrapperName() + '.vqm'],
+                                                    hierarchyFile)
+            altera_partition_deps = [hierarchyScript]
+
+            quartus_commands = ['cp ' + altera_qsf_name + ' ' + altera_apm_name + '.qsf',
+                                'quartus_map --analysis_and_elaboration --lib_path=`pwd` ' + altera_apm_name,
+                                'quartus_sh -t ' + hierarchyScript,
+                                quartus_partitions.partitionsClosure(hierarchyFile, altera_apm_name + '.qsf')] + \
+                               quartus_commands
+
+        # Dry runs use stand-ins for the Quartus tools.
+        quartus_env = moduleList.env['ENV']
+        if (moduleList.getAWBParamSafe('post_synthesis_tool', 'QUARTUS_DRY_RUN')):
+            quartus_env = quartus_partitions.stubEnvironment(moduleList.env['ENV'],
+                                                             moduleList.compileDirectory + '/quartus_stubs')
+
         # generate sof
         altera_sof = moduleList.env.Command(altera_apm_name + '.sof',
-                                            altera_vqm + altera_qsf,
-                                            ['quartus_map --lib_path=`pwd` ' + altera_apm_name,
-                                             'quartus_fit ' + altera_apm_name,
-                                             'quartus_sta ' + altera_apm_name,
-                                             'quartus_asm ' + altera_apm_name])
+                                            altera_vqm + altera_qsf + altera_partition_deps,
+                                            quartus_commands,
+                                            ENV = quartus_env)
 
         moduleList.topModule.moduleDependency['BIT'] = [altera_sof]
 
+        # Record the fitted design's resources from the fit summary.
+        altera_resources = moduleList.env.Command(altera_apm_name + '.resources',
+                                                  altera_sof,
+                                                  li_module.resourceReportClosure(moduleList.topModule, 'quartus_fit',
+                                                                                  altera_apm_name + '.fit.summary'))
+        moduleList.topDependency = moduleList.topDependency + [altera_resources]
+
         # generate the download program
         newDownloadFile = open('config/' + moduleList.apmName + '.download.temp', 'w')
         newDownloadFile.write('#!/bin/sh\n')
@@ -0,0 +1,145 @@
+##
+## Quartus design partitions.
+##
+## Each LEAP synthesis boundary reaches Quartus as its own VQM netlist.
+## For incremental compilation every instance of a boundary becomes a
+## design partition whose post-fit netlist is preserved, so Quartus
+## re-fits only partitions whose netlists changed.
+##
+## Partitions are assigned to instance paths, which are known only after
+## Quartus elaborates the design.  The flow is therefore:
+##
+##   1. copy the generated QSF to the project's QSF,
+##   2. quartus_map --analysis_and_elaboration,
+##   3. quartus_sh -t <apm>.hierarchy.tcl, listing the instance paths
+##      of the boundary entities in <apm>.hierarchy,
+##   4. append partition assignments for those paths to the project QSF,
+##   5. the usual quartus_map, quartus_fit, quartus_sta and quartus_asm.
+##
+## The project QSF is written only by the build's actions, never by
+## SCons, so Quartus may update it without triggering rebuilds.
+##
+
+import os
+import re
+
+import SCons.Action
+
+_hierarchyLine = re.compile(r'^(\S+)\s+(.+)$')
+
+
+##
+## writeHierarchyScript --
+##   Write the Quartus Tcl script listing "<entity> <instance path>" for
+##   every instance of the boundary entities in hierarchyFile.
+##
+def writeHierarchyScript(scriptFile, project, boundaries, hierarchyFile):
+    handle = open(scriptFile, 'w')
+    handle.write('load_package project\n')
+    handle.write('set leap_project {' + project + '}\n')
+    handle.write('set leap_boundaries {' + ' '.join(sorted(boundaries)) + '}\n')
+    handle.write('set leap_hierarchy_file {' + hierarchyFile + '}\n')
+    handle.write('project_open $leap_project\n')
+    handle.write('set leap_out [open $leap_hierarchy_file w]\n')
+    handle.write('foreach_in_collection leap_name [get_names -filter * -node_type hierarchy] {\n')
+    handle.write('    set leap_entity [get_name_info -info entity_name $leap_name]\n')
+    handle.write('    if {[lsearch -exact -nocase $leap_boundaries $leap_entity] >= 0} {\n')
+    handle.write('        puts $leap_out "$leap_entity [get_name_info -info full_path $leap_name]"\n')
+    handle.write('    }\n')
+    handle.write('}\n')
+    handle.write('close $leap_out\n')
+    handle.write('project_close\n')
+    handle.close()
+
+##
+## readHierarchy --
+##   (entity, instance path) pairs of a hierarchy file, sorted by path.
+##
+def readHierarchy(hierarchyFile):
+    hierarchy = []
+    for line in open(hierarchyFile, 'r'):
+        match = _hierarchyLine.match(line.strip())
+        if (match):
+            hierarchy.append((match.group(1), match.group(2)))
+    hierarchy.sort(key=lambda (entity, path): path)
+    return hierarchy
+
+##
+## partitionAssignments --
+##   QSF text declaring incremental compilation with a post-fit
+##   partition for each boundary instance.  An entity instantiated more
+##   than once gets numbered partitions.
+##
+def partitionAssignments(hierarchy):
+    lines = ['set_global_assignment -name INCREMENTAL_COMPILATION FULL_INCREMENTAL_COMPILATION',
+             'set_instance_assignment -name PARTITION_HIERARCHY root_partition -to | -section_id Top',
+             'set_global_assignment -name PARTITION_NETLIST_TYPE SOURCE -section_id Top']
+
+    counts = {}
+    for (entity, path) in hierarchy:
+        counts[entity] = counts.get(entity, 0) + 1
+
+    used = {}
+    for (entity, path) in hierarchy:
+        partition = entity
+        if (counts[entity] > 1):
+            used[entity] = used.get(entity, 0) + 1
+            partition = entity + '_' + str(used[entity])
+
+        lines.append('set_instance_assignment -name PARTITION_HIERARCHY ' + partition +
+                     ' -to "' + path + '" -section_id ' + partition)
+        lines.append('set_global_assignment -name PARTITION_NETLIST_TYPE POST_FIT -section_id ' + partition)
+        lines.append('set_global_assignment -name PARTITION_FITTER_PRESERVATION_LEVEL PLACEMENT_AND_ROUTING -section_id ' + partition)
+
+    return '\n'.join(lines) + '\n'
+
+##
+## partitionsClosure --
+##   SCons action appending the partitions of hierarchyFile to the
+##   project QSF.
+##
+def partitionsClosure(hierarchyFile, qsfFile):
+
+    def quartus_partitions(target, source, env):
+        if (not os.path.exists(hierarchyFile)):
+            print "Quartus partitions: no hierarchy in " + hierarchyFile
+            return 1
+
+        hierarchy = readHierarchy(hierarchyFile)
+        handle = open(qsfFile, 'a')
+        handle.write('\n# Design partitions of the LEAP synthesis boundaries\n')
+        handle.write(partitionAssignments(hierarchy))
+        handle.close()
+        print "Quartus partitions: " + str(len(hierarchy)) + " boundary instances"
+
+    return SCons.Action.Action(quartus_partitions, 'quartus partitions: ' + qsfFile)
+
+
+## Quartus tools replaced by stubs in dry runs.
+QUARTUS_TOOLS = ['quartus_map', 'quartus_fit', 'quartus_sta', 'quartus_asm', 'quartus_sh']
+
+##
+## stubEnvironment --
+##   Write stand-ins for the Quartus tools to stubDirectory and return a
+##   copy of the shell environment env finding them first on its PATH.
+##
+def stubEnvironment(env, stubDirectory):
+    # Imported here for the path of the stub implementation.
+    import sys
+    import quartus_stub
+
+    if (not os.path.isdir(stubDirectory)):
+        os.makedirs(stubDirectory)
+
+    stubScript = os.path.abspath(re.sub(r'\.pyc$', '.py', quartus_stub.__file__))
+    for tool in QUARTUS_TOOLS:
+        stubFile = os.path.join(stubDirectory, tool)
+        handle = open(stubFile, 'w')
+        handle.write('#!/bin/sh\n')
+        handle.write('exec ' + sys.executable + ' ' + stubScript + ' ' + tool + ' "$@"\n')
+        handle.close()
+        os.chmod(stubFile, 0755)
+
+    stubEnv = dict(env)
+    stubEnv['PATH'] = os.path.abspath(stubDirectory) + os.pathsep + str(env['PATH'])
+    return stubEnv
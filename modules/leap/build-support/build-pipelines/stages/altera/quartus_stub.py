@@ -0,0 +1,65 @@
+##
+## Stand-in for the Quartus tools in dry runs.
+##
+##   python quartus_stub.py <tool> <arguments>
+##
+## The invocation is appended to quartus_stub.log in the current
+## directory and the tool's main outputs are faked, so that the generated
+## QSF and the partition flow can be exercised without Quartus:
+##
+##   quartus_sh -t <hierarchy script>  lists one instance per boundary
+##                                     entity, as <entity>:leap_<entity>
+##   quartus_fit <project>             writes an empty <project>.fit.summary
+##   quartus_asm <project>             writes an empty <project>.sof
+##
+
+import re
+import sys
+
+_setVariable = re.compile(r'^set (leap_\w+) \{(.*)\}\s*$')
+
+
+def _project(arguments):
+    names = [a for a in arguments if not a.startswith('-')]
+    if (len(names) == 0):
+        return None
+    return names[-1]
+
+def _hierarchy(script):
+    variables = {}
+    for line in open(script, 'r'):
+        match = _setVariable.match(line)
+        if (match):
+            variables[match.group(1)] = match.group(2)
+
+    if (not 'leap_hierarchy_file' in variables):
+        return
+    handle = open(variables['leap_hierarchy_file'], 'w')
+    for entity in variables.get('leap_boundaries', '').split():
+        handle.write(entity + ' ' + entity + ':leap_' + entity + '\n')
+    handle.close()
+
+def main(argv):
+    tool = argv[0]
+    arguments = argv[1:]
+
+    log = open('quartus_stub.log', 'a')
+    log.write(' '.join([tool] + arguments) + '\n')
+    log.close()
+
+    project = _project(arguments)
+    if (tool == 'quartus_sh' and '-t' in arguments):
+        _hierarchy(arguments[arguments.index('-t') + 1])
+    elif (tool == 'quartus_fit' and project is not None):
+        summary = open(project + '.fit.summary', 'w')
+        summary.write('Fitter Status : Successful (dry run)\n')
+        summary.write('Total registers : 0\n')
+        summary.close()
+    elif (tool == 'quartus_asm' and project is not None):
+        open(project + '.sof', 'w').close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
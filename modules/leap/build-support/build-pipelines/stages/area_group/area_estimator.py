@@ -0,0 +1,250 @@
+##
+## Early area estimation.
+##
+## Area groups are sized from the .resources files written by synthesis.
+## The estimator supplies provisional resource counts for modules that
+## have not been synthesized yet, so that floorplanning need not wait
+## for synthesis.  Estimates come from cheap features of the Verilog
+## that Bluespec generates for a synthesis boundary:
+##
+##   LINES           non-blank lines
+##   REG_BITS        bits of reg declarations
+##   MEM_BITS        bits of reg arrays (inferred memories)
+##   BRAM_INSTANCES  instances of BRAM and RegFile primitives
+##   RULES           scheduled rules (distinct WILL_FIRE_RL_ signals)
+##
+## A linear model per resource type is fit by ridge regression over the
+## modules whose real resource counts are known.  The training samples
+## persist across builds in a small database, holding the MAX_SAMPLES
+## most recently changed.
+##
+
+import os
+import re
+import time
+import cPickle as pickle
+
+FEATURES = ['LINES', 'REG_BITS', 'MEM_BITS', 'BRAM_INSTANCES', 'RULES']
+
+## Resource types estimated.  Area groups need LUT and SLICE.
+RESOURCES = ['LUT', 'SLICE', 'BRAM', 'Reg']
+
+## Fewer samples than this and the estimator falls back to scaling the
+## mean resources per line.
+MIN_REGRESSION_SAMPLES = 2 * (len(FEATURES) + 1)
+
+## Samples kept in the database.  Modules renamed or removed from the
+## model are eventually dropped.
+MAX_SAMPLES = 256
+
+_regDecl = re.compile(r'^\s*reg\s*(?:signed\s*)?(?:\[\s*(\d+)\s*:\s*(\d+)\s*\])?\s*[\w$]+\s*(?:\[\s*(\d+)\s*:\s*(\d+)\s*\])?\s*;')
+_bramInst = re.compile(r'^\s*(?:BRAM\w*|RegFile\w*)\s*(?:#|\w)')
+_willFire = re.compile(r'\bWILL_FIRE_RL_(\w+)')
+
+
+##
+## verilogFeatures --
+##   Features of a set of Verilog files, or None if none of them exist.
+##
+def verilogFeatures(verilogPaths):
+    features = dict([(feature, 0) for feature in FEATURES])
+    rules = set()
+    found = False
+
+    for path in verilogPaths:
+        if (not os.path.exists(path)):
+            continue
+        found = True
+
+        for line in open(path, 'r'):
+            if (line.strip() == ''):
+                continue
+            features['LINES'] += 1
+
+            match = _regDecl.match(line)
+            if (match):
+                width = 1
+                if (match.group(1) is not None):
+                    width = abs(int(match.group(1)) - int(match.group(2))) + 1
+                if (match.group(3) is not None):
+                    depth = abs(int(match.group(3)) - int(match.group(4))) + 1
+                    features['MEM_BITS'] += width * depth
+                else:
+                    features['REG_BITS'] += width
+            elif (_bramInst.match(line)):
+                features['BRAM_INSTANCES'] += 1
+
+            for rule in _willFire.findall(line):
+                rules.add(rule)
+
+    if (not found):
+        return None
+
+    features['RULES'] = len(rules)
+    return features
+
+
+class AreaEstimator():
+
+    def __init__(self, dbPath, debug=False):
+        self.dbPath = dbPath
+        self.debug = debug
+        # Module name -> (features, resources) of its latest synthesis.
+        self.samples = {}
+        # Module name -> time its sample last changed.
+        self.changed = {}
+        self.models = None
+        # Set when samples differ from the database.
+        self.dirty = False
+
+        if (os.path.exists(dbPath)):
+            try:
+                handle = open(dbPath, 'rb')
+                (self.samples, self.changed) = pickle.load(handle)
+                handle.close()
+            except Exception:
+                print "Area estimator: ignoring unreadable database " + dbPath
+                self.samples = {}
+                self.changed = {}
+
+    ##
+    ## record --
+    ##   Add a training sample: the features of a module and the resources
+    ##   synthesis reported for it.
+    ##
+    def record(self, name, features, resources):
+        sample = (features, dict([(r, float(resources[r])) for r in RESOURCES if r in resources]))
+        if (self.samples.get(name) != sample):
+            self.samples[name] = sample
+            self.changed[name] = time.time()
+            self.models = None
+            self.dirty = True
+
+    ##
+    ## store --
+    ##   Write the samples back to the database if record() changed any,
+    ##   dropping the least recently changed beyond MAX_SAMPLES.
+    ##
+    def store(self):
+        if (not self.dirty):
+            return
+
+        if (len(self.samples) > MAX_SAMPLES):
+            names = sorted(self.samples.keys(), key=lambda n: self.changed.get(n, 0), reverse=True)
+            for name in names[MAX_SAMPLES:]:
+                del self.samples[name]
+                self.changed.pop(name, None)
+            self.models = None
+
+        directory = os.path.dirname(self.dbPath)
+        if (directory != '' and not os.path.isdir(directory)):
+            os.makedirs(directory)
+
+        tmpPath = self.dbPath + '.' + str(os.getpid())
+        handle = open(tmpPath, 'wb')
+        pickle.dump((self.samples, self.changed), handle, protocol=-1)
+        handle.close()
+        os.rename(tmpPath, self.dbPath)
+        self.dirty = False
+
+    ##
+    ## estimate --
+    ##   Provisional resources for a module with the given features, or
+    ##   None without training data.  A module synthesized before starts
+    ##   from its last real resources, adjusted by the model's view of
+    ##   how much its features changed.
+    ##
+    def estimate(self, name, features):
+        if (len(self.samples) == 0):
+            return None
+
+        if (self.models is None):
+            self.models = self._fit()
+
+        estimate = {}
+        for resource in RESOURCES:
+            if (not resource in self.models):
+                continue
+            value = self._predict(self.models[resource], features)
+            if (name in self.samples):
+                (oldFeatures, oldResources) = self.samples[name]
+                if (resource in oldResources):
+                    value = oldResources[resource] + value - self._predict(self.models[resource], oldFeatures)
+            estimate[resource] = max(value, 0.0)
+
+        if (self.debug):
+            print "Area estimator: " + name + " " + str(features) + " -> " + str(estimate)
+
+        return estimate
+
+    def _vector(self, features):
+        return [1.0] + [float(features[feature]) for feature in FEATURES]
+
+    def _predict(self, weights, features):
+        return sum([w * x for (w, x) in zip(weights, self._vector(features))])
+
+    ##
+    ## _fit --
+    ##   Ridge regression of each resource type on the features.  The
+    ##   penalty is relative to each feature's scale and spares the
+    ##   intercept.  Too few samples and resources are simply
+    ##   proportional to the line count.
+    ##
+    def _fit(self):
+        models = {}
+        for resource in RESOURCES:
+            rows = []
+            targets = []
+            for (features, resources) in self.samples.values():
+                if (resource in resources):
+                    rows.append(self._vector(features))
+                    targets.append(resources[resource])
+
+            if (len(rows) == 0):
+                continue
+
+            size = len(rows[0])
+            if (len(rows) < MIN_REGRESSION_SAMPLES):
+                lines = sum([row[1] for row in rows])
+                weights = [0.0] * size
+                if (lines > 0):
+                    weights[1] = sum(targets) / lines
+                else:
+                    weights[0] = sum(targets) / len(targets)
+                models[resource] = weights
+                continue
+
+            # Normal equations: (X'X + lambda D) w = X'y
+            xtx = [[sum([row[i] * row[j] for row in rows]) for j in range(size)] for i in range(size)]
+            xty = [sum([row[i] * y for (row, y) in zip(rows, targets)]) for i in range(size)]
+            for i in range(1, size):
+                xtx[i][i] += 0.01 * xtx[i][i] + 1e-6
+
+            models[resource] = _solve(xtx, xty)
+
+        return models
+
+
+##
+## _solve --
+##   Gaussian elimination with partial pivoting on a small dense system.
+##
+def _solve(matrix, vector):
+    size = len(vector)
+    a = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda row: abs(a[row][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        if (abs(a[col][col]) < 1e-12):
+            continue
+        for row in range(col + 1, size):
+            factor = a[row][col] / a[col][col]
+            for k in range(col, size + 1):
+                a[row][k] -= factor * a[col][k]
+
+    weights = [0.0] * size
+    for row in reversed(range(size)):
+        if (abs(a[row][row]) < 1e-12):
+            continue
+        weights[row] = (a[row][size] - sum([a[row][k] * weights[k] for k in range(row + 1, size)])) / a[row][row]
+    return weights
@@ -8,10 +8,17 @@ import os
 import copy
 import traceback
 import functools
+import random
+import time
+import multiprocessing
 import bsv_tool
 import re
 
 import tsp
+import floorplace
+import placement_cache
+import area_estimator
+import channel_timing
 import area_group_parser 
 from area_group_parser import AreaGroup, AreaGroupSize, AreaGroupResource, AreaGroupLocation, AreaGroupLowerLeft, AreaGroupUpperRight, AreaGroupAttribute, AreaGroupPath, AreaGroupRelationship
 import model 
@@ -24,7 +31,7 @@ import wrapper_gen_tool
 try:
     import physical_platform_utils
 except ImportError:
-    pass
+    physical_platform_utils = None
 
 def _areaConstraintsFileElaborated(moduleList):
     return moduleList.compileDirectory + '/areagroups.elaborated.pickle'
@@ -35,6 +42,56 @@ def _areaConstraintsFilePlaced(moduleList):
 def _areaConstraintsFile(moduleList):
     return moduleList.compileDirectory + '/areagroups.pickle'
 
+def _areaConstraintsStrategyFile(moduleList):
+    return moduleList.compileDirectory + '/areagroups.strategy'
+
+def _areaConstraintsReportFile(moduleList):
+    return moduleList.compileDirectory + '/areagroups.report'
+
+def _placementCacheDirectory(moduleList):
+    cacheDir = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACEMENT_CACHE_DIR')
+    if (cacheDir == ''):
+        cacheDir = moduleList.compileDirectory + '/placement_cache'
+    return cacheDir
+
+def _areaConstraintsFileProblem(moduleList):
+    return moduleList.compileDirectory + '/areagroups.problem.pickle'
+
+def _areaConstraintsFragment(moduleList, areaGroupName):
+    return moduleList.compileDirectory + '/areagroups/' + areaGroupName + '.agrp'
+
+def _areaConstraintsTimingFile(moduleList):
+    return moduleList.compileDirectory + '/areagroups.timing'
+
+def _channelBufferFeedbackFile(moduleList):
+    return moduleList.compileDirectory + '/areagroups.buffers.pickle'
+
+def _areaConstraintsParseCache(moduleList):
+    return moduleList.compileDirectory + '/areagroups.parse_cache'
+
+def _areaEstimatorDatabase(moduleList):
+    return _placementCacheDirectory(moduleList) + '/area_estimator.db'
+
+##
+## Placement strategies run in forked worker processes.  Bound methods
+## can't be pickled, so the workers find the Floorplanner and the
+## candidate inputs in these globals, inherited across the fork.
+##
+_portfolioFloorplanner = None
+_portfolioInputs = None
+
+def _runPlacementStrategy(strategy):
+    try:
+        return (strategy, _portfolioFloorplanner.runStrategy(strategy, _portfolioInputs))
+    except ImportError, e:
+        # The ILP strategies need python-glpk.
+        print "Area group placement strategy " + strategy[0] + " unavailable: " + str(e)
+        return (strategy, None)
+    except:
+        print "Area group placement strategy " + strategy[0] + " failed:"
+        traceback.print_exc()
+        return (strategy, None)
+
 
 ###########################################################################
 ##
@@ -59,6 +116,10 @@ class AreaConstraints():
             (moduleList.getAWBParam('area_group_tool',
                                     'AREA_GROUPS_CHANNEL_BUFFERING_ENABLE') != 0)
 
+        self.enableTimingFeedback = \
+            (moduleList.getAWBParam('area_group_tool',
+                                    'AREA_GROUPS_CHANNEL_TIMING_FEEDBACK') != 0)
+
         self.constraints = None
 
 
@@ -90,10 +151,8 @@ class AreaConstraints():
         pickle_handle.close()
 
     def _loadAreaConstraintsFromFile(self, filename):
-        # We got a valid LI graph from the first pass.
-        pickle_handle = open(filename, 'rb')
-        self.constraints = pickle.load(pickle_handle)
-        pickle_handle.close()
+        # Shared with the other stages loading the same area groups.
+        self.constraints = area_group_parser.loadAreaGroupConstraints(filename)
 
     def areaConstraintsFileElaborated(self):
         return _areaConstraintsFileElaborated(self.moduleList)
@@ -104,6 +163,89 @@ class AreaConstraints():
     def areaConstraintsFile(self):
         return _areaConstraintsFile(self.moduleList)
 
+    ##
+    ## areaGroupFragments --
+    ##   Per area group fragments of areaConstraintsFile(): everything the
+    ##   constraint emitters read about one group, in a stable text form.
+    ##   Fragments are rewritten only when they change, so that tools
+    ##   depending on the fragments of their own groups aren't rebuilt
+    ##   when some other group moves.  Returns a list of fragment files,
+    ##   or None if the area groups aren't known yet.
+    ##
+    def areaGroupFragments(self):
+        moduleDependency = self.moduleList.topModule.moduleDependency
+        if ('AREA_GROUP_FRAGMENTS' in moduleDependency):
+            return moduleDependency['AREA_GROUP_FRAGMENTS']
+
+        # The elaborated groups are known at configuration time.  Placed
+        # area groups have the same names.
+        if (not os.path.exists(self.areaConstraintsFileElaborated())):
+            return None
+
+        pickle_handle = open(self.areaConstraintsFileElaborated(), 'rb')
+        areaGroupNames = sorted(pickle.load(pickle_handle).keys())
+        pickle_handle.close()
+
+        fragments = [_areaConstraintsFragment(self.moduleList, name) for name in areaGroupNames]
+
+        # SCons signs the action by the values it closes over, so it
+        # holds only the group names.  Fragments are the targets, in
+        # the same order.
+        def area_group_fragments(target, source, env):
+            constraints = area_group_parser.loadAreaGroupConstraints(str(source[0]))
+            for (name, fragment) in zip(areaGroupNames, target):
+                if (name in constraints):
+                    text = areaGroupFragmentText(constraints[name])
+                else:
+                    text = '# Area group ' + name + ' was not placed.\n'
+                bsv_tool.writeIfChanged(str(fragment), text)
+
+        self.moduleList.env.Command(
+            fragments,
+            [self.areaConstraintsFile()],
+            area_group_fragments
+            )
+
+        moduleDependency['AREA_GROUP_FRAGMENTS'] = fragments
+        return fragments
+
+    ##
+    ## areaGroupDependencies --
+    ##   Files a tool emitting constraints for the named area groups (all
+    ##   groups if None) should depend on: the groups' fragments or, when
+    ##   fragments aren't available, the whole areaConstraintsFile().
+    ##   Names that aren't area groups have no constraints to depend on.
+    ##
+    def areaGroupDependencies(self, areaGroupNames=None):
+        fragments = self.areaGroupFragments()
+        if (fragments is None):
+            return [self.areaConstraintsFile()]
+
+        if (areaGroupNames is None):
+            return fragments
+
+        wanted = [_areaConstraintsFragment(self.moduleList, name) for name in areaGroupNames]
+        return [fragment for fragment in fragments if fragment in wanted]
+
+    ##
+    ## channelTimingFile --
+    ##   Post-route report of the timing paths between area groups, read
+    ##   by the next build to tune channel buffering.  None when timing
+    ##   feedback is disabled.
+    ##
+    def channelTimingFile(self):
+        if (not self.enableBufferInsertion or not self.enableTimingFeedback):
+            return None
+        return _areaConstraintsTimingFile(self.moduleList)
+
+    ##
+    ## channelTimingSlack --
+    ##   Paths with at least this much slack (ns) are left out of the
+    ##   channel timing report.  Their channels may lose a buffer.
+    ##
+    def channelTimingSlack(self):
+        return self.moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_CHANNEL_AMPLE_SLACK_PS') / 1000.0
+
     ##
     ## numLIChannelBufs --
     ##   Compute the number of I/O buffers required for a path between two
@@ -115,7 +257,13 @@ class AreaConstraints():
 
         dist = self._distance(agOut, agIn)
         freq = self.moduleList.getAWBParam('clocks_device', 'MODEL_CLOCK_FREQ')
-        return physical_platform_utils.numBuffersForDistance(dist, freq)
+        bufs = physical_platform_utils.numBuffersForDistance(dist, freq)
+
+        # Correction from the timing of the previous build.
+        if (self.enableTimingFeedback):
+            bufs = max(bufs + channel_timing.bufferDelta(agOut, agIn), 0)
+
+        return bufs
 
     ##
     ## _distance --
@@ -135,7 +283,7 @@ class AreaConstraints():
     # backends here.
     def emitConstraintsXilinx(self, fileName):
         constraintsFile = open(fileName, 'w')
-        for areaGroupName in self.constraints:
+        for areaGroupName in sorted(self.constraints):
             areaGroupObject = self.constraints[areaGroupName]
 
             # if area group was tagged as None, do not emit an area group
@@ -168,12 +316,18 @@ class AreaConstraints():
 
     def emitConstraintsVivado(self, fileName):
         constraintsFile = open(fileName, 'w')
-        for areaGroupName in self.constraints:
+        for areaGroupName in sorted(self.constraints):
             self.emitModuleConstraintsVivado(constraintsFile, areaGroupName)
 
         constraintsFile.close()
 
-    def emitModuleConstraintsVivado(self, constraintsFile, areaGroupName, useSourcePath=True):
+    ##
+    ## emitModuleConstraintsVivado --
+    ##   Write the pblock of one area group.  Without annotateArea the
+    ##   text depends only on the pblock, so checkpoints placed from it
+    ##   need not be rebuilt when only the group's estimated area moves.
+    ##
+    def emitModuleConstraintsVivado(self, constraintsFile, areaGroupName, useSourcePath=True, annotateArea=True):
 
         if(not areaGroupName in self.constraints):
             "CONSTRAINTS: did not find " + areaGroupName
@@ -199,7 +353,10 @@ class AreaConstraints():
         #add_cells_to_pblock pblock_ddr3 [get_cells -hier -filter {NAME =~ m_sys_sys_vp_m_mod/llpi_phys_plat_sdram_b_ddrSynth/*}]
         #endgroup
 
-        constraintsFile.write('#Generated Area Group for ' + areaGroupObject.name + ' with area ' + str(areaGroupObject.area) + ' \n')
+        if(annotateArea):
+            constraintsFile.write('#Generated Area Group for ' + areaGroupObject.name + ' with area ' + str(areaGroupObject.area) + ' \n')
+        else:
+            constraintsFile.write('#Generated Area Group for ' + areaGroupObject.name + ' \n')
         constraintsFile.write('startgroup \n')
         constraintsFile.write('create_pblock AG_' + areaGroupObject.name + '\n')
 
@@ -253,6 +410,36 @@ class AreaConstraints():
 
 
 
+##
+## areaGroupSourcePaths --
+##   Map from the instance path of each area group having one to the
+##   group's name, for the area groups stored in constraintsFile.
+##
+def areaGroupSourcePaths(constraintsFile):
+    constraints = area_group_parser.loadAreaGroupConstraints(constraintsFile)
+    sourcePaths = {}
+    for name in constraints:
+        if (not constraints[name].sourcePath is None):
+            sourcePaths[constraints[name].sourcePath] = name
+    return sourcePaths
+
+
+##
+## areaGroupFragmentText --
+##   Stable text of the fields of a placed area group that determine its
+##   constraints.
+##
+def areaGroupFragmentText(areaGroupObject):
+    lines = ['areagroup ' + areaGroupObject.name,
+             'path ' + repr(areaGroupObject.sourcePath),
+             'area ' + repr(areaGroupObject.area),
+             'location ' + repr((areaGroupObject.xLoc, areaGroupObject.yLoc)),
+             'dimension ' + repr((areaGroupObject.xDimension, areaGroupObject.yDimension))]
+    for key in sorted(areaGroupObject.attributes):
+        lines.append('attribute ' + repr(key) + ' = ' + repr(areaGroupObject.attributes[key]))
+    return '\n'.join(lines) + '\n'
+
+
 ###########################################################################
 ##
 ## Class Floorplanner:
@@ -264,7 +451,18 @@ class AreaConstraints():
 
 class Floorplanner():
 
-    def __init__(self, moduleList):
+    ##
+    ## A Floorplanner built without a moduleList belongs to no build.
+    ## Offline tools, such as floorplan_benchmark, use it to run placement
+    ## strategies on recorded or synthetic problems.  It takes default
+    ## settings and must be given the chip dimensions and the traffic
+    ## between groups (see detachedFloorplanner).
+    ##
+    def __init__(self, moduleList=None):
+        if (moduleList is None):
+            self.detachedDefaults()
+            return
+
         self.pipeline_debug = model.getBuildPipelineDebug(moduleList)
         # if we have a deps build, don't do anything...
         if(moduleList.isDependsBuild):           
@@ -287,6 +485,24 @@ class Floorplanner():
 
         self.clusteringWeight = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_CLUSTERING_WEIGHT')
 
+        self.placer = str(moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACER')).upper()
+        if (not self.placer in ['ILP', 'ANALYTIC']):
+            print "Unknown AREA_GROUPS_PLACER " + self.placer + ", must be ILP or ANALYTIC"
+            exit(1)
+
+        self.placerJobs = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACER_JOBS')
+        if (self.placerJobs <= 0):
+            self.placerJobs = multiprocessing.cpu_count()
+
+        self.placerTimeBudget = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACER_TIME_BUDGET')
+        self.placerRandomOrders = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACER_RANDOM_ORDERS')
+
+        self.sortStarts = moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_SORT_STARTS')
+
+        self.placementCache = placement_cache.PlacementCache(_placementCacheDirectory(moduleList),
+                                                             moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_PLACEMENT_CACHE_SIZE'),
+                                                             debug=self.pipeline_debug)
+
 
         liGraph = LIGraph([])
         firstPassGraph = wrapper_gen_tool.getFirstPassLIGraph()
@@ -297,6 +513,27 @@ class Floorplanner():
 
         self.firstPassLIGraph = liGraph
 
+        self.bitwidthWeighting = (moduleList.getAWBParam('area_group_tool',
+                                                         'AREA_GROUPS_BITWIDTH_WEIGHTING') != 0)
+        self.computeChannelTraffic()
+
+        # Used to report channel distances and buffering.
+        self.areaConstraints = AreaConstraints(moduleList)
+
+        self.estimateArea = (moduleList.getAWBParam('area_group_tool',
+                                                    'AREA_GROUPS_ESTIMATE_AREA') != 0)
+        self.estimatedGroups = []
+
+        # Tune channel buffering from the timing of the previous build.
+        self.channelBufferFeedback = None
+        if (self.areaConstraints.channelTimingFile() is not None):
+            self.channelBufferFeedback = \
+                channel_timing.ChannelBufferFeedback(_channelBufferFeedbackFile(moduleList),
+                                                     moduleList.getAWBParam('area_group_tool', 'AREA_GROUPS_CHANNEL_MAX_EXTRA_BUFFERS'),
+                                                     debug=self.pipeline_debug)
+            self.channelBufferFeedback.update(self.areaConstraints.channelTimingFile(),
+                                              self.pairTraffic.keys())
+
 
         # elaborate area group representation. This may be used in configuring later stages. 
         areaGroups = self.elaborateAreaConstraints(moduleList)
@@ -304,6 +541,14 @@ class Floorplanner():
         pickle.dump(areaGroups, pickle_handle, protocol=-1)
         pickle_handle.close()                 
 
+        # The rest of the placement problem, so that the elaborated area
+        # groups can be replayed by floorplan_benchmark.
+        pickle_handle = open(_areaConstraintsFileProblem(moduleList), 'wb')
+        pickle.dump({'chip': (self.chipXDimension, self.chipYDimension),
+                     'pairTraffic': self.pairTraffic},
+                    pickle_handle, protocol=-1)
+        pickle_handle.close()
+
 
         # if we are only building logs, then we can stop. 
         if (moduleList.getAWBParam('bsv_tool', 'BUILD_LOGS_ONLY')):
@@ -314,40 +559,23 @@ class Floorplanner():
 
              def area_group(target, source, env):
 
-                 # have we built these area groups before? If we have,
-                 # then, we'll get a pickle which we can read in and
-                 # operate on.
-                 areaGroupsPrevious = None 
-                 if(os.path.exists(_areaConstraintsFile(moduleList))):
-                     # We got some previous area groups.  We'll try to
-                     # reuse the solution to save on compile time.
-                     pickle_handle = open(_areaConstraintsFile(moduleList), 'rb')
-                     areaGroupsPrevious = pickle.load(pickle_handle)
-                     pickle_handle.close()
-                 
-                 areaGroupsFinal = None
-                 # If we got a previous area group, we'll attempt to
-                 # reuse its knowledge
-                 if(not areaGroupsPrevious is None):
-                     areaGroupsModified = copy.deepcopy(areaGroups)
-                     # if the area didn't change much (within say a
-                     # few percent, we will reuse previous placement
-                     # information
-                     allowableAreaDelta = 1.01
-                     for groupName in areaGroupsPrevious:
-                         if(groupName in areaGroupsModified):
-                             previousGroupObject = areaGroupsPrevious[groupName]
-                             modifiedGroupObject = areaGroupsModified[groupName]
-                             if((modifiedGroupObject.area > previousGroupObject.area/allowableAreaDelta) and (modifiedGroupObject.area < previousGroupObject.area*allowableAreaDelta)):
-                                 modifiedGroupObject.xDimension = previousGroupObject.xDimension
-                                 modifiedGroupObject.yDimension = previousGroupObject.yDimension
-
-                     areaGroupsFinal = self.solveILPPartial(areaGroupsModified, fileprefix="partial_ilp_reuse_")
-
-                 # Either we didn't have the previous information, or
-                 # we failed to use it.
-                 if(areaGroupsFinal is None):        
-                     areaGroupsFinal = self.solveILPPartial(areaGroups)
+                 # Have we solved this exact placement problem before,
+                 # perhaps for another variant of the design?
+                 fingerprint = self.placementCache.fingerprint(areaGroups,
+                                                               self.chipXDimension,
+                                                               self.chipYDimension,
+                                                               self.communicationWeight)
+                 areaGroupsFinal = self.placementCache.lookup(fingerprint, areaGroups,
+                                                              self.chipXDimension,
+                                                              self.chipYDimension)
+                 if(not areaGroupsFinal is None):
+                     print "Area group placement: reusing cached placement " + fingerprint
+                 else:
+                     areaGroupsFinal = self.solveWithHistory(moduleList, areaGroups)
+                     if(not areaGroupsFinal is None):
+                         self.placementCache.store(fingerprint, areaGroupsFinal,
+                                                   self.chipXDimension, self.chipYDimension,
+                                                   self.placementWinner)
 
                  # We failed to assign area groups.  Eventually, we
                  # could demote this to a warning.
@@ -355,10 +583,15 @@ class Floorplanner():
                      print "Failed to obtain area groups"
                      exit(1)
 
+                 self.writePlacementReport(areaGroupsFinal, _areaConstraintsReportFile(moduleList))
+
                  # Sort area groups topologically, annotating each area group
                  # with a sortIdx field.
                  self.sort_area_groups(areaGroupsFinal)
 
+                 if (self.channelBufferFeedback is not None):
+                     self.channelBufferFeedback.annotate(areaGroupsFinal)
+
                  # Now that we've solved (to some extent) the area
                  # group mapping problem we can dump the results for 
                  # the build tree. 
@@ -375,6 +608,17 @@ class Floorplanner():
         # We need to get the resources for all modules, except the top module, which can change. 
         resources = [dep for dep in moduleList.getAllDependencies('RESOURCES')]
 
+        # With area estimates, placement needn't wait for synthesis.  It
+        # depends instead on the areas elaborated here and so is redone
+        # once a later build sees the real resources.
+        if (self.estimateArea):
+            areaSummary = [(name, areaGroups[name].area) for name in sorted(areaGroups)]
+            resources = [moduleList.env.Value(repr(areaSummary))]
+
+        # Buffer corrections are annotated on the placed area groups.
+        if (self.channelBufferFeedback is not None):
+            resources += [moduleList.env.Value(repr(sorted(self.channelBufferFeedback.deltas().items())))]
+
         areagroup = moduleList.env.Command( 
             [_areaConstraintsFilePlaced(moduleList)],
             resources + map(modify_path_hw, moduleList.getAllDependenciesWithPaths('GIVEN_AREA_CONSTRAINTS')),
@@ -382,6 +626,147 @@ class Floorplanner():
             )                   
 
 
+    ##
+    ## detachedDefaults --
+    ##   Settings of a Floorplanner outside of any build.
+    ##
+    def detachedDefaults(self):
+        self.pipeline_debug = False
+        self.emitPlatformAreaGroups = False
+        self.enableParentClustering = True
+        self.enableCommunicationClustering = True
+        self.clusteringWeight = 0
+        self.placer = 'ILP'
+        self.placerJobs = 1
+        self.placerTimeBudget = 0
+        self.placerRandomOrders = 0
+        self.sortStarts = 1
+        self.placementWinner = None
+
+        self.firstPassLIGraph = LIGraph([])
+        self.bitwidthWeighting = True
+        self.liChannels = []
+        self.pairTraffic = {}
+
+        self.chipXDimension = 0
+        self.chipYDimension = 0
+
+    ##
+    ## solveWithHistory --
+    ##   Place area groups, seeding the placement strategies with the
+    ##   most similar cached placement or, failing that, with the
+    ##   previous build's area groups.
+    ##
+    def solveWithHistory(self, moduleList, areaGroups):
+        # have we built similar area groups before? If we have,
+        # then, we'll get a pickle which we can read in and
+        # operate on.
+        areaGroupsPrevious = self.placementCache.nearest(areaGroups,
+                                                         self.chipXDimension,
+                                                         self.chipYDimension)
+        if(areaGroupsPrevious is None and os.path.exists(_areaConstraintsFile(moduleList))):
+            # We got some previous area groups.  We'll try to
+            # reuse the solution to save on compile time.
+            pickle_handle = open(_areaConstraintsFile(moduleList), 'rb')
+            areaGroupsPrevious = pickle.load(pickle_handle)
+            pickle_handle.close()
+
+        # Candidate inputs for the placement strategies.
+        placementInputs = {'fresh': areaGroups}
+
+        # If we got a previous area group, we'll attempt to
+        # reuse its knowledge
+        if(not areaGroupsPrevious is None):
+            areaGroupsModified = copy.deepcopy(areaGroups)
+            # if the area didn't change much (within say a
+            # few percent, we will reuse previous placement
+            # information
+            allowableAreaDelta = 1.01
+            for groupName in areaGroupsPrevious:
+                if(groupName in areaGroupsModified):
+                    previousGroupObject = areaGroupsPrevious[groupName]
+                    modifiedGroupObject = areaGroupsModified[groupName]
+                    if((modifiedGroupObject.area > previousGroupObject.area/allowableAreaDelta) and (modifiedGroupObject.area < previousGroupObject.area*allowableAreaDelta)):
+                        modifiedGroupObject.xDimension = previousGroupObject.xDimension
+                        modifiedGroupObject.yDimension = previousGroupObject.yDimension
+
+            placementInputs['reuse'] = areaGroupsModified
+
+            areaGroupsPinned = self.pinPlacement(areaGroups, areaGroupsPrevious, allowableAreaDelta)
+            if(not areaGroupsPinned is None):
+                placementInputs['pinned'] = areaGroupsPinned
+
+        # Race the placement strategies.  The strategy that won
+        # the last build gets the first slot.
+        previousWinner = None
+        if(os.path.exists(_areaConstraintsStrategyFile(moduleList))):
+            strategyHandle = open(_areaConstraintsStrategyFile(moduleList), 'r')
+            previousWinner = strategyHandle.read().strip()
+            strategyHandle.close()
+
+        # The other engine's strategies run only once every strategy of
+        # the chosen engine has failed.
+        strategies = self.placementStrategies(placementInputs, previousWinner)
+        for engine in self.placementEngines():
+            (areaGroupsFinal, self.placementWinner) = \
+                self.solvePortfolio([strategy for strategy in strategies if strategy[2] == engine], placementInputs)
+            if (areaGroupsFinal is not None):
+                break
+
+        if(not self.placementWinner is None):
+            print "Area group placement: strategy " + self.placementWinner + " won"
+            strategyHandle = open(_areaConstraintsStrategyFile(moduleList), 'w')
+            strategyHandle.write(self.placementWinner + '\n')
+            strategyHandle.close()
+
+        return areaGroupsFinal
+
+    ##
+    ## pinPlacement --
+    ##   Copy of areaGroups in which every group whose area is within
+    ##   allowableAreaDelta of its previous placement keeps that location
+    ##   and shape.  Only the remaining groups are left for the solver.
+    ##   Returns None if nothing could be pinned.
+    ##
+    def pinPlacement(self, areaGroups, areaGroupsPrevious, allowableAreaDelta):
+        areaGroupsPinned = copy.deepcopy(areaGroups)
+
+        # Groups placed by the user stay put and must not be covered.
+        userPlaced = [group for group in areaGroupsPinned.values() if not group.xLoc is None]
+
+        pinned = 0
+        for groupName in sorted(areaGroupsPinned):
+            group = areaGroupsPinned[groupName]
+            if((not group.xLoc is None) or (not groupName in areaGroupsPrevious)):
+                continue
+
+            previous = areaGroupsPrevious[groupName]
+            if(previous.xLoc is None or isinstance(previous.xDimension, list)):
+                continue
+            if(not ((group.area > previous.area/allowableAreaDelta) and (group.area < previous.area*allowableAreaDelta))):
+                continue
+
+            overlap = False
+            for fixed in userPlaced:
+                fixedX = fixed.xDimension[0] if isinstance(fixed.xDimension, list) else fixed.xDimension
+                fixedY = fixed.yDimension[0] if isinstance(fixed.yDimension, list) else fixed.yDimension
+                if((previous.xLoc < fixed.xLoc + fixedX) and (fixed.xLoc < previous.xLoc + previous.xDimension) and
+                   (previous.yLoc < fixed.yLoc + fixedY) and (fixed.yLoc < previous.yLoc + previous.yDimension)):
+                    overlap = True
+                    break
+            if(overlap):
+                continue
+
+            group.xLoc = previous.xLoc
+            group.yLoc = previous.yLoc
+            group.xDimension = previous.xDimension
+            group.yDimension = previous.yDimension
+            pinned += 1
+
+        if(pinned == 0):
+            return None
+        return areaGroupsPinned
+
     ##
     ## sort_area_groups --
     ##   Sort all area groups using traveling salesman to minimize the distance
@@ -404,7 +789,7 @@ class Floorplanner():
             print "Sorting area groups:"
 
         # Pick a short path
-        path = tsp.travelingSalesman(coords)
+        path = tsp.travelingSalesman(coords, starts=self.sortStarts, jobs=self.placerJobs)
 
         # Store path as sort order in areaGroups entries
         for i in range(len(group_names)):
@@ -416,6 +801,167 @@ class Floorplanner():
             if (self.pipeline_debug):
                 print "  " + name + ": " + str(group.sortIdx)
 
+    ##
+    ## computeChannelTraffic --
+    ##   Collect the matched LI channels of the first pass LIGraph and the
+    ##   traffic between each pair of modules.  The traffic of a channel or
+    ##   chain is its bit width times its activity.  Traffic is scaled so
+    ##   that a channel of average traffic weighs 10 and a chain link of
+    ##   the same traffic weighs 5, the weights of the channel counting
+    ##   objective.
+    ##
+    def computeChannelTraffic(self):
+        # (source module, sink module, channel) for every matched channel.
+        self.liChannels = []
+        for module in sorted(self.firstPassLIGraph.modules.values(), key=lambda module: module.name):
+            for channel in module.channels:
+                if(channel.matched and channel.isSource() and isinstance(channel.partnerModule, LIModule)):
+                    self.liChannels.append((module.name, channel.partnerModule.name, channel))
+
+        def traffic(connection):
+            return connection.bitwidth * max(connection.activity, 1)
+
+        referenceTraffic = 1.0
+        if(len(self.liChannels) > 0):
+            referenceTraffic = sum([traffic(channel) for (src, dst, channel) in self.liChannels]) / len(self.liChannels)
+        referenceTraffic = max(referenceTraffic, 1.0)
+
+        self.pairTraffic = {}
+        for (src, dst, channel) in self.liChannels:
+            pair = tuple(sorted([src, dst]))
+            self.pairTraffic[pair] = self.pairTraffic.get(pair, 0) + 10 * traffic(channel) / referenceTraffic
+
+        # Modules on the same chain are pulled together.
+        chainMembers = {}
+        for module in self.firstPassLIGraph.modules.values():
+            for chain in module.chains:
+                chainMembers.setdefault(chain.name, []).append((module.name, chain))
+
+        for members in chainMembers.values():
+            members.sort(key=lambda member: member[0])
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pair = (members[a][0], members[b][0])
+                    chainTraffic = 5 * traffic(members[a][1]) / referenceTraffic
+                    self.pairTraffic[pair] = self.pairTraffic.get(pair, 0) + chainTraffic
+
+    ##
+    ## placementReport --
+    ##   Expected inter-group wiring of a placement.  For each LI channel
+    ##   between two area groups: the center to center distance and the
+    ##   number of buffers numLIChannelBufs() will insert.  Returns a
+    ##   tuple of the total bit-weighted wirelength, the total number of
+    ##   channel buffers (None when buffers can't be computed in this
+    ##   build) and the report lines.
+    ##
+    def placementReport(self, areaGroups):
+        wirelength = 0
+        buffers = 0
+        lines = []
+        for (src, dst, channel) in self.liChannels:
+            if(not (src in areaGroups and dst in areaGroups) or (src == dst)):
+                continue
+
+            agOut = areaGroups[src]
+            agIn = areaGroups[dst]
+            distance = self.areaConstraints._distance(agOut, agIn)
+            wirelength += channel.bitwidth * distance
+
+            # Buffer counts need the physical platform utilities.
+            if (physical_platform_utils is None):
+                channelBuffers = None
+            else:
+                channelBuffers = self.areaConstraints.numLIChannelBufs(agOut, agIn)
+
+            if(channelBuffers is None or buffers is None):
+                buffers = None
+            else:
+                buffers += channelBuffers
+
+            lines.append('%s -> %s %s: %d bits, distance %.1f, buffers %s' %
+                         (src, dst, channel.name, channel.bitwidth, distance, str(channelBuffers)))
+
+        return (wirelength, buffers, lines)
+
+    ##
+    ## writePlacementReport --
+    ##   Print a summary of placementReport() and store the full report.
+    ##
+    def writePlacementReport(self, areaGroups, fileName):
+        (wirelength, buffers, lines) = self.placementReport(areaGroups)
+        print "Area group placement: inter-group wirelength " + str(int(wirelength)) + " bit-slices, " + str(buffers) + " channel buffers"
+
+        reportHandle = open(fileName, 'w')
+        reportHandle.write('# Inter-group wirelength: ' + str(wirelength) + ' bit-slices\n')
+        reportHandle.write('# Channel buffers: ' + str(buffers) + '\n')
+        for name in sorted(areaGroups):
+            group = areaGroups[name]
+            reportHandle.write('# ' + name + ': ' + str(group.xLoc) + ',' + str(group.yLoc) + ' ' + str(group.xDimension) + 'x' + str(group.yDimension) + '\n')
+        for line in lines:
+            reportHandle.write(line + '\n')
+        reportHandle.close()
+
+    ##
+    ## communicationWeight --
+    ##   Weight of the attraction between two area groups in the placement
+    ##   objective.  The weight grows with the channels and chains between
+    ##   the groups and is large for parent/child pairs.  Pairs involving
+    ##   an EMPTYBOX have no attraction.  With bit width weighting the
+    ##   channels and chains count by traffic (see computeChannelTraffic)
+    ##   rather than by number.
+    ##
+    def communicationWeight(self, areaGroupA, areaGroupB):
+        commsXY = self.clusteringWeight 
+        if(('EMPTYBOX' in areaGroupA.attributes) or ('EMPTYBOX' in areaGroupB.attributes)):
+           commsXY = 0 
+        else:
+            # Area groups come in two types -- parents
+            # and children.  Children communicate only
+            # with parents, while parents may communicate
+            # with other parents.
+            parentChild = False
+            if(areaGroupA.parent is not None):
+                if(areaGroupA.parent.name == areaGroupB.name):
+                    parentChild = not ('IGNORE_PARENT_CHILD' in areaGroupA.attributes)
+            elif(areaGroupB.parent is not None):
+                if(areaGroupB.parent.name == areaGroupA.name):
+                    parentChild = not ('IGNORE_PARENT_CHILD' in areaGroupB.attributes)
+
+            communicatingModules = (areaGroupA.name in self.firstPassLIGraph.modules) and (areaGroupB.name in self.firstPassLIGraph.modules)                            
+
+
+            #Handle parents/children 
+            if(self.enableCommunicationClustering):
+                # pairTraffic only holds pairs of LI modules.
+                if((not parentChild) and self.bitwidthWeighting):
+                    pair = tuple(sorted([areaGroupA.name, areaGroupB.name]))
+                    if(pair in self.pairTraffic):
+                        commsXY = commsXY + self.pairTraffic[pair]
+
+                elif((not parentChild) and communicatingModules):                                   
+                    moduleAObject = self.firstPassLIGraph.modules[areaGroupA.name]
+                    moduleBObject = self.firstPassLIGraph.modules[areaGroupB.name]
+                    for channel in moduleAObject.channels:
+                        # some channels may not be assigned
+                        if(isinstance(channel.partnerModule, LIModule)):
+                            if(channel.partnerModule.name == areaGroupB.name):
+                                commsXY = commsXY + 10
+
+                    # although we don't allocate chains yet,                                                  
+                    # we do need some weighting of chains to                                              
+                    # help force modules together                                                          
+                    for chain in moduleAObject.chains:
+                        if(chain.name in moduleBObject.chainNames):
+                                commsXY = commsXY + 5
+
+
+            #Handle parents/children
+            if(self.enableParentClustering):
+                if(parentChild):
+                    commsXY = commsXY + 1000
+
+        return commsXY
+
     def dumpILPRosen(self, modHandle, areaGroups):
 
         # let's begin setting up the ILP problem 
@@ -520,48 +1066,7 @@ class Floorplanner():
 
 
                 # Need to find out how much the two modules communicate.                         
-                commsXY = self.clusteringWeight 
-                if(('EMPTYBOX' in areaGroupA.attributes) or ('EMPTYBOX' in areaGroupB.attributes)):
-                   commsXY = 0 
-                else:
-                    # Area groups come in two types -- parents
-                    # and children.  Children communicate only
-                    # with parents, while parents may communicate
-                    # with other parents.
-                    parentChild = False
-                    if(areaGroupA.parent is not None):
-                        if(areaGroupA.parent.name == areaGroupB.name):
-                            parentChild = not ('IGNORE_PARENT_CHILD' in areaGroupA.attributes)
-                    elif(areaGroupB.parent is not None):
-                        if(areaGroupB.parent.name == areaGroupA.name):
-                            parentChild = not ('IGNORE_PARENT_CHILD' in areaGroupB.attributes)
-
-                    communicatingModules = (areaGroupA.name in self.firstPassLIGraph.modules) and (areaGroupB.name in self.firstPassLIGraph.modules)                            
-
-
-                    #Handle parents/children 
-                    if(self.enableCommunicationClustering):
-                        if((not parentChild) and communicatingModules):                                   
-                            moduleAObject = self.firstPassLIGraph.modules[areaGroupA.name]
-                            moduleBObject = self.firstPassLIGraph.modules[areaGroupB.name]
-                            for channel in moduleAObject.channels:
-                                # some channels may not be assigned
-                                if(isinstance(channel.partnerModule, LIModule)):
-                                    if(channel.partnerModule.name == areaGroupB.name):
-                                        commsXY = commsXY + 10
-        
-                            # although we don't allocate chains yet,                                                  
-                            # we do need some weighting of chains to                                              
-                            # help force modules together                                                          
-                            for chain in moduleAObject.chains:
-                                if(chain.name in moduleBObject.chainNames):
-                                        commsXY = commsXY + 5
-
-
-                    #Handle parents/children
-                    if(self.enableParentClustering):
-                        if(parentChild):
-                            commsXY = commsXY + 1000
+                commsXY = self.communicationWeight(areaGroupA, areaGroupB)
 
                 # Scrub out the EMPTYBOX constraints
                 if(commsXY > 0):
@@ -736,10 +1241,180 @@ class Floorplanner():
 
          return areaGroups
    
+    ##
+    ## placementEngines --
+    ##   The engine chosen by AREA_GROUPS_PLACER, then the other engine,
+    ##   which is only a fallback.
+    ##
+    def placementEngines(self):
+        if (self.placer == 'ANALYTIC'):
+            return ['analytic', 'ilp']
+        return ['ilp', 'analytic']
+
+    ##
+    ## placementStrategies --
+    ##   Build the portfolio of placement strategies.  Each strategy is a
+    ##   tuple (name, input, engine, modulesAtATime, seed), where input
+    ##   names an entry in placementInputs.  Strategies are listed in
+    ##   priority order: every strategy of the engine chosen by
+    ##   AREA_GROUPS_PLACER before any of the other, and for each engine
+    ##   pinned and warm starts before fresh placement, then randomized
+    ##   group orderings.  previousWinner, if still available, goes first
+    ##   among its engine's strategies.
+    ##
+    def placementStrategies(self, placementInputs, previousWinner=None):
+        engines = self.placementEngines()
+
+        strategies = []
+        for engine in engines:
+            for inputName in ['pinned', 'reuse', 'fresh']:
+                if (not inputName in placementInputs):
+                    continue
+                if (engine == 'ilp'):
+                    for modulesAtATime in range(1,4):
+                        strategies.append((inputName + '_ilp_' + str(modulesAtATime),
+                                           inputName, engine, modulesAtATime, None))
+                else:
+                    strategies.append((inputName + '_analytic', inputName, engine, None, None))
+
+            for seed in range(1, self.placerRandomOrders + 1):
+                if (engine == 'ilp'):
+                    modulesAtATime = 1 + (seed - 1) % 3
+                    strategies.append(('fresh_ilp_' + str(modulesAtATime) + '_shuffle_' + str(seed),
+                                       'fresh', engine, modulesAtATime, seed))
+                else:
+                    strategies.append(('fresh_analytic_shuffle_' + str(seed),
+                                       'fresh', engine, None, seed))
+
+        strategies.sort(key=lambda strategy: (engines.index(strategy[2]), strategy[0] != previousWinner))
+        return strategies
+
+    ##
+    ## runStrategy --
+    ##   Run a single placement strategy.  Returns a new dictionary of
+    ##   placed area groups or None.
+    ##
+    def runStrategy(self, strategy, placementInputs):
+        (name, inputName, engine, modulesAtATime, seed) = strategy
+        areaGroups = copy.deepcopy(placementInputs[inputName])
+
+        if (engine == 'ilp'):
+            return self.solveILPPartial(areaGroups, fileprefix=name + '_',
+                                        modulesAtATimeOptions=[modulesAtATime],
+                                        seed=seed)
+        else:
+            return self.solveAnalytic(areaGroups, seed=seed)
+
+    ##
+    ## solvePortfolio --
+    ##   Run the placement strategies concurrently in a pool of
+    ##   AREA_GROUPS_PLACER_JOBS processes.  The first feasible placement
+    ##   wins and the remaining strategies are abandoned, unless
+    ##   AREA_GROUPS_PLACER_TIME_BUDGET gives the others that many more
+    ##   seconds to find a better scoring placement.  With a single job,
+    ##   strategies run in priority order and the first feasible one
+    ##   wins, as in the old sequential flow.
+    ##
+    ##   Returns a tuple of the placed area groups and the winning
+    ##   strategy name, (None, None) when every strategy failed.
+    ##
+    def solvePortfolio(self, strategies, placementInputs):
+        global _portfolioFloorplanner
+        global _portfolioInputs
+
+        _portfolioFloorplanner = self
+        _portfolioInputs = placementInputs
+
+        if (self.placerJobs <= 1 or len(strategies) <= 1):
+            for strategy in strategies:
+                (strategy, areaGroupsFinal) = _runPlacementStrategy(strategy)
+                if (areaGroupsFinal is not None):
+                    return (areaGroupsFinal, strategy[0])
+            return (None, None)
+
+        pool = multiprocessing.Pool(min(self.placerJobs, len(strategies)))
+        pending = [pool.apply_async(_runPlacementStrategy, (strategy,)) for strategy in strategies]
+
+        best = (None, None)
+        bestCost = None
+        # Set by the first feasible placement.
+        deadline = None
+        try:
+            while (len(pending) > 0):
+                for result in [result for result in pending if result.ready()]:
+                    pending.remove(result)
+                    (strategy, areaGroupsFinal) = result.get()
+                    if (areaGroupsFinal is None):
+                        continue
+
+                    cost = self.placementCost(areaGroupsFinal)
+                    (wirelength, buffers, lines) = self.placementReport(areaGroupsFinal)
+                    print "Area group placement: strategy " + strategy[0] + " cost " + str(cost) + \
+                          ", wirelength " + str(int(wirelength)) + ", buffers " + str(buffers)
+                    if (bestCost is None or cost < bestCost):
+                        best = (areaGroupsFinal, strategy[0])
+                        bestCost = cost
+                    if (deadline is None):
+                        deadline = time.time() + self.placerTimeBudget
+
+                if (deadline is not None and time.time() >= deadline):
+                    break
+
+                time.sleep(0.1)
+        finally:
+            # Abandon strategies still running.
+            pool.terminate()
+            pool.join()
+            _portfolioFloorplanner = None
+            _portfolioInputs = None
+
+        return best
+
+    ##
+    ## placementCost --
+    ##   Score a placement: the clustering weight of every pair of area
+    ##   groups times the Manhattan distance between their centers.
+    ##
+    def placementCost(self, areaGroups):
+        names = sorted(areaGroups.keys())
+        centers = {}
+        for name in names:
+            group = areaGroups[name]
+            centers[name] = (group.xLoc + group.xDimension / 2,
+                             group.yLoc + group.yDimension / 2)
+
+        cost = 0
+        for a in range(len(names)):
+            groupA = areaGroups[names[a]]
+            for b in range(a + 1, len(names)):
+                groupB = areaGroups[names[b]]
+                weight = self.communicationWeight(groupA, groupB)
+                if (weight > 0):
+                    cost += weight * (abs(centers[groupA.name][0] - centers[groupB.name][0]) +
+                                      abs(centers[groupA.name][1] - centers[groupB.name][1]))
+        return cost
+
+    ##
+    ## solveAnalytic --
+    ##   Place all area groups with the built-in analytic placer.
+    ##
+    def solveAnalytic(self, areaGroups, seed=None):
+        areaGroupsPartial = copy.deepcopy(areaGroups)
+        for areaGroupName in sorted(areaGroupsPartial):
+            self.setSpecialPosition(areaGroupName, areaGroupsPartial)
+
+        placer = floorplace.AnalyticFloorplacer(self.chipXDimension,
+                                                self.chipYDimension,
+                                                self.communicationWeight,
+                                                seed=seed,
+                                                debug=self.pipeline_debug)
+        return placer.place(areaGroupsPartial)
+
     # we could also apply different heuristics to the ordering that we pick.
-    def solveILPPartial(self, areaGroups, fileprefix=""):
+    # A seed perturbs the largest-first placement order.
+    def solveILPPartial(self, areaGroups, fileprefix="", modulesAtATimeOptions=range(1,4), seed=None):
          solvedILP = False
-         for modulesAtATime in range(1,4):
+         for modulesAtATime in modulesAtATimeOptions:
              areaGroupsPartial = {}
              unplacedGroups = []
              # fill in the new area group structure with previously placed area groups. 
@@ -754,7 +1429,13 @@ class Floorplanner():
                  else:
                      unplacedGroups += [copy.deepcopy(areaGroupObject)]
                  
-             unplacedGroups.sort(key=lambda group: group.area)
+             if (seed is None):
+                 unplacedGroups.sort(key=lambda group: group.area)
+             else:
+                 rng = random.Random(seed)
+                 unplacedGroups.sort(key=lambda group: group.name)
+                 jitter = dict([(group.name, rng.uniform(0.5, 1.5)) for group in unplacedGroups])
+                 unplacedGroups.sort(key=lambda group: group.area * jitter[group.name])
 
              # If all the groups have been placed, we are done..
              if(len(unplacedGroups) == 0):
@@ -833,6 +1514,59 @@ class Floorplanner():
         return extraAreaFactor * area + extraAreaOffset
 
 
+    ##
+    ## assignAspectRatios --
+    ##   Give an area group the candidate dimensions the placers may
+    ##   choose among, all covering its padded area.
+    ##
+    def assignAspectRatios(self, areaGroupObject):
+        affineCoefs = [1, 2, 4, 8] # just make them all squares for now. 
+
+        areaGroupObject.xDimension = []
+        areaGroupObject.yDimension = []  
+
+        moduleRoot = math.sqrt(self.withExtraArea(areaGroupObject.area))
+        for coef in affineCoefs:
+            areaGroupObject.xDimension.append(coef*moduleRoot)
+            areaGroupObject.yDimension.append(moduleRoot/coef)
+
+    ##
+    ## estimateResources --
+    ##   Train the area estimator on the synthesis boundaries whose real
+    ##   resources are known and fill in provisional resources for those
+    ##   that have not been synthesized yet.
+    ##
+    def estimateResources(self, moduleList, moduleResources):
+        estimator = area_estimator.AreaEstimator(_areaEstimatorDatabase(moduleList),
+                                                 debug=self.pipeline_debug)
+
+        def boundaryFeatures(module):
+            tmpPath = model.get_temp_path(moduleList, module)
+            verilogs = [tmpPath + module.wrapperName() + '.v']
+            verilogs += [tmpPath + v for v in moduleList.getSynthBoundaryDependencies(module, 'GEN_VS')]
+            return area_estimator.verilogFeatures(verilogs)
+
+        boundaries = [module for module in moduleList.synthBoundaries()
+                      if module.name != moduleList.topModule.name]
+
+        features = {}
+        for module in boundaries:
+            features[module.name] = boundaryFeatures(module)
+            if((module.name in moduleResources) and (features[module.name] is not None)):
+                estimator.record(module.name, features[module.name], moduleResources[module.name])
+
+        estimator.store()
+
+        for module in boundaries:
+            if((module.name in moduleResources) or (features[module.name] is None)):
+                continue
+
+            estimate = estimator.estimate(module.name, features[module.name])
+            if((estimate is not None) and ('LUT' in estimate)):
+                print "Area group " + module.name + ": using estimated resources " + str(estimate)
+                moduleResources[module.name] = estimate
+                self.estimatedGroups.append(module.name)
+
     ##
     ## Elaborate Area Constraints from information in the system
     ##
@@ -842,6 +1576,9 @@ class Floorplanner():
             moduleResources = li_module.assignResources(moduleList)
         else:
             moduleResources = li_module.assignResources(moduleList, None, self.firstPassLIGraph)
+
+        if(self.estimateArea):
+            self.estimateResources(moduleList, moduleResources)
         
 
         areaGroups = {}
@@ -857,12 +1594,15 @@ class Floorplanner():
             if(module in moduleResources):
                 if('LUT' in moduleResources[module]):
                     areaGroups[module] = AreaGroup(module, '') 
+                    if(module in self.estimatedGroups):
+                        areaGroups[module].attributes['AREA_ESTIMATE'] = True
         # now that we have the modules, let's apply constraints. 
 
         # Grab area groups declared/defined in the agrp file supplied by the user. 
         constraints = []
         for constraintFile in moduleList.getAllDependenciesWithPaths('GIVEN_AREA_CONSTRAINTS'):
-            constraints += area_group_parser.parseAreaGroupConstraints(moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + constraintFile)
+            constraints += area_group_parser.parseAreaGroupConstraints(moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + constraintFile,
+                                                                       _areaConstraintsParseCache(moduleList))
 
         # first bind new area groups. 
         for constraint in constraints:
@@ -965,19 +1705,11 @@ class Floorplanner():
                 else:
                     areaGroup.area = areaGroup.area - child.area/2
 
-        affineCoefs = [1, 2, 4, 8] # just make them all squares for now. 
-
         for areaGroup in areaGroups:
             areaGroupObject = areaGroups[areaGroup]
             # we might have gotten coefficients from the constraints.
             if(areaGroupObject.xDimension is None):
-                areaGroupObject.xDimension = []
-                areaGroupObject.yDimension = []  
-
-                moduleRoot = math.sqrt(self.withExtraArea(areaGroupObject.area))
-                for coef in affineCoefs:
-                    areaGroupObject.xDimension.append(coef*moduleRoot)
-                    areaGroupObject.yDimension.append(moduleRoot/coef)
+                self.assignAspectRatios(areaGroupObject)
 
         # If we've been instructed to remove the platform module, purge it here. 
         if(not self.emitPlatformAreaGroups):
@@ -993,6 +1725,32 @@ class Floorplanner():
         return areaGroups
 
 
+##
+## detachedFloorplanner --
+##   A Floorplanner outside of any build, for offline tools such as
+##   floorplan_benchmark.  The chip and the traffic between groups (as in
+##   computeChannelTraffic) are given directly and the remaining settings
+##   take their defaults.
+##
+def detachedFloorplanner(chipXDimension, chipYDimension, pairTraffic,
+                         placer='ILP', jobs=1, timeBudget=0, randomOrders=0,
+                         sortStarts=1, debug=False):
+    floorplanner = Floorplanner()
+
+    floorplanner.pipeline_debug = debug
+    floorplanner.placer = placer
+    floorplanner.placerJobs = jobs
+    floorplanner.placerTimeBudget = timeBudget
+    floorplanner.placerRandomOrders = randomOrders
+    floorplanner.sortStarts = sortStarts
+    floorplanner.pairTraffic = pairTraffic
+
+    floorplanner.chipXDimension = chipXDimension
+    floorplanner.chipYDimension = chipYDimension
+
+    return floorplanner
+
+
 def insertDeviceModules(moduleList, annotateParentsOnly=False):
      
     elabAreaConstraints = AreaConstraints(moduleList)
@@ -0,0 +1,149 @@
+##
+## Timing feedback for LI channel buffering.
+##
+## Buffers on LI channels between area groups are sized from the
+## distance between the groups (AreaConstraints.numLIChannelBufs).  The
+## post-route flow also reports the worst timing paths crossing between
+## area group pblocks whose slack is below a threshold, one line per
+## path:
+##
+##   AG_<source group> AG_<destination group> <slack ns>
+##
+## ChannelBufferFeedback reads that report from the previous build and
+## keeps, per pair of communicating groups, a correction to the distance
+## based buffer count:
+##
+##   - a pair with a failing path (negative slack) gets one more buffer,
+##     and its correction never again drops below the new value;
+##   - a pair absent from the report has slack to spare and gives up one
+##     buffer, down to that floor.
+##
+## Pairs are unordered: the buffers of a channel serve both its data and
+## its flow control.
+##
+
+import os
+import cPickle as pickle
+
+
+##
+## parseChannelTiming --
+##   Worst slack of each pair of area groups in a pblock timing report.
+##
+def parseChannelTiming(reportFile):
+    worst = {}
+    for line in open(reportFile, 'r'):
+        fields = line.split()
+        if (len(fields) != 3):
+            continue
+
+        (src, dst, slack) = fields
+        if (not (src.startswith('AG_') and dst.startswith('AG_'))):
+            continue
+        try:
+            slack = float(slack)
+        except ValueError:
+            continue
+
+        pair = tuple(sorted([src[3:], dst[3:]]))
+        if (pair[0] == pair[1]):
+            continue
+        worst[pair] = min(slack, worst.get(pair, slack))
+
+    return worst
+
+
+##
+## bufferDelta --
+##   Buffer correction for a channel from agOut to agIn, as annotated on
+##   placed area groups by the Floorplanner.
+##
+def bufferDelta(agOut, agIn):
+    return getattr(agOut, 'channelBufferDelta', {}).get(agIn.name, 0)
+
+
+class ChannelBufferFeedback():
+
+    def __init__(self, dbPath, maxExtraBuffers=4, debug=False):
+        self.dbPath = dbPath
+        self.maxExtraBuffers = maxExtraBuffers
+        self.debug = debug
+
+        # deltas: pair -> buffer correction.  floors: pair -> lowest
+        # correction allowed.  reportTime: mtime of the last report read.
+        self.db = {'deltas': {}, 'floors': {}, 'reportTime': None}
+        if (os.path.exists(dbPath)):
+            try:
+                handle = open(dbPath, 'rb')
+                self.db = pickle.load(handle)
+                handle.close()
+            except Exception:
+                print "Channel buffer feedback: ignoring unreadable " + dbPath
+
+    def deltas(self):
+        return self.db['deltas']
+
+    ##
+    ## update --
+    ##   Adjust the corrections of the communicating pairs from a timing
+    ##   report not yet seen.  Returns True if the report was read.
+    ##
+    def update(self, reportFile, pairs):
+        if (not os.path.exists(reportFile)):
+            return False
+
+        reportTime = os.path.getmtime(reportFile)
+        if (self.db['reportTime'] is not None and reportTime <= self.db['reportTime']):
+            return False
+
+        worst = parseChannelTiming(reportFile)
+        deltas = self.db['deltas']
+        floors = self.db['floors']
+
+        for pair in sorted(set(pairs) | set(worst.keys())):
+            delta = deltas.get(pair, 0)
+            floor = floors.get(pair, -self.maxExtraBuffers)
+
+            if (not pair in worst):
+                delta = max(delta - 1, floor)
+            elif (worst[pair] < 0):
+                delta = min(delta + 1, self.maxExtraBuffers)
+                floors[pair] = delta
+
+            if (delta != deltas.get(pair, 0)):
+                print "Channel buffer feedback: " + pair[0] + " <-> " + pair[1] + \
+                      " buffers " + ('%+d' % delta) + \
+                      (' (worst slack ' + str(worst[pair]) + ' ns)' if pair in worst else '')
+
+            if (delta == 0):
+                deltas.pop(pair, None)
+            else:
+                deltas[pair] = delta
+
+        self.db['reportTime'] = reportTime
+        self.store()
+        return True
+
+    ##
+    ## annotate --
+    ##   Record the corrections on placed area groups for bufferDelta().
+    ##
+    def annotate(self, areaGroups):
+        for group in areaGroups.values():
+            group.channelBufferDelta = {}
+
+        for ((a, b), delta) in self.db['deltas'].items():
+            if (a in areaGroups and b in areaGroups):
+                areaGroups[a].channelBufferDelta[b] = delta
+                areaGroups[b].channelBufferDelta[a] = delta
+
+    def store(self):
+        directory = os.path.dirname(self.dbPath)
+        if (directory != '' and not os.path.isdir(directory)):
+            os.makedirs(directory)
+
+        tmpPath = self.dbPath + '.' + str(os.getpid())
+        handle = open(tmpPath, 'wb')
+        pickle.dump(self.db, handle, protocol=-1)
+        handle.close()
+        os.rename(tmpPath, self.dbPath)
@@ -0,0 +1,418 @@
+##
+## Analytic area group placement.
+##
+## An alternative to the GLPK ILP formulation in area_group_tool.  No
+## external solver is required.  Placement proceeds in two phases:
+##
+##   Global placement:  minimize the weighted squared distance between
+##   communicating area groups (Gauss-Seidel sweeps of the quadratic
+##   system).  Each round also spreads groups across their legal region
+##   in proportion to area and pulls them toward the spread positions
+##   with a growing anchor weight, so the final positions are both
+##   clustered and distributed over the chip.
+##
+##   Legalization:  groups are visited in decreasing area order, groups
+##   confined to a sub-region first.  For each group every allowed aspect
+##   ratio is tried at candidate slice positions abutting the regions
+##   already placed.  The non-overlapping candidate with the least
+##   weighted wirelength to its neighbors (placed neighbors at their legal
+##   positions, unplaced ones at their global targets) wins.
+##
+## Placed groups get integer xLoc/yLoc (lower left corner) and scalar
+## integer xDimension/yDimension, the same representation produced by
+## the ILP solver.
+##
+
+import math
+import heapq
+import random
+
+
+class PlacerGroup():
+
+    def __init__(self, areaGroup, index):
+        self.areaGroup = areaGroup
+        self.name = areaGroup.name
+        self.index = index
+        self.fixed = areaGroup.xLoc is not None
+        self.neighbors = []
+
+        if (isinstance(areaGroup.xDimension, list)):
+            dims = zip(areaGroup.xDimension, areaGroup.yDimension)
+        else:
+            dims = [(areaGroup.xDimension, areaGroup.yDimension)]
+
+        # Area groups are built from whole slices.
+        self.shapes = []
+        for (xDim, yDim) in dims:
+            shape = (int(math.ceil(xDim - 1e-6)), int(math.ceil(yDim - 1e-6)))
+            if (not shape in self.shapes):
+                self.shapes.append(shape)
+
+        self.area = self.shapes[0][0] * self.shapes[0][1]
+
+        # Legal region: the chip, optionally narrowed by user supplied
+        # lower left and upper right corners.
+        self.box = None
+
+        # Global placement target (center) and legal rectangle.
+        self.x = 0.0
+        self.y = 0.0
+        self.rect = None
+
+    def center(self):
+        if (self.rect is None):
+            return (self.x, self.y)
+        return ((self.rect[0] + self.rect[2]) / 2.0,
+                (self.rect[1] + self.rect[3]) / 2.0)
+
+    def weightSum(self):
+        return sum([weight for (neighbor, weight) in self.neighbors])
+
+
+class AnalyticFloorplacer():
+
+    ##
+    ## chipXDimension/chipYDimension are the FPGA dimensions in slices.
+    ## weightFunction(areaGroupA, areaGroupB) returns the attraction
+    ## between a pair of groups.  Pairs with non-positive weight are
+    ## not attracted to one another.
+    ##
+    def __init__(self, chipXDimension, chipYDimension, weightFunction,
+                 globalIterations=40, seed=None, debug=False):
+        self.chipXDimension = int(chipXDimension)
+        self.chipYDimension = int(chipYDimension)
+        self.weightFunction = weightFunction
+        self.globalIterations = globalIterations
+        self.seed = seed
+        self.debug = debug
+
+    ##
+    ## place --
+    ##   Place a dictionary of area groups, updating the AreaGroup objects
+    ##   in place.  Returns the dictionary on success, None if some group
+    ##   could not be legally placed.
+    ##
+    def place(self, areaGroups):
+        if (self.chipXDimension <= 0 or self.chipYDimension <= 0):
+            print "Analytic placer: no FPGA dimension given"
+            return None
+
+        names = sorted(areaGroups.keys())
+        groups = [PlacerGroup(areaGroups[name], idx) for (idx, name) in enumerate(names)]
+
+        if (not self.setRegions(groups)):
+            return None
+
+        self.buildNets(groups)
+
+        movable = [g for g in groups if not g.fixed]
+        if (len(movable) > 0):
+            self.globalPlace(movable)
+            if (not self.legalize(groups, movable)):
+                return None
+
+        # Write results back into the area groups.
+        for g in groups:
+            (x0, y0, x1, y1) = g.rect
+            g.areaGroup.xLoc = x0
+            g.areaGroup.yLoc = y0
+            g.areaGroup.xDimension = x1 - x0
+            g.areaGroup.yDimension = y1 - y0
+
+        if (self.debug):
+            print "Analytic placer: wirelength " + str(self.wirelength(groups))
+
+        return areaGroups
+
+    ##
+    ## wirelength --
+    ##   Weighted center to center Manhattan distance over all nets.
+    ##
+    def wirelength(self, groups):
+        total = 0.0
+        for g in groups:
+            (gx, gy) = g.center()
+            for (n, weight) in g.neighbors:
+                if (n.index > g.index):
+                    (nx, ny) = n.center()
+                    total += weight * (abs(gx - nx) + abs(gy - ny))
+        return total
+
+    ##
+    ## setRegions --
+    ##   Compute the legal region of each group and drop the aspect
+    ##   ratios that cannot fit.  Fixed groups take the first shape that
+    ##   fits at their given location.
+    ##
+    def setRegions(self, groups):
+        for g in groups:
+            x0 = 0
+            y0 = 0
+            x1 = self.chipXDimension
+            y1 = self.chipYDimension
+
+            ll = g.areaGroup.lowerLeft
+            if (ll is not None):
+                x0 = max(x0, int(math.ceil(ll.xCoordinate)))
+                y0 = max(y0, int(math.ceil(ll.yCoordinate)))
+
+            ur = g.areaGroup.upperRight
+            if (ur is not None):
+                x1 = min(x1, int(math.floor(ur.xCoordinate)))
+                y1 = min(y1, int(math.floor(ur.yCoordinate)))
+
+            g.box = (x0, y0, x1, y1)
+
+            if (g.fixed):
+                xLoc = int(g.areaGroup.xLoc)
+                yLoc = int(g.areaGroup.yLoc)
+                shape = g.shapes[0]
+                for (w, h) in g.shapes:
+                    if (xLoc + w <= self.chipXDimension and yLoc + h <= self.chipYDimension):
+                        shape = (w, h)
+                        break
+                g.rect = (xLoc, yLoc, xLoc + shape[0], yLoc + shape[1])
+                continue
+
+            g.shapes = [(w, h) for (w, h) in g.shapes if (w <= x1 - x0 and h <= y1 - y0)]
+            if (len(g.shapes) == 0):
+                print "Analytic placer: area group " + g.name + " does not fit in its region " + str(g.box)
+                return False
+
+            # The smallest perimeter shape stands for the group in
+            # global placement.
+            g.shapes.sort(key=lambda shape: (shape[0] + shape[1], shape))
+            g.area = g.shapes[0][0] * g.shapes[0][1]
+            g.x = (x0 + x1) / 2.0
+            g.y = (y0 + y1) / 2.0
+
+        return True
+
+    def buildNets(self, groups):
+        for a in range(len(groups)):
+            groupA = groups[a]
+            for b in range(a + 1, len(groups)):
+                groupB = groups[b]
+                if (groupA.fixed and groupB.fixed):
+                    continue
+                weight = self.weightFunction(groupA.areaGroup, groupB.areaGroup)
+                if (weight > 0):
+                    groupA.neighbors.append((groupB, weight))
+                    groupB.neighbors.append((groupA, weight))
+
+    ##
+    ## globalPlace --
+    ##   Quadratic placement with area spreading anchors.
+    ##
+    def globalPlace(self, movable):
+        anchors = {}
+        for g in movable:
+            anchors[g.name] = (g.x, g.y)
+
+        totalArea = float(sum([g.area for g in movable]))
+
+        for iteration in range(self.globalIterations):
+            anchorScale = (iteration + 1.0) / self.globalIterations
+
+            # Lower bound: a few Gauss-Seidel sweeps of the weighted
+            # quadratic system.  Fixed groups act as terminals.
+            for sweep in range(4):
+                for g in movable:
+                    anchorWeight = anchorScale * (g.weightSum() + 1.0)
+                    (ax, ay) = anchors[g.name]
+                    sw = anchorWeight
+                    sx = anchorWeight * ax
+                    sy = anchorWeight * ay
+                    for (n, weight) in g.neighbors:
+                        (nx, ny) = n.center()
+                        sw += weight
+                        sx += weight * nx
+                        sy += weight * ny
+                    (g.x, g.y) = self.clampCenter(g, sx / sw, sy / sw)
+
+            # Upper bound: spread the groups along each axis in
+            # proportion to their area, preserving relative order.
+            spreadX = {}
+            spreadY = {}
+            for (axis, spread, chipSize) in ((0, spreadX, self.chipXDimension),
+                                             (1, spreadY, self.chipYDimension)):
+                order = sorted(movable, key=lambda g: ((g.x, g.y)[axis], g.index))
+                running = 0.0
+                for g in order:
+                    spread[g.name] = chipSize * (running + g.area / 2.0) / totalArea
+                    running += g.area
+
+            for g in movable:
+                anchors[g.name] = self.clampCenter(g, spreadX[g.name], spreadY[g.name])
+
+    def clampCenter(self, g, x, y):
+        (x0, y0, x1, y1) = g.box
+        (w, h) = g.shapes[0]
+        x = min(max(x, x0 + w / 2.0), x1 - w / 2.0)
+        y = min(max(y, y0 + h / 2.0), y1 - h / 2.0)
+        return (x, y)
+
+    ##
+    ## legalize --
+    ##   Snap the global placement to non-overlapping slice rectangles.
+    ##   Groups confined to a sub-region go first, then by decreasing area.
+    ##
+    def legalize(self, groups, movable):
+        placed = [g for g in groups if g.fixed]
+        chip = (0, 0, self.chipXDimension, self.chipYDimension)
+
+        # A seed perturbs the largest-first order.
+        jitter = {}
+        rng = random.Random(self.seed)
+        for g in movable:
+            jitter[g.name] = 1.0
+            if (self.seed is not None):
+                jitter[g.name] = rng.uniform(0.5, 1.5)
+
+        for g in sorted(movable, key=lambda g: (g.box == chip, -g.area * jitter[g.name], g.name)):
+            rect = self.legalPosition(g, placed)
+            if (rect is None):
+                print "Analytic placer: failed to legalize area group " + g.name
+                return False
+
+            g.rect = rect
+            placed.append(g)
+
+        return True
+
+    ##
+    ## legalPosition --
+    ##   Cheapest non-overlapping rectangle for g.  Positions abutting a
+    ##   corner of a placed group are tried first.  Should all of those be
+    ##   blocked, every pairing of candidate x and y coordinates is
+    ##   searched.
+    ##
+    def legalPosition(self, g, placed):
+        # Groups that share no EMPTYBOX relationship must not overlap.
+        emptyBox = 'EMPTYBOX' in g.areaGroup.attributes
+        obstacles = [p.rect for p in placed
+                     if not (emptyBox and ('EMPTYBOX' in p.areaGroup.attributes))]
+
+        neighbors = [(n.center(), weight) for (n, weight) in g.neighbors]
+
+        rect = self.firstFree(self.cornerCandidates(g, obstacles, neighbors), obstacles)
+        if (rect is None):
+            rect = self.firstFree(self.gridCandidates(g, obstacles, neighbors), obstacles)
+        return rect
+
+    ##
+    ## firstFree --
+    ##   First rectangle from an iterable of (cost, rect) that overlaps no
+    ##   obstacle.  Neighboring candidates tend to hit the same obstacle,
+    ##   so the most recent blocker moves to the front of the list.
+    ##
+    def firstFree(self, candidates, obstacles):
+        for (cost, (x, y, xEnd, yEnd)) in candidates:
+            blocker = None
+            for idx in xrange(len(obstacles)):
+                r = obstacles[idx]
+                if (x < r[2] and r[0] < xEnd and
+                    y < r[3] and r[1] < yEnd):
+                    blocker = idx
+                    break
+            if (blocker is None):
+                return (x, y, xEnd, yEnd)
+            if (blocker != 0):
+                obstacles.insert(0, obstacles.pop(blocker))
+
+        return None
+
+    ##
+    ## cornerCandidates --
+    ##   Region corners, the global placement target and positions sliding
+    ##   along the sides of each obstacle, sorted by cost.
+    ##
+    def cornerCandidates(self, g, obstacles, neighbors):
+        (x0, y0, x1, y1) = g.box
+        candidates = set()
+        for (w, h) in g.shapes:
+            points = [(x0, y0), (x1 - w, y0), (x0, y1 - h), (x1 - w, y1 - h),
+                      (int(round(g.x - w / 2.0)), int(round(g.y - h / 2.0)))]
+            for r in obstacles:
+                for y in (r[1], r[3] - h):
+                    points.append((r[0] - w, y))
+                    points.append((r[2], y))
+                for x in (r[0], r[2] - w):
+                    points.append((x, r[1] - h))
+                    points.append((x, r[3]))
+
+            for (x, y) in points:
+                if (x >= x0 and x + w <= x1 and y >= y0 and y + h <= y1):
+                    candidates.add((x, y, x + w, y + h))
+
+        costs = [(self.axisCost(g, 0, (r[0] + r[2]) / 2.0, neighbors) +
+                  self.axisCost(g, 1, (r[1] + r[3]) / 2.0, neighbors), r)
+                 for r in candidates]
+        costs.sort()
+        return costs
+
+    ##
+    ## gridCandidates --
+    ##   Generate every pairing of candidate x and y coordinates in
+    ##   increasing cost.  The cost is separable in x and y, so each axis
+    ##   is scored once and pairs are expanded lazily from a heap.
+    ##
+    def gridCandidates(self, g, obstacles, neighbors):
+        (x0, y0, x1, y1) = g.box
+
+        heap = []
+        axes = []
+        for (w, h) in g.shapes:
+            xs = self.axisCandidates(g, 0, x0, x1 - w, w,
+                                     [(r[0], r[2]) for r in obstacles], neighbors)
+            ys = self.axisCandidates(g, 1, y0, y1 - h, h,
+                                     [(r[1], r[3]) for r in obstacles], neighbors)
+            if (len(xs) > 0 and len(ys) > 0):
+                shapeIdx = len(axes)
+                axes.append((w, h, xs, ys))
+                heapq.heappush(heap, (xs[0][0] + ys[0][0], shapeIdx, 0, 0))
+
+        visited = set()
+        while (len(heap) > 0):
+            (cost, shapeIdx, i, j) = heapq.heappop(heap)
+            (w, h, xs, ys) = axes[shapeIdx]
+            x = xs[i][1]
+            y = ys[j][1]
+            yield (cost, (x, y, x + w, y + h))
+
+            for (ni, nj) in ((i + 1, j), (i, j + 1)):
+                if (ni < len(xs) and nj < len(ys) and
+                    not (shapeIdx, ni, nj) in visited):
+                    visited.add((shapeIdx, ni, nj))
+                    heapq.heappush(heap, (xs[ni][0] + ys[nj][0], shapeIdx, ni, nj))
+
+    ##
+    ## axisCandidates --
+    ##   Lower-left coordinates along one axis worth trying, paired with
+    ##   their share of the placement cost and sorted by it.  Candidates
+    ##   are the region edges, the global placement target and positions
+    ##   abutting obstacles on either side.
+    ##
+    def axisCandidates(self, g, axis, low, high, size, spans, neighbors):
+        target = (g.x, g.y)[axis]
+        coords = set([low, high, int(round(target - size / 2.0))])
+        for (spanLow, spanHigh) in spans:
+            coords.add(spanHigh)
+            coords.add(spanLow - size)
+
+        scored = [(self.axisCost(g, axis, c + size / 2.0, neighbors), c)
+                  for c in coords if (c >= low and c <= high)]
+        scored.sort()
+        return scored
+
+    ##
+    ## axisCost --
+    ##   Placement cost along one axis of putting the center of g at mid.
+    ##
+    def axisCost(self, g, axis, mid, neighbors):
+        # The own target term is a tie breaker for unconnected groups.
+        cost = abs(mid - (g.x, g.y)[axis])
+        for (center, weight) in neighbors:
+            cost += weight * abs(mid - center[axis])
+        return cost
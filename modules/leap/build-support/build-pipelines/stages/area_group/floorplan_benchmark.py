@@ -0,0 +1,401 @@
+##
+## Floorplan quality benchmark.
+##
+## Runs each area group placement backend on a set of floorplanning
+## instances and reports, per instance and backend:
+##
+##   success       placement found and legal (inside the chip, no overlap)
+##   seconds       placement solve time
+##   area_slack    placed area beyond the groups' required area
+##   wirelength    communication weighted Manhattan wirelength, the
+##                 Floorplanner's placementCost()
+##   max_distance  longest center to center distance between two
+##                 communicating groups
+##   sort_seconds  time to order the placed groups (traveling salesman)
+##   tour_length   length of that order
+##
+## Instances are either recorded or synthetic.  A recorded instance is an
+## areagroups.elaborated.pickle from a build tree.  The chip dimensions
+## and group traffic come from the areagroups.problem.pickle stored next
+## to it, when present.  Synthetic instances are random designs of a
+## given number of groups.
+##
+## Results go to CSV and JSON files so that they can be tracked across
+## versions of the placers.  The benchmark is a standalone tool, not part
+## of the build.  Run it from the build tree:
+##
+##   PYTHONPATH=site_scons python site_scons/area_group_tool/floorplan_benchmark.py \
+##       --synthetic 20,50 --seeds 3 --csv fp.csv --json fp.json \
+##       [areagroups.elaborated.pickle ...]
+##
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import getopt
+import shutil
+import tempfile
+import multiprocessing
+import cPickle as pickle
+
+import tsp
+import area_group_tool
+from area_group_parser import AreaGroup
+
+## Backend name -> (engine, modulesAtATime), as in placementStrategies().
+BACKENDS = [('ilp_1', ('ilp', 1)),
+            ('ilp_2', ('ilp', 2)),
+            ('ilp_3', ('ilp', 3)),
+            ('analytic', ('analytic', None))]
+
+COLUMNS = ['instance', 'groups', 'backend', 'success', 'seconds', 'area_slack',
+           'wirelength', 'max_distance', 'sort_seconds', 'tour_length', 'error']
+
+
+class Instance():
+
+    def __init__(self, name, areaGroups, chipXDimension, chipYDimension, pairTraffic):
+        self.name = name
+        self.areaGroups = areaGroups
+        self.chipXDimension = chipXDimension
+        self.chipYDimension = chipYDimension
+        self.pairTraffic = pairTraffic
+
+    def floorplanner(self):
+        return area_group_tool.detachedFloorplanner(self.chipXDimension,
+                                                    self.chipYDimension,
+                                                    self.pairTraffic)
+
+
+##
+## syntheticInstance --
+##   A random design of numGroups area groups.  Areas are log-normal.
+##   Groups communicate mostly with their neighbors in a random design
+##   order, as pipelines do, at a few traffic levels.  The chip is a
+##   square sized so that the padded group areas fill utilization of it.
+##
+def syntheticInstance(numGroups, seed=0, utilization=0.6, channelsPerGroup=3):
+    rng = random.Random(seed * 1000003 + numGroups)
+
+    names = ['group%03d' % i for i in range(numGroups)]
+    pairTraffic = {}
+    for i in range(numGroups):
+        for c in range(channelsPerGroup):
+            # Mostly local, occasionally anywhere.
+            if (rng.random() < 0.8):
+                j = i + rng.choice([-2, -1, 1, 2])
+            else:
+                j = rng.randrange(numGroups)
+            if (j < 0 or j >= numGroups or j == i):
+                continue
+            pair = tuple(sorted([names[i], names[j]]))
+            pairTraffic[pair] = pairTraffic.get(pair, 0) + 10 * rng.choice([0.5, 1, 2, 4])
+
+    floorplanner = area_group_tool.detachedFloorplanner(0, 0, pairTraffic)
+    areaGroups = {}
+    paddedArea = 0
+    for name in names:
+        group = AreaGroup(name, '')
+        group.area = int(rng.lognormvariate(math.log(2000), 0.8)) + 100
+        floorplanner.assignAspectRatios(group)
+        areaGroups[name] = group
+        paddedArea += floorplanner.withExtraArea(group.area)
+
+    side = int(math.ceil(math.sqrt(paddedArea / utilization)))
+    return Instance('synthetic_%d_%d' % (numGroups, seed), areaGroups, side, side, pairTraffic)
+
+##
+## recordedInstance --
+##   An instance from a build's areagroups.elaborated.pickle.  chip, if
+##   given, overrides the recorded chip dimensions.  Without either, the
+##   chip is a square of twice the groups' total area.
+##
+def recordedInstance(path, chip=None):
+    handle = open(path, 'rb')
+    areaGroups = pickle.load(handle)
+    handle.close()
+
+    problem = {'chip': None, 'pairTraffic': {}}
+    problemPath = os.path.join(os.path.dirname(path), 'areagroups.problem.pickle')
+    if (os.path.exists(problemPath)):
+        handle = open(problemPath, 'rb')
+        problem = pickle.load(handle)
+        handle.close()
+
+    if (chip is None):
+        chip = problem['chip']
+    if (chip is None):
+        totalArea = sum([max(_dimensionOptions(group)) for group in areaGroups.values()])
+        side = int(math.ceil(math.sqrt(2 * totalArea)))
+        chip = (side, side)
+
+    name = os.path.basename(os.path.dirname(os.path.abspath(path))) or path
+    return Instance(name, areaGroups, chip[0], chip[1], problem['pairTraffic'])
+
+def _dimensionOptions(group):
+    if (isinstance(group.xDimension, list)):
+        return [x * y for (x, y) in zip(group.xDimension, group.yDimension)]
+    return [group.xDimension * group.yDimension]
+
+
+##
+## Backends run in a forked worker so that a solver exceeding the time
+## limit can be abandoned.  The worker finds its floorplanner and input
+## in these globals, inherited across the fork.
+##
+_benchmarkFloorplanner = None
+_benchmarkAreaGroups = None
+
+def _runBackend(backend):
+    (name, (engine, modulesAtATime)) = backend
+    workDir = tempfile.mkdtemp(prefix='floorplan_benchmark_')
+    cwd = os.getcwd()
+    start = time.time()
+    try:
+        # The ILP solver writes its models to the current directory.
+        os.chdir(workDir)
+        strategy = (name, 'fresh', engine, modulesAtATime, None)
+        placed = _benchmarkFloorplanner.runStrategy(strategy, {'fresh': _benchmarkAreaGroups})
+        return (placed, time.time() - start, None)
+    except ImportError, e:
+        return (None, 0, 'unavailable: ' + str(e))
+    except Exception, e:
+        return (None, time.time() - start, str(e))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir, True)
+
+def runBackend(instance, floorplanner, backend, timeout):
+    global _benchmarkFloorplanner
+    global _benchmarkAreaGroups
+
+    _benchmarkFloorplanner = floorplanner
+    _benchmarkAreaGroups = instance.areaGroups
+
+    pool = multiprocessing.Pool(1)
+    try:
+        result = pool.apply_async(_runBackend, (backend,))
+        try:
+            return result.get(timeout)
+        except multiprocessing.TimeoutError:
+            return (None, timeout, 'timeout')
+    finally:
+        pool.terminate()
+        pool.join()
+        _benchmarkFloorplanner = None
+        _benchmarkAreaGroups = None
+
+
+##
+## legal --
+##   None if placed is a legal placement of areaGroups on the chip,
+##   otherwise the reason it is not.  As in the placers, groups overlap
+##   only if both are EMPTYBOXes.
+##
+def legal(instance, placed):
+    for name in instance.areaGroups:
+        if (not name in placed or placed[name].xLoc is None):
+            return 'unplaced ' + name
+
+    names = sorted(placed.keys())
+    for name in names:
+        group = placed[name]
+        if (group.xLoc < 0 or group.yLoc < 0 or
+            group.xLoc + group.xDimension > instance.chipXDimension + 1e-6 or
+            group.yLoc + group.yDimension > instance.chipYDimension + 1e-6):
+            return 'off chip ' + name
+
+    for a in range(len(names)):
+        groupA = placed[names[a]]
+        for b in range(a + 1, len(names)):
+            groupB = placed[names[b]]
+            if (('EMPTYBOX' in groupA.attributes) and ('EMPTYBOX' in groupB.attributes)):
+                continue
+            if (groupA.xLoc < groupB.xLoc + groupB.xDimension - 1e-6 and
+                groupB.xLoc < groupA.xLoc + groupA.xDimension - 1e-6 and
+                groupA.yLoc < groupB.yLoc + groupB.yDimension - 1e-6 and
+                groupB.yLoc < groupA.yLoc + groupA.yDimension - 1e-6):
+                return 'overlap ' + groupA.name + ' ' + groupB.name
+
+    return None
+
+def _center(group):
+    return (group.xLoc + group.xDimension / 2.0, group.yLoc + group.yDimension / 2.0)
+
+##
+## measure --
+##   Benchmark one backend on one instance.  Returns a row of COLUMNS.
+##
+def measure(instance, backend, timeout):
+    floorplanner = instance.floorplanner()
+    (placed, seconds, error) = runBackend(instance, floorplanner, backend, timeout)
+
+    row = dict([(column, None) for column in COLUMNS])
+    row.update({'instance': instance.name,
+                'groups': len(instance.areaGroups),
+                'backend': backend[0],
+                'success': False,
+                'seconds': round(seconds, 3),
+                'error': error})
+
+    if (placed is None):
+        if (error is None):
+            row['error'] = 'infeasible'
+        return row
+
+    error = legal(instance, placed)
+    if (error is not None):
+        row['error'] = error
+        return row
+
+    names = sorted(placed.keys())
+    maxDistance = 0.0
+    for a in range(len(names)):
+        for b in range(a + 1, len(names)):
+            if (floorplanner.communicationWeight(placed[names[a]], placed[names[b]]) > 0):
+                (xA, yA) = _center(placed[names[a]])
+                (xB, yB) = _center(placed[names[b]])
+                maxDistance = max(maxDistance, math.sqrt((xA - xB)**2 + (yA - yB)**2))
+
+    coords = [_center(placed[name]) for name in names]
+    start = time.time()
+    tour = tsp.travelingSalesman(coords)
+    sortSeconds = time.time() - start
+
+    row.update({'success': True,
+                'area_slack': round(sum([placed[name].xDimension * placed[name].yDimension - placed[name].area
+                                         for name in names]), 1),
+                'wirelength': round(floorplanner.placementCost(placed), 1),
+                'max_distance': round(maxDistance, 1),
+                'sort_seconds': round(sortSeconds, 3),
+                'tour_length': round(tsp.matrix_tour_length(tsp.distance_matrix(coords), tour), 1)})
+    return row
+
+##
+## summarize --
+##   Per backend success rate and mean metrics over successful runs.
+##
+def summarize(rows):
+    summary = {}
+    for (name, engine) in BACKENDS:
+        runs = [row for row in rows if row['backend'] == name]
+        if (len(runs) == 0):
+            continue
+        successes = [row for row in runs if row['success']]
+        entry = {'runs': len(runs),
+                 'success_rate': round(len(successes) / float(len(runs)), 3)}
+        for metric in ['seconds', 'area_slack', 'wirelength', 'max_distance', 'sort_seconds', 'tour_length']:
+            if (len(successes) > 0):
+                entry[metric] = round(sum([row[metric] for row in successes]) / len(successes), 3)
+            else:
+                entry[metric] = None
+        summary[name] = entry
+    return summary
+
+def writeCSV(rows, fileName):
+    handle = open(fileName, 'wb')
+    writer = csv.DictWriter(handle, COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+    handle.close()
+
+def writeJSON(rows, label, fileName):
+    handle = open(fileName, 'w')
+    json.dump({'label': label,
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'summary': summarize(rows),
+               'results': rows},
+              handle, indent=2, sort_keys=True)
+    handle.write('\n')
+    handle.close()
+
+##
+## benchmark --
+##   Run backends (names from BACKENDS) on instances.  A backend found
+##   unavailable, e.g. the ILP without python-glpk, is skipped for the
+##   remaining instances.
+##
+def benchmark(instances, backends=None, timeout=600, verbose=True):
+    if (backends is None):
+        backends = [name for (name, engine) in BACKENDS]
+
+    unavailable = set()
+    rows = []
+    for instance in instances:
+        for backend in BACKENDS:
+            if (not backend[0] in backends or backend[0] in unavailable):
+                continue
+
+            row = measure(instance, backend, timeout)
+            if (row['error'] is not None and row['error'].startswith('unavailable')):
+                print "Backend " + backend[0] + " " + row['error']
+                unavailable.add(backend[0])
+                continue
+
+            rows.append(row)
+            if (verbose):
+                print "%-20s %-9s %-5s %8.2f s  slack %10s  wirelength %12s  max distance %8s  %s" % \
+                      (instance.name, row['backend'], str(row['success']), row['seconds'],
+                       str(row['area_slack']), str(row['wirelength']), str(row['max_distance']),
+                       row['error'] or '')
+    return rows
+
+
+if __name__ == "__main__":
+    (opts, args) = getopt.getopt(sys.argv[1:], '',
+                                 ['synthetic=', 'seeds=', 'utilization=', 'chip=', 'backends=',
+                                  'timeout=', 'csv=', 'json=', 'label='])
+
+    sizes = []
+    seeds = 1
+    utilization = 0.6
+    chip = None
+    backends = None
+    timeout = 600
+    csvFile = None
+    jsonFile = None
+    label = ''
+    for (opt, value) in opts:
+        if (opt == '--synthetic'):
+            sizes = [int(size) for size in value.split(',')]
+        elif (opt == '--seeds'):
+            seeds = int(value)
+        elif (opt == '--utilization'):
+            utilization = float(value)
+        elif (opt == '--chip'):
+            chip = tuple([int(dimension) for dimension in value.split(',')])
+        elif (opt == '--backends'):
+            backends = value.split(',')
+        elif (opt == '--timeout'):
+            timeout = float(value)
+        elif (opt == '--csv'):
+            csvFile = value
+        elif (opt == '--json'):
+            jsonFile = value
+        elif (opt == '--label'):
+            label = value
+
+    instances = [recordedInstance(path, chip) for path in args]
+    for size in sizes:
+        for seed in range(seeds):
+            instances.append(syntheticInstance(size, seed, utilization))
+
+    if (len(instances) == 0):
+        print "No instances: give --synthetic sizes or areagroups.elaborated.pickle files"
+        sys.exit(1)
+
+    rows = benchmark(instances, backends, timeout)
+
+    for (name, entry) in sorted(summarize(rows).items()):
+        print "%-9s success %5.1f%%  %s s  wirelength %s" % \
+              (name, 100 * entry['success_rate'], str(entry['seconds']), str(entry['wirelength']))
+
+    if (csvFile is not None):
+        writeCSV(rows, csvFile)
+    if (jsonFile is not None):
+        writeJSON(rows, label, jsonFile)
@@ -0,0 +1,55 @@
+
+# area_group_parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'AREAGROUP ATTRIBUTE COMMA COMMENT DIMENSION EQUAL FPGA IN INT LOCATION LOWERLEFT NAME NONE PATH RESOURCE SEMICOLON STRING UPPERRIGHT\n    constraint_list :\n    constraint_list : comment                  constraint_list\n    constraint_list : group_statement          constraint_list\n    constraint_list : in_statement             constraint_list\n    constraint_list : location_statement       constraint_list\n    constraint_list : dimension_statement      constraint_list\n    constraint_list : chip_dimension_statement constraint_list\n    constraint_list : path_statement           constraint_list\n    constraint_list : resource_statement       constraint_list\n    constraint_list : lower_left_statement     constraint_list\n    constraint_list : upper_right_statement    constraint_list\n    constraint_list : attribute_statement      constraint_list\n    \n    group_statement : AREAGROUP NAME EQUAL STRING SEMICOLON\n    group_statement : AREAGROUP NAME EQUAL NONE   SEMICOLON\n    \n    path_statement : PATH NAME EQUAL STRING SEMICOLON\n    \n    resource_statement : RESOURCE NAME NAME EQUAL INT SEMICOLON\n    \n    in_statement : NAME IN NAME SEMICOLON\n    \n    location_statement : LOCATION NAME INT COMMA INT SEMICOLON\n    \n    dimension_statement : DIMENSION NAME INT COMMA INT SEMICOLON\n    \n    chip_dimension_statement : DIMENSION FPGA INT COMMA INT SEMICOLON\n    \n    lower_left_statement : LOWERLEFT NAME INT COMMA INT SEMICOLON\n    \n    upper_right_statement : UPPERRIGHT NAME INT COMMA INT SEMICOLON\n    \n    attribute_statement : ATTRIBUTE NAME STRING EQUAL STRING SEMICOLON\n    attribute_statement : ATTRIBUTE NAME STRING EQUAL INT    SEMICOLON\n    \n    comment : COMMENT\n    '
+    
+_lr_action_items = {'COMMENT':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[8,8,8,8,8,8,-25,8,8,8,8,8,8,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'NONE':([47,],[57,]),'SEMICOLON':([50,54,57,58,66,67,70,71,72,73,74,75,],[61,65,68,69,76,77,78,79,80,81,82,83,]),'RESOURCE':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[9,9,9,9,9,9,-25,9,9,9,9,9,9,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'NAME':([0,1,2,3,5,6,7,8,9,10,11,12,13,14,15,16,18,19,20,21,22,29,38,61,65,68,69,76,77,78,79,80,81,82,83,],[17,17,17,17,26,17,17,-25,29,17,17,32,17,17,35,37,17,40,41,42,17,45,50,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'AREAGROUP':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[15,15,15,15,15,15,-25,15,15,15,15,15,15,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'UPPERRIGHT':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[20,20,20,20,20,20,-25,20,20,20,20,20,20,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'ATTRIBUTE':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[19,19,19,19,19,19,-25,19,19,19,19,19,19,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'IN':([17,],[38,]),'EQUAL':([26,35,45,51,],[44,47,55,62,]),'FPGA':([16,],[36,]),'COMMA':([46,48,49,52,53,],[56,59,60,63,64,]),'LOCATION':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[12,12,12,12,12,12,-25,12,12,12,12,12,12,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'PATH':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[5,5,5,5,5,5,-25,5,5,5,5,5,5,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'LOWERLEFT':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[21,21,21,21,21,21,-25,21,21,21,21,21,21,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'STRING':([40,44,47,62,],[51,54,58,73,]),'INT':([32,36,37,41,42,55,56,59,60,62,63,64,],[46,48,49,52,53,66,67,70,71,72,74,75,]),'DIMENSION':([0,1,2,3,6,7,8,10,11,13,14,18,22,61,65,68,69,76,77,78,79,80,81,82,83,],[16,16,16,16,16,16,-25,16,16,16,16,16,16,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),'$end':([0,1,2,3,4,6,7,8,10,11,13,14,18,22,23,24,25,27,28,30,31,33,34,39,43,61,65,68,69,76,77,78,79,80,81,82,83,],[-1,-1,-1,-1,0,-1,-1,-25,-1,-1,-1,-1,-1,-1,-2,-9,-5,-11,-6,-12,-3,-7,-4,-10,-8,-17,-15,-14,-13,-16,-18,-20,-19,-24,-23,-22,-21,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'comment':([0,1,2,3,6,7,10,11,13,14,18,22,],[1,1,1,1,1,1,1,1,1,1,1,1,]),'chip_dimension_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[13,13,13,13,13,13,13,13,13,13,13,13,]),'resource_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[2,2,2,2,2,2,2,2,2,2,2,2,]),'location_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[3,3,3,3,3,3,3,3,3,3,3,3,]),'lower_left_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[18,18,18,18,18,18,18,18,18,18,18,18,]),'attribute_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[10,10,10,10,10,10,10,10,10,10,10,10,]),'constraint_list':([0,1,2,3,6,7,10,11,13,14,18,22,],[4,23,24,25,27,28,30,31,33,34,39,43,]),'in_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[14,14,14,14,14,14,14,14,14,14,14,14,]),'group_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[11,11,11,11,11,11,11,11,11,11,11,11,]),'upper_right_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[6,6,6,6,6,6,6,6,6,6,6,6,]),'path_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[22,22,22,22,22,22,22,22,22,22,22,22,]),'dimension_statement':([0,1,2,3,6,7,10,11,13,14,18,22,],[7,7,7,7,7,7,7,7,7,7,7,7,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> constraint_list","S'",1,None,None,None),
+  ('constraint_list -> <empty>','constraint_list',0,'p_constraint_list','area_parse.py',24),
+  ('constraint_list -> comment constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',25),
+  ('constraint_list -> group_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',26),
+  ('constraint_list -> in_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',27),
+  ('constraint_list -> location_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',28),
+  ('constraint_list -> dimension_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',29),
+  ('constraint_list -> chip_dimension_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',30),
+  ('constraint_list -> path_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',31),
+  ('constraint_list -> resource_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',32),
+  ('constraint_list -> lower_left_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',33),
+  ('constraint_list -> upper_right_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',34),
+  ('constraint_list -> attribute_statement constraint_list','constraint_list',2,'p_constraint_list','area_parse.py',35),
+  ('group_statement -> AREAGROUP NAME EQUAL STRING SEMICOLON','group_statement',5,'p_group_statement','area_parse.py',49),
+  ('group_statement -> AREAGROUP NAME EQUAL NONE SEMICOLON','group_statement',5,'p_group_statement','area_parse.py',50),
+  ('path_statement -> PATH NAME EQUAL STRING SEMICOLON','path_statement',5,'p_path_statement','area_parse.py',57),
+  ('resource_statement -> RESOURCE NAME NAME EQUAL INT SEMICOLON','resource_statement',6,'p_resource_statement','area_parse.py',64),
+  ('in_statement -> NAME IN NAME SEMICOLON','in_statement',4,'p_in_statement','area_parse.py',72),
+  ('location_statement -> LOCATION NAME INT COMMA INT SEMICOLON','location_statement',6,'p_location_statement','area_parse.py',79),
+  ('dimension_statement -> DIMENSION NAME INT COMMA INT SEMICOLON','dimension_statement',6,'p_dimension_statement','area_parse.py',87),
+  ('chip_dimension_statement -> DIMENSION FPGA INT COMMA INT SEMICOLON','chip_dimension_statement',6,'p_chip_dimension_statement','area_parse.py',94),
+  ('lower_left_statement -> LOWERLEFT NAME INT COMMA INT SEMICOLON','lower_left_statement',6,'p_lower_left_statement','area_parse.py',101),
+  ('upper_right_statement -> UPPERRIGHT NAME INT COMMA INT SEMICOLON','upper_right_statement',6,'p_upper_right_statement','area_parse.py',108),
+  ('attribute_statement -> ATTRIBUTE NAME STRING EQUAL STRING SEMICOLON','attribute_statement',6,'p_attribute_statement','area_parse.py',115),
+  ('attribute_statement -> ATTRIBUTE NAME STRING EQUAL INT SEMICOLON','attribute_statement',6,'p_attribute_statement','area_parse.py',116),
+  ('comment -> COMMENT','comment',1,'p_comment','area_parse.py',123),
+]
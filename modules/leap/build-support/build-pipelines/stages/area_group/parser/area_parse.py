@@ -1,4 +1,5 @@
 import sys
+import ast
 import ply.yacc as yacc
 import area_group
 from area_group_location import *
@@ -8,6 +9,16 @@ from area_group_resource import *
 from area_group_relationship import *
 from area_group_attribute import *
 
+##
+## literal --
+##   Value of a STRING, INT or NONE token.  Tokens come from constraint
+##   files, so they are decoded as literals rather than evaluated.
+##
+def literal(token):
+    if(token.isdigit()):
+        return int(token)
+    return ast.literal_eval(token)
+
 def p_constraint_list(p):
     """
     constraint_list :
@@ -39,21 +50,21 @@ def p_group_statement(p):
     group_statement : AREAGROUP NAME EQUAL NONE   SEMICOLON
     """
 
-    p[0] = area_group.AreaGroup(p[2], eval(p[4]))
+    p[0] = area_group.AreaGroup(p[2], literal(p[4]))
 
 def p_path_statement(p):
     """
     path_statement : PATH NAME EQUAL STRING SEMICOLON
     """
 
-    p[0] = AreaGroupPath(p[2], eval(p[4]))
+    p[0] = AreaGroupPath(p[2], literal(p[4]))
 
 def p_resource_statement(p):
     """
     resource_statement : RESOURCE NAME NAME EQUAL INT SEMICOLON
     """
 
-    p[0] = AreaGroupResource(p[2], p[3], eval(p[5]))
+    p[0] = AreaGroupResource(p[2], p[3], literal(p[5]))
 
 
 def p_in_statement(p):
@@ -68,7 +79,7 @@ def p_location_statement(p):
     location_statement : LOCATION NAME INT COMMA INT SEMICOLON
     """
 
-    p[0] = AreaGroupLocation(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupLocation(p[2], literal(p[3]), literal(p[5]))
 
 
 def p_dimension_statement(p):
@@ -76,28 +87,28 @@ def p_dimension_statement(p):
     dimension_statement : DIMENSION NAME INT COMMA INT SEMICOLON
     """
 
-    p[0] = AreaGroupSize(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupSize(p[2], literal(p[3]), literal(p[5]))
 
 def p_chip_dimension_statement(p):
     """
     chip_dimension_statement : DIMENSION FPGA INT COMMA INT SEMICOLON
     """
 
-    p[0] = AreaGroupSize(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupSize(p[2], literal(p[3]), literal(p[5]))
 
 def p_lower_left_statement(p):
     """
     lower_left_statement : LOWERLEFT NAME INT COMMA INT SEMICOLON
     """
 
-    p[0] = AreaGroupLowerLeft(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupLowerLeft(p[2], literal(p[3]), literal(p[5]))
 
 def p_upper_right_statement(p):
     """
     upper_right_statement : UPPERRIGHT NAME INT COMMA INT SEMICOLON
     """
 
-    p[0] = AreaGroupUpperRight(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupUpperRight(p[2], literal(p[3]), literal(p[5]))
 
 def p_attribute_statement(p):
     """
@@ -105,7 +116,7 @@ def p_attribute_statement(p):
     attribute_statement : ATTRIBUTE NAME STRING EQUAL INT    SEMICOLON
     """
 
-    p[0] = AreaGroupAttribute(p[2], eval(p[3]), eval(p[5]))
+    p[0] = AreaGroupAttribute(p[2], literal(p[3]), literal(p[5]))
 
 def p_comment(p):
     """
@@ -1,25 +1,124 @@
+import os
+import copy
+import hashlib
+import cPickle as pickle
 import ply.yacc as yacc
 import ply.lex as lex
 from area_lex import *
 from area_parse import *
+import area_group_parsetab
 
 areaParserCompiled = False
 areaParser = None 
 areaLexer = None 
 
-def parseAreaGroupConstraints(area_group_file):
+## The parse tables are generated once and shipped alongside the
+## grammar as area_group_parsetab.py.  They are read, never written:
+## tables for another PLY version are generated into the build's parse
+## cache directory instead.
+areaParserTables = 'area_group_parsetab.pickle'
+
+## Bump when the parser output changes so that cached ASTs are dropped. 
+areaParserVersion = 2
+
+## Parsed constraint files, keyed by content hash.  Shared by every
+## stage that reads the same constraints within a build.
+areaGroupConstraintsCache = {}
+
+def parseAreaGroupConstraints(area_group_file, cacheDirectory=None):
     # build the compiler
     global areaParser
     global areaLexer
     global areaParserCompiled
 
-    if(not areaParserCompiled):
-        areaLexer = lex.lex()
-        areaParser = yacc.yacc()
-        areaParserCompiled = True
-
     print "FLOORPLANNER: " + str(area_group_file)
 
     areaGroupDescription = (open(area_group_file, 'r')).read()
-    areaGroupConstraints = areaParser.parse(areaGroupDescription, lexer=areaLexer)
-    return areaGroupConstraints
+    key = hashlib.md5(str(areaParserVersion) + areaGroupDescription).hexdigest()
+
+    if(not key in areaGroupConstraintsCache):
+        areaGroupConstraints = loadCachedConstraints(cacheDirectory, key)
+
+        if(areaGroupConstraints is None):
+            if(not areaParserCompiled):
+                areaLexer = lex.lex()
+                areaParser = buildAreaParser(cacheDirectory)
+                areaParserCompiled = True
+
+            areaGroupConstraints = areaParser.parse(areaGroupDescription, lexer=areaLexer)
+            storeCachedConstraints(cacheDirectory, key, areaGroupConstraints)
+
+        areaGroupConstraintsCache[key] = areaGroupConstraints
+
+    # Callers bind the parsed objects into their own area group maps and
+    # modify them, so each gets a private copy.
+    return copy.deepcopy(areaGroupConstraintsCache[key])
+
+##
+## buildAreaParser --
+##   The area group parser, from the shipped tables if PLY can read them.
+##
+def buildAreaParser(cacheDirectory):
+    if((area_group_parsetab._tabversion == yacc.__tabversion__) or (cacheDirectory is None)):
+        return yacc.yacc(tabmodule=area_group_parsetab, write_tables=0, debug=False)
+
+    if(not os.path.isdir(cacheDirectory)):
+        os.makedirs(cacheDirectory)
+    return yacc.yacc(picklefile=os.path.join(cacheDirectory, areaParserTables), debug=False)
+
+##
+## loadAreaGroupConstraints --
+##   Area groups pickled by the floorplanner and later stages.  They share
+##   areaGroupConstraintsCache with parsed constraint files, so a stage
+##   loading the same file many times unpickles it once.  Like parsed
+##   constraints, each caller gets a private copy.
+##
+def loadAreaGroupConstraints(pickleFile):
+    handle = open(pickleFile, 'rb')
+    contents = handle.read()
+    handle.close()
+
+    key = hashlib.md5('pickle ' + contents).hexdigest()
+    if(not key in areaGroupConstraintsCache):
+        areaGroupConstraintsCache[key] = pickle.loads(contents)
+
+    return copy.deepcopy(areaGroupConstraintsCache[key])
+
+##
+## Parsed constraints persist across builds as pickles named by content
+## hash in cacheDirectory, if one is given.
+##
+def loadCachedConstraints(cacheDirectory, key):
+    if(cacheDirectory is None):
+        return None
+
+    cacheFile = os.path.join(cacheDirectory, key + '.agrp.pickle')
+    if(not os.path.exists(cacheFile)):
+        return None
+
+    try:
+        handle = open(cacheFile, 'rb')
+        areaGroupConstraints = pickle.load(handle)
+        handle.close()
+        return areaGroupConstraints
+    except Exception:
+        print "FLOORPLANNER: ignoring unreadable parse cache " + cacheFile
+        return None
+
+def storeCachedConstraints(cacheDirectory, key, areaGroupConstraints):
+    if(cacheDirectory is None):
+        return
+
+    try:
+        if(not os.path.isdir(cacheDirectory)):
+            os.makedirs(cacheDirectory)
+
+        cacheFile = os.path.join(cacheDirectory, key + '.agrp.pickle')
+        tmpFile = cacheFile + '.' + str(os.getpid())
+        handle = open(tmpFile, 'wb')
+        pickle.dump(areaGroupConstraints, handle, protocol=-1)
+        handle.close()
+        os.rename(tmpFile, cacheFile)
+    except (IOError, OSError):
+        # The cache only saves time.
+        pass
@@ -0,0 +1,219 @@
+##
+## Persistent cache of area group placements.
+##
+## Each entry is keyed by a canonical fingerprint of the placement
+## problem: group names and paths, bucketed areas, user constraints, the
+## chip dimensions and the communication weights between groups.  Group
+## shapes are not part of the key, since they follow from the areas.  A
+## build whose fingerprint matches an entry reuses the cached placement
+## without solving, as long as the cached shapes still suit its groups.
+## Otherwise the most similar entry may seed the solver.
+##
+## Entries are pickles named by fingerprint.  The least recently used
+## entries are evicted once the cache holds more than maxEntries.
+##
+
+import os
+import math
+import hashlib
+import cPickle as pickle
+
+## Areas within 1% of one another fall in the same fingerprint bucket.
+AREA_BUCKET_RATIO = 1.01
+
+
+class PlacementCache():
+
+    def __init__(self, directory, maxEntries=32, debug=False):
+        self.directory = directory
+        self.maxEntries = maxEntries
+        self.debug = debug
+
+    ##
+    ## fingerprint --
+    ##   Canonical digest of a placement problem.  weightFunction is the
+    ##   floorplanner's pairwise communication weight.
+    ##
+    def fingerprint(self, areaGroups, chipXDimension, chipYDimension, weightFunction):
+        names = sorted(areaGroups.keys())
+
+        rep = [('chip', chipXDimension, chipYDimension)]
+        for name in names:
+            group = areaGroups[name]
+            rep.append((name,
+                        group.sourcePath,
+                        areaBucket(group.area),
+                        group.xLoc,
+                        group.yLoc,
+                        cornerRep(group.lowerLeft),
+                        cornerRep(group.upperRight),
+                        sorted(group.attributes.items()),
+                        None if group.parent is None else group.parent.name))
+
+        for a in range(len(names)):
+            for b in range(a + 1, len(names)):
+                weight = weightFunction(areaGroups[names[a]], areaGroups[names[b]])
+                if (weight != 0):
+                    rep.append((names[a], names[b], weight))
+
+        return hashlib.md5(repr(rep)).hexdigest()
+
+    ##
+    ## lookup --
+    ##   Placement cached under fingerprint, or None.  The placement is
+    ##   returned only if it is feasible for areaGroups.
+    ##
+    def lookup(self, fingerprint, areaGroups, chipXDimension, chipYDimension):
+        entry = self._load(self._entryPath(fingerprint))
+        if (entry is None):
+            return None
+
+        if (not feasiblePlacement(entry['placement'], areaGroups, chipXDimension, chipYDimension)):
+            if (self.debug):
+                print "Placement cache: entry " + fingerprint + " does not fit the area groups"
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(self._entryPath(fingerprint), None)
+        return entry['placement']
+
+    ##
+    ## nearest --
+    ##   Cached placement for the same chip most similar to areaGroups, or
+    ##   None if no entry shares at least minSimilarity.  Similarity sums
+    ##   min(area) / max(area) over the groups present in both and divides
+    ##   by the number of groups in either.
+    ##
+    def nearest(self, areaGroups, chipXDimension, chipYDimension, minSimilarity=0.5):
+        best = None
+        bestSimilarity = minSimilarity
+        for path in self._entryPaths():
+            entry = self._load(path)
+            if (entry is None or entry['chip'] != (chipXDimension, chipYDimension)):
+                continue
+
+            areas = entry['areas']
+            names = set(areas.keys()) | set(areaGroups.keys())
+            similarity = 0.0
+            for name in names:
+                if (name in areas and name in areaGroups):
+                    a = max(abs(areas[name]), 1)
+                    b = max(abs(areaGroups[name].area), 1)
+                    similarity += min(a, b) / float(max(a, b))
+            similarity /= max(len(names), 1)
+
+            if (similarity > bestSimilarity):
+                best = entry
+                bestSimilarity = similarity
+
+        if (best is None):
+            return None
+
+        if (self.debug):
+            print "Placement cache: nearest entry " + best['fingerprint'] + " similarity " + str(bestSimilarity)
+
+        return best['placement']
+
+    ##
+    ## store --
+    ##   Add a placement to the cache and evict old entries.
+    ##
+    def store(self, fingerprint, areaGroups, chipXDimension, chipYDimension, strategy=None):
+        if (not os.path.isdir(self.directory)):
+            os.makedirs(self.directory)
+
+        areas = {}
+        for name in areaGroups:
+            areas[name] = areaGroups[name].area
+
+        entry = {'fingerprint': fingerprint,
+                 'chip': (chipXDimension, chipYDimension),
+                 'areas': areas,
+                 'strategy': strategy,
+                 'placement': areaGroups}
+
+        # Write then rename so that concurrent builds sharing the cache
+        # never see a partial entry.
+        path = self._entryPath(fingerprint)
+        tmpPath = path + '.' + str(os.getpid())
+        handle = open(tmpPath, 'wb')
+        pickle.dump(entry, handle, protocol=-1)
+        handle.close()
+        os.rename(tmpPath, path)
+
+        self._evict()
+
+    def _evict(self):
+        paths = self._entryPaths()
+        if (len(paths) <= self.maxEntries):
+            return
+
+        paths.sort(key=lambda path: os.path.getmtime(path))
+        for path in paths[:len(paths) - self.maxEntries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entryPath(self, fingerprint):
+        return os.path.join(self.directory, fingerprint + '.pickle')
+
+    def _entryPaths(self):
+        if (not os.path.isdir(self.directory)):
+            return []
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                if f.endswith('.pickle')]
+
+    def _load(self, path):
+        if (not os.path.exists(path)):
+            return None
+        try:
+            handle = open(path, 'rb')
+            entry = pickle.load(handle)
+            handle.close()
+            return entry
+        except Exception:
+            # Damaged entries are dropped.
+            print "Placement cache: ignoring unreadable entry " + path
+            return None
+
+
+def areaBucket(area):
+    if (area is None):
+        return None
+    return int(round(math.log(max(area, 1)) / math.log(AREA_BUCKET_RATIO)))
+
+##
+## feasiblePlacement --
+##   Whether a cached placement, whose areas may differ from areaGroups by
+##   up to a bucket, suits areaGroups.  Every group must be placed on the
+##   chip in a rectangle covering its smallest candidate shape, or with
+##   exactly the shape the user gave it.
+##
+def feasiblePlacement(placement, areaGroups, chipXDimension, chipYDimension):
+    for name in areaGroups:
+        group = areaGroups[name]
+        placed = placement.get(name)
+        if (placed is None or placed.xLoc is None or
+            isinstance(placed.xDimension, list) or placed.xDimension is None):
+            return False
+
+        if ((placed.xLoc + placed.xDimension > chipXDimension + 0.5) or
+            (placed.yLoc + placed.yDimension > chipYDimension + 0.5)):
+            return False
+
+        if (isinstance(group.xDimension, list)):
+            smallest = min([x * y for (x, y) in zip(group.xDimension, group.yDimension)])
+            if (placed.xDimension * placed.yDimension * AREA_BUCKET_RATIO < smallest):
+                return False
+        elif (group.xDimension is not None):
+            if ((abs(placed.xDimension - group.xDimension) > 0.5) or
+                (abs(placed.yDimension - group.yDimension) > 0.5)):
+                return False
+
+    return True
+
+def cornerRep(corner):
+    if (corner is None):
+        return None
+    return (corner.xCoordinate, corner.yCoordinate)
@@ -1,8 +1,11 @@
 ##
-## Traveling salesman using simulated annealing, derived from:
+## Traveling salesman.  travelingSalesman() uses 2-opt/Or-opt local search
+## (below).  The original simulated annealing solver, derived from:
 ##
 ##    http://www.psychicorigami.com/2007/06/28/tackling-the-travelling-salesman-problem-simmulated-annealing/
 ##
+## is kept as travelingSalesmanAnneal() for comparison.  Run
+## "python tsp.py --benchmark 500" to compare the two.
 ##
 
 ##
@@ -14,6 +17,15 @@ import random
 import sys
 import getopt
 import math
+import time
+import collections
+import multiprocessing
+
+# NumPy speeds up building the distance matrix but is not required.
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 ## We always want the same result, but don't want to affect other random
 ## sequences.
@@ -178,14 +190,15 @@ def run_anneal(init_function,objective_function,max_iterations,start_temp,alpha)
     return iterations,score,best
 
 
-def travelingSalesman(coords,
-                      max_iterations = 25000,
-                      start_temp = 10,
-                      alpha = 0.99995,
-                      verbose = False):
+def travelingSalesmanAnneal(coords,
+                            max_iterations = 25000,
+                            start_temp = 10,
+                            alpha = 0.99995,
+                            verbose = False):
     '''
-    Solve the traveling salesman problem given a list of coordinates.  Returns
-    the ordered path as a list of node IDs.
+    Solve the traveling salesman problem given a list of coordinates using
+    simulated annealing.  Returns the ordered path as a list of node IDs.
+    Superseded by travelingSalesman() and kept for comparison.
     '''
     # Always return the same result.
     pvtRandom.seed(1)
@@ -204,7 +217,373 @@ def travelingSalesman(coords,
     return best
 
 
+
+## ========================================================================
+## 
+##  Local search: 2-opt and Or-opt with neighbor lists.
+##
+##  Moves are evaluated in O(1) from the distance matrix: only the edges
+##  a move removes and adds are summed.  The tour is touched only when a
+##  move improves it.  Cities whose neighborhood changed are queued for
+##  another look ("don't look bits").  Iterated local search perturbs the
+##  best tour with double-bridge kicks and keeps improvements.
+##
+## ========================================================================
+
+## Candidate moves only consider this many nearest cities.
+NUM_NEIGHBORS = 10
+
+EPSILON = 1e-9
+
+## Iterated local search stops after this many kicks in a row fail to
+## shorten the tour.  Small tours reach their best long before the kick
+## budget is spent.
+MAX_STALLED_KICKS = 50
+
+def distance_matrix(coords):
+    '''
+    Straight line distance between every pair of coordinates as a list of
+    rows, using NumPy when it is available.
+    '''
+    if (numpy is not None):
+        points = numpy.array(coords, dtype=float).reshape(len(coords), 2)
+        delta = points[:, numpy.newaxis, :] - points[numpy.newaxis, :, :]
+        return numpy.sqrt((delta * delta).sum(axis=2)).tolist()
+
+    return [[math.sqrt((x1-x2)*(x1-x2) + (y1-y2)*(y1-y2)) for (x2,y2) in coords]
+            for (x1,y1) in coords]
+
+
+def neighbor_lists(matrix, num_neighbors):
+    '''
+    The num_neighbors closest cities to each city, nearest first.
+    '''
+    size=len(matrix)
+    if (numpy is not None):
+        order=numpy.argsort(numpy.array(matrix), axis=1, kind='mergesort')
+        return [[c for c in row if c != i][:num_neighbors] for (i,row) in enumerate(order.tolist())]
+
+    return [[c for c in sorted(range(size), key=lambda c: (matrix[i][c], c)) if c != i][:num_neighbors]
+            for i in range(size)]
+
+
+def matrix_tour_length(matrix,tour):
+    total=0
+    for i in range(len(tour)):
+        total+=matrix[tour[i-1]][tour[i]]
+    return total
+
+
+def nearest_neighbor_tour(matrix,start):
+    size=len(matrix)
+    unvisited=set(range(size))
+    unvisited.remove(start)
+    tour=[start]
+    while unvisited:
+        row=matrix[tour[-1]]
+        nearest=min(unvisited, key=lambda c: (row[c], c))
+        unvisited.remove(nearest)
+        tour.append(nearest)
+    return tour
+
+
+class LocalSearch:
+    '''
+    Tour with O(1) position lookup and 2-opt/Or-opt improvement.
+    '''
+    def __init__(self,matrix,neighbors,tour):
+        self.matrix=matrix
+        self.neighbors=neighbors
+        self.setTour(tour)
+
+    def setTour(self,tour):
+        self.tour=list(tour)
+        self.size=len(tour)
+        self.pos=[0]*self.size
+        for (i,c) in enumerate(self.tour):
+            self.pos[c]=i
+
+    def succ(self,c):
+        return self.tour[(self.pos[c]+1) % self.size]
+
+    def pred(self,c):
+        return self.tour[self.pos[c]-1]
+
+    def reverse(self,a,b):
+        '''
+        Reverse the path running forward from city a to city b.  The
+        complementary path is reversed instead when it is shorter, which
+        yields the same cycle.
+        '''
+        size=self.size
+        i=self.pos[a]
+        j=self.pos[b]
+        length=(j-i) % size + 1
+        if (2*length > size):
+            (i,j)=((j+1) % size, (i-1) % size)
+            length=size-length
+        tour=self.tour
+        pos=self.pos
+        for step in xrange(length // 2):
+            ci=tour[i]
+            cj=tour[j]
+            tour[i]=cj
+            pos[cj]=i
+            tour[j]=ci
+            pos[ci]=j
+            i=(i+1) % size
+            j=(j-1) % size
+
+    def try2opt(self,a):
+        d=self.matrix
+        # Successor side: replace (a,b) and (c,e) by (a,c) and (b,e).
+        b=self.succ(a)
+        dab=d[a][b]
+        for c in self.neighbors[a]:
+            dac=d[a][c]
+            if (dac >= dab):
+                break
+            e=self.succ(c)
+            if (c == b or e == a):
+                continue
+            if (dac + d[b][e] - dab - d[c][e] < -EPSILON):
+                self.reverse(b,c)
+                return (a,b,c,e)
+
+        # Predecessor side: replace (b,a) and (e,c) by (a,c) and (b,e).
+        b=self.pred(a)
+        dab=d[a][b]
+        for c in self.neighbors[a]:
+            dac=d[a][c]
+            if (dac >= dab):
+                break
+            e=self.pred(c)
+            if (c == b or e == a):
+                continue
+            if (dac + d[b][e] - dab - d[c][e] < -EPSILON):
+                self.reverse(c,b)
+                return (a,b,c,e)
+
+        return None
+
+    def tryOrOpt(self,a):
+        '''
+        Move the segment of 1 to 3 cities starting at a next to one of the
+        segment ends' neighbors, in either orientation.
+        '''
+        d=self.matrix
+        size=self.size
+        for length in (1,2,3):
+            if (size < length + 3):
+                break
+
+            i=self.pos[a]
+            segment=[self.tour[(i+k) % size] for k in range(length)]
+            first=segment[0]
+            last=segment[-1]
+            p=self.tour[i-1]
+            n=self.tour[(i+length) % size]
+            removeGain=d[p][first] + d[last][n] - d[p][n]
+            if (removeGain <= EPSILON):
+                continue
+
+            best=None
+            bestDelta=-EPSILON
+            for end in (first,last):
+                other=last if end is first else first
+                for c in self.neighbors[end]:
+                    if (c in segment):
+                        continue
+                    # Insert between c and its successor or predecessor,
+                    # with end next to c.
+                    for (cn, endFirst) in ((self.succ(c), True), (self.pred(c), False)):
+                        if (cn in segment):
+                            continue
+                        delta=d[c][end] + d[other][cn] - d[c][cn] - removeGain
+                        if (delta < bestDelta):
+                            bestDelta=delta
+                            best=(c,cn,end,endFirst)
+
+            if (best is None):
+                continue
+
+            (c,cn,end,endFirst)=best
+            # Rebuild the tour with the segment moved.  The segment is
+            # laid out so that end touches c.
+            rest=[city for city in self.tour if not city in segment]
+            moved=segment if end is first else segment[::-1]
+            if (endFirst):
+                k=rest.index(c) + 1
+                rest[k:k]=moved
+            else:
+                k=rest.index(c)
+                rest[k:k]=moved[::-1]
+            self.setTour(rest)
+            return tuple(segment) + (p,n,c,cn)
+
+        return None
+
+    def optimize(self,active=None):
+        '''
+        Apply improving moves until none is left, starting from the cities
+        in active (default: all).  Returns the number of moves applied.
+        '''
+        if (active is None):
+            active=list(self.tour)
+        queue=collections.deque(active)
+        queued=set(active)
+        moves=0
+        while queue:
+            a=queue.popleft()
+            queued.discard(a)
+            touched=self.try2opt(a)
+            if (touched is None):
+                touched=self.tryOrOpt(a)
+            if (touched is None):
+                continue
+            moves+=1
+            for c in touched + (a,):
+                if (not c in queued):
+                    queue.append(c)
+                    queued.add(c)
+        return moves
+
+
+def double_bridge(tour,rng):
+    '''
+    Classic 4-opt kick: split the tour in four parts A B C D and reconnect
+    them as A C B D.  Returns the new tour and the cities at the cuts.
+    '''
+    size=len(tour)
+    (i,j,k)=sorted(rng.sample(range(1,size),3))
+    cuts=[tour[0], tour[-1], tour[i-1], tour[i], tour[j-1], tour[j], tour[k-1], tour[k]]
+    return (tour[:i] + tour[j:k] + tour[i:j] + tour[k:], cuts)
+
+
+def solve_from_start(matrix,neighbors,seed,kicks):
+    '''
+    One deterministic run: nearest neighbor construction from a seeded
+    start, local search, then up to kicks iterated local search kicks,
+    stopping early once MAX_STALLED_KICKS in a row find nothing better.
+    '''
+    rng=random.Random(seed)
+    size=len(matrix)
+    search=LocalSearch(matrix,neighbors,nearest_neighbor_tour(matrix,rng.randrange(size)))
+    search.optimize()
+    best=list(search.tour)
+    best_length=matrix_tour_length(matrix,best)
+
+    if (size >= 8):
+        stalled=0
+        for kick in xrange(kicks):
+            (kicked,cuts)=double_bridge(best,rng)
+            search.setTour(kicked)
+            # Only the cities next to the new edges need a fresh look.
+            search.optimize(cuts)
+            length=matrix_tour_length(matrix,search.tour)
+            if (length < best_length - EPSILON):
+                best=list(search.tour)
+                best_length=length
+                stalled=0
+            else:
+                stalled+=1
+                if (stalled >= MAX_STALLED_KICKS):
+                    break
+
+    return (best_length,seed,best)
+
+
+## Worker state for parallel multi-start, inherited across fork.
+_pvtMatrix=None
+_pvtNeighbors=None
+
+def _solve_from_start_worker(args):
+    (seed,kicks)=args
+    return solve_from_start(_pvtMatrix,_pvtNeighbors,seed,kicks)
+
+
+def travelingSalesman(coords,
+                      max_iterations = 25000,
+                      starts = 1,
+                      jobs = 1,
+                      verbose = False):
+    '''
+    Solve the traveling salesman problem given a list of coordinates.  Returns
+    the ordered path as a list of node IDs.
+
+    Each of the starts runs local search from its own deterministically
+    seeded nearest neighbor tour and spends a budget of at most
+    max_iterations / len(coords) double-bridge kicks.  With jobs > 1 the
+    starts run in a process pool.  The shortest tour wins, ties going to
+    the earliest start, so the result is the same for any jobs.
+    '''
+    global _pvtMatrix
+    global _pvtNeighbors
+
+    size=len(coords)
+    if (size <= 3):
+        return range(size)
+
+    matrix=distance_matrix(coords)
+    neighbors=neighbor_lists(matrix,NUM_NEIGHBORS)
+    kicks=max(1, max_iterations // size)
+
+    # Always return the same result.
+    work=[(1 + start, kicks) for start in range(max(starts,1))]
+    if (jobs > 1 and len(work) > 1):
+        _pvtMatrix=matrix
+        _pvtNeighbors=neighbors
+        pool=multiprocessing.Pool(min(jobs,len(work)))
+        try:
+            results=pool.map(_solve_from_start_worker,work)
+        finally:
+            pool.terminate()
+            pool.join()
+            _pvtMatrix=None
+            _pvtNeighbors=None
+    else:
+        results=[solve_from_start(matrix,neighbors,seed,k) for (seed,k) in work]
+
+    (best_length,seed,best)=min(results)
+
+    # output results
+    if (verbose):
+        print "Starts:     " + str(len(work))
+        print "Kicks:      " + str(kicks)
+        print "Length:     " + str(best_length)
+
+    return best
+
+
+def tsp_benchmark(size, verbose = True):
+    '''
+    Compare the annealing and local search solvers on size random
+    coordinates.
+    '''
+    rng=random.Random(size)
+    coords=[(rng.uniform(0,1000), rng.uniform(0,1000)) for i in range(size)]
+    matrix=distance_matrix(coords)
+
+    results=[]
+    for (name,solver) in (('anneal',travelingSalesmanAnneal), ('local',travelingSalesman)):
+        start=time.time()
+        path=solver(coords)
+        elapsed=time.time() - start
+        length=matrix_tour_length(matrix,path)
+        results.append((name,elapsed,length))
+        if (verbose):
+            print "%-8s %8.2f s  length %10.1f" % (name, elapsed, length)
+
+    return results
+
+
 if __name__ == "__main__":
+    (opts, args) = getopt.getopt(sys.argv[1:], '', ['benchmark='])
+    for (opt, value) in opts:
+        if (opt == '--benchmark'):
+            tsp_benchmark(int(value))
+            sys.exit(0)
+
     ##
     ## Solve a simple problem:
     ##
@@ -2,6 +2,7 @@ import os
 import sys
 import re
 import string
+import shutil
 import cPickle as pickle
 import SCons.Script
 import SCons.Node.FS
@@ -93,6 +94,12 @@ class BSV():
         self.TMP_BSC_DIR = moduleList.env['DEFS']['TMP_BSC_DIR']
         self.BUILD_LOGS_ONLY = moduleList.getAWBParam('bsv_tool', 'BUILD_LOGS_ONLY')
         self.USE_BVI = moduleList.getAWBParam('bsv_tool', 'USE_BVI')
+        self.BSC_LOG_CACHE = moduleList.getAWBParam('bsv_tool', 'BSC_LOG_CACHE')
+        self.BSV_IFC_BATCH = moduleList.getAWBParam('bsv_tool', 'BSV_IFC_BATCH')
+
+        # Interface type queries deferred to a single bluetcl session.
+        # Entries are (module, target path, wrapper bo).
+        self.ifc_batch = []
 
         self.pipeline_debug = model.getBuildPipelineDebug(moduleList)
 
@@ -117,7 +124,7 @@ class BSV():
         if moduleList.env.GetOption('clean'):
             for module in topo:
                 MODULE_PATH =  get_build_path(moduleList, module)
-                os.system('cd '+ MODULE_PATH + '/' + self.TMP_BSC_DIR + '; rm -f *.ba *.c *.h *.sched *.log *.v *.bo *.str')
+                os.system('cd '+ MODULE_PATH + '/' + self.TMP_BSC_DIR + '; rm -f *.ba *.c *.h *.sched *.log *.log.conns *.v *.bo *.str *.str.idx *.ifc.batch; rm -rf log_cache')
 
         topo.pop() # get rid of top module.
 
@@ -159,6 +166,10 @@ class BSV():
             ## the top module.
             self.build_synth_boundary(moduleList, moduleList.topModule)
 
+            ## Interface types of all boundaries are extracted together.
+            if (len(self.ifc_batch) > 0):
+                self.build_interface_batch(moduleList)
+
             ## Merge all synthesis boundaries using a tree?  The tree reduces
             ## the number of connections merged in a single compilation, allowing
             ## us to support larger systems.
@@ -180,12 +191,20 @@ class BSV():
                     all_str_src.extend(module.moduleDependency['STR'])
 
             if (self.BUILD_LOGS_ONLY == 0):
-                bsc_str = moduleList.env.Command(self.TMP_BSC_DIR + '/' + moduleList.env['DEFS']['APM_NAME'] + '.str',
+                ## The merged table is deduplicated and written along with
+                ## a binary index.  Neither file is rewritten unless the
+                ## merged contents change, so they are kept precious to
+                ## prevent SCons from removing them before the merge.
+                str_name = moduleList.env['DEFS']['APM_NAME'] + '.str'
+                bsc_str = moduleList.env.Command([self.TMP_BSC_DIR + '/' + str_name,
+                                                  self.TMP_BSC_DIR + '/' + str_name + '.idx'],
                                                  all_str_src,
-                                                 [ 'cat $SOURCES > $TARGET'])
-                strDep = moduleList.env.Command(moduleList.env['DEFS']['APM_NAME'] + '.str',
+                                                 bsv_tool.buildGlobalStringTable)
+                moduleList.env.Precious(bsc_str)
+                strDep = moduleList.env.Command([str_name, str_name + '.idx'],
                                                 bsc_str,
-                                                [ 'ln -fs ' + self.TMP_BSC_DIR + '/`basename $TARGET` $TARGET' ])
+                                                [ 'ln -fs ' + self.TMP_BSC_DIR + '/`basename ${TARGETS[0]}` ${TARGETS[0]}',
+                                                  'ln -fs ' + self.TMP_BSC_DIR + '/`basename ${TARGETS[1]}` ${TARGETS[1]}' ])
                 moduleList.topDependency += [strDep]
 
 
@@ -340,23 +359,10 @@ class BSV():
         # anything changed.  The file describes dependence between derived objects
         # and sources.  Here, we need to know about all possible source changes.
         # Scan the file looking for source file names.
-        if os.path.isfile(depends_bsv):
-            df = open(depends_bsv, 'r')
-            dep_lines = df.readlines()
-
-            # Match .bsv and .bsh files
-            bsv_file_pattern = re.compile('\S+.[bB][sS][vVhH]$')
-
-            all_bsc_files = []
-            for ln in dep_lines:
-                all_bsc_files += [f for f in re.split('[:\s]+', ln) if (bsv_file_pattern.match(f))]
-
-            # Sort dependence in case SCons cares
-            for f in sorted(all_bsc_files):
-                if os.path.exists(f):
-                    moduleList.env.Depends(dep, f)
-
-            df.close()
+        # Sort dependence in case SCons cares
+        for f in bsv_tool.getBluespecSourceClosure(depends_bsv):
+            if os.path.exists(f):
+                moduleList.env.Depends(dep, f)
 
         return dep
 
@@ -392,7 +398,7 @@ class BSV():
         # This function is responsible for creating build rules for
         # subdirectories.  It must be called or no subdirectory builds
         # will happen since scons won't have the recipe.
-        self.setup_module_build(moduleList, MODULE_PATH)
+        self.setup_module_build(moduleList, MODULE_PATH, MODULE_PATH + '/' + module.dependsFile)
 
         if not os.path.isdir(self.TMP_BSC_DIR):
             os.mkdir(self.TMP_BSC_DIR)
@@ -443,7 +449,7 @@ class BSV():
                 stub_name = bsv.replace('.bsv', '_con_size.bsh')
 
                 def build_con_size_bsh_closure(target, source, env):
-                    liGraph = LIGraph(li_module.parseLogfiles(source))
+                    liGraph = LIGraph(li_module.parseLogfilesCached(source))
                     # Should have only one module...
                     if(len(liGraph.modules) == 0):
                         bshModule = LIModule(module.name, module.name)
@@ -478,12 +484,18 @@ class BSV():
                     moduleList.topDependency += \
                         module.moduleDependency['BSV_SCHED'] + module.moduleDependency['BSV_PATH']
 
-                    module.moduleDependency['BSV_IFC'] = \
-                        [moduleList.env.Command(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba.ifc',
-                                                wrapper_bo,
-                                                'bluetcl ' + model_dir.File('interfaceType.tcl').path + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --m ' + module.wrapperName() + ' | python site_scons/model/PythonTidy.py > $TARGET')]
+                    ifc_path = MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba.ifc'
+                    if (self.BSV_IFC_BATCH):
+                        ## Built later by build_interface_batch().
+                        self.ifc_batch.append((module, ifc_path, wrapper_bo))
+                    else:
+                        module.moduleDependency['BSV_IFC'] = \
+                            [moduleList.env.Command(ifc_path,
+                                                    wrapper_bo,
+                                                    ['bluetcl ' + model_dir.File('interfaceType.tcl').path + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --m ' + module.wrapperName() + ' > $TARGET',
+                                                     bsv_tool.formatInterfaceFiles])]
 
-                    moduleList.topDependency += module.moduleDependency['BSV_IFC']
+                        moduleList.topDependency += module.moduleDependency['BSV_IFC']
 
 
 
@@ -532,7 +544,7 @@ class BSV():
                 module.moduleDependency['BSV_SYNTH_BSH'] = [module.name +'_Wrapper_con_size.bsh']
 
                 def build_synth_stub(target, source, env):
-                    liGraph = LIGraph(li_module.parseLogfiles(source))
+                    liGraph = LIGraph(li_module.parseLogfilesCached(source))
                     # Should have only one module...
                     if(len(liGraph.modules) == 0):
                         synthModule = LIModule(module.name, module.name)
@@ -602,6 +614,44 @@ class BSV():
             return [bb] #This doesn't seem to do anything.
 
 
+    ##
+    ## build_interface_batch --
+    ##   Extract the interface types of all deferred wrappers in a single
+    ##   bluetcl session.  Each module still gets its own .ba.ifc target,
+    ##   all produced by one command.
+    ##
+    def build_interface_batch(self, moduleList):
+        model_dir = self.hw_dir.Dir(moduleList.env['DEFS']['ROOT_DIR_MODEL'])
+        ifc_tcl = model_dir.File('interfaceType.tcl').path
+        batch_file = self.TMP_BSC_DIR + '/' + moduleList.env['DEFS']['APM_NAME'] + '.ifc.batch'
+        bluetcl_cmd = 'bluetcl ' + ifc_tcl + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --batch ' + batch_file
+
+        modules = [m for (m, ifc, bo) in self.ifc_batch]
+        ifc_paths = [ifc for (m, ifc, bo) in self.ifc_batch]
+        wrapper_bos = [bo for (m, ifc, bo) in self.ifc_batch]
+
+        def build_interface_batch_closure(target, source, env):
+            batch = open(batch_file, 'w')
+            for (module, ifc) in zip(modules, target):
+                batch.write(module.wrapperName() + ' ' + str(ifc) + '\n')
+            batch.close()
+
+            status = env.Execute(bluetcl_cmd)
+            if (status):
+                return status
+
+            return bsv_tool.formatInterfaceFiles(target, source, env)
+
+        ifcs = moduleList.env.Command(ifc_paths,
+                                      wrapper_bos,
+                                      build_interface_batch_closure)
+
+        for (module, ifc) in zip(modules, ifcs):
+            module.moduleDependency['BSV_IFC'] = [ifc]
+
+        moduleList.topDependency += ifcs
+
+
     ##
     ## As of Bluespec 2008.11.C the -bdir target is put at the head of the search path
     ## and the compiler complains about duplicate path entries.
@@ -713,14 +763,65 @@ class BSV():
     ## connections and to generate the global string table.
     ## Kill compilation as soon as all the log data is generated, since
     ## no binary is needed.
-    def compile_log_only(self, module_path):
+    ##
+    ## When the log cache is enabled and the dependence file of the
+    ## boundary is known, the command is wrapped by cached_log_only() below.
+    ## The signature SCons sees is still the bsc command.
+    def compile_log_only(self, module_path, depends_file=None):
         def compile_log_only_closure(source, target, env, for_signature):
             cmd = self.compile_bo_bsc_base(target, module_path) + ' -KILLexpanded ' + str(source[0]) + \
                   ' 2>&1 | tee ' + str(target[0]) + ' ; test $${PIPESTATUS[0]} -eq 0'
-            return cmd
+            if (for_signature or (depends_file is None) or not self.BSC_LOG_CACHE):
+                return cmd
+            return self.cached_log_only(cmd, depends_file)
         return compile_log_only_closure
 
 
+    ##
+    ## cached_log_only --
+    ##   The first pass log depends only on the log and wrapper sources of a
+    ##   boundary and on the files they import.  Hash all of them, along with
+    ##   the compiler command, and reuse the log from the previous build if
+    ##   nothing changed.  The cache lives in the boundary's build directory
+    ##   since SCons removes the log target before rebuilding it.
+    ##
+    def cached_log_only(self, cmd, depends_file):
+        def cached_log_only_closure(target, source, env):
+            logfile = str(target[0])
+            cache_dir = os.path.join(os.path.dirname(logfile), 'log_cache')
+            cached_log = os.path.join(cache_dir, os.path.basename(logfile))
+            cached_sig = cached_log + '.sig'
+
+            srcs = [str(s) for s in source] + bsv_tool.getBluespecSourceClosure(depends_file)
+            sig = bsv_tool.bscSignature(cmd, srcs)
+
+            if (os.path.exists(cached_log) and os.path.exists(cached_sig)):
+                sig_handle = open(cached_sig, 'r')
+                old_sig = sig_handle.read()
+                sig_handle.close()
+                if (old_sig == sig):
+                    print 'Reusing first pass log: ' + logfile
+                    shutil.copyfile(cached_log, logfile)
+                    return 0
+
+            status = env.Execute(cmd)
+            if (status != 0):
+                return status
+
+            if not os.path.isdir(cache_dir):
+                os.mkdir(cache_dir)
+            shutil.copyfile(logfile, cached_log)
+            sig_handle = open(cached_sig, 'w')
+            sig_handle.write(sig)
+            sig_handle.close()
+
+            # Parse the fresh log now so that the connection cache is
+            # ready for the LI graph and the stub builders.
+            li_module.parseLogfilesCached([logfile])
+            return 0
+        return cached_log_only_closure
+
+
     ## Builder for generating a binary and a log file.
     def compile_bo_log(self, module_path):
         def compile_bo_log_closure(source, target, env, for_signature):
@@ -739,7 +840,7 @@ class BSV():
 
     ## This function binds the Builder objects for a given module and inserts them into the
     ## SCons environment.  One wonders if inserting them into the environment is necessary.
-    def setup_module_build(self, moduleList, module_path):
+    def setup_module_build(self, moduleList, module_path, depends_file=None):
         ## create builders for this particular module.  To do this, we bind module_path local
         ## to this module
         bsc = moduleList.env.Builder(generator = self.compile_bo(module_path), suffix = '.bo', src_suffix = '.bsv',
@@ -750,6 +851,6 @@ class BSV():
         # This guy has to depend on children existing?
         # and requires a bash shell
         moduleList.env['SHELL'] = 'bash' # coerce commands to be spanwed under bash
-        bsc_log_only = moduleList.env.Builder(generator = self.compile_log_only(module_path), suffix = '.log', src_suffix = '.bsv')
+        bsc_log_only = moduleList.env.Builder(generator = self.compile_log_only(module_path, depends_file), suffix = '.log', src_suffix = '.bsv')
 
         moduleList.env.Append(BUILDERS = {'BSC' : bsc, 'BSC_LOG' : bsc_log, 'BSC_LOG_ONLY' : bsc_log_only})
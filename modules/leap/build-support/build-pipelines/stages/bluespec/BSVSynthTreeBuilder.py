@@ -454,7 +454,7 @@ class BSVSynthTreeBuilder():
 
         # If we got a graph from the first pass, merge it in now.
         if (self.getFirstPassLIGraph is None):
-            liGraph = LIGraph(li_module.parseLogfiles(boundary_logs))
+            liGraph = LIGraph(li_module.parseLogfilesCached(boundary_logs))
         else:
             #cut_tree_build may modify the first pass graph, so we need
             #to make a copy
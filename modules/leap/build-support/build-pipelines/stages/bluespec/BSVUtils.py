@@ -9,21 +9,37 @@
 import os
 import re
 import sys
-import subprocess
+import struct
+import hashlib
 
 import model
 
+##
+## Bluespec library inventory.  Listing the compiler release directories is
+## done once per directory and the results are cached, since the release
+## does not change during a build.
+##
+bluespecDirCache = {}
+
+def listBluespecDir(dirPath):
+    if (dirPath not in bluespecDirCache):
+        try:
+            bluespecDirCache[dirPath] = tuple(sorted(os.listdir(dirPath)))
+        except OSError:
+            bluespecDirCache[dirPath] = ()
+    return bluespecDirCache[dirPath]
+
 ##
 ## get_bluespec_verilog --
 ##     Return a list of Verilog files from the Bluespec compiler release.
 ##
-def get_bluespec_verilog(env, resultArray = {}, filePath='Verilog'):
+def get_bluespec_verilog(env, resultArray = None, filePath='Verilog'):
+    if (resultArray is None):
+        resultArray = {}
+
     bluespecdir = env['ENV']['BLUESPECDIR']
     
-    fileProc = subprocess.Popen(["ls", "-1", bluespecdir + '/' + filePath + '/'], stdout = subprocess.PIPE)
-    fileList = fileProc.stdout.read()
-    fileArray = model.clean_split(fileList, sep = '\n')
-    for file in fileArray:
+    for file in listBluespecDir(bluespecdir + '/' + filePath):
         ## Skip some Bluespec Verilog files because they cause problems...
         if ((file == 'main.v') or (file == 'ConstrainedRandom.v')):
             continue
@@ -38,10 +54,7 @@ def get_bluespec_verilog(env, resultArray = {}, filePath='Verilog'):
         if (file[-2:] == '.v'):
             resultArray[file] = bluespecdir + '/' + filePath + '/' + file
 
-    fileProc = subprocess.Popen(["ls", "-1", bluespecdir + '/Libraries/'], stdout = subprocess.PIPE)
-    fileList = fileProc.stdout.read()
-    fileArray = model.clean_split(fileList, sep = '\n')
-    for file in fileArray:
+    for file in listBluespecDir(bluespecdir + '/Libraries'):
         if ((file[-2:] == '.v') and
             (file[:6] != 'xilinx')):
             resultArray[file] = bluespecdir + '/Libraries/' + file
@@ -105,25 +118,287 @@ def getBluespecVersion():
     return getBluespecVersion.version
 
 ##
-## decorateBluespecLibraryCode --
-##     Decorates the module list with information about Bluespec library files.
+## getBluespecSourceClosure --
+##     Return the sorted list of Bluespec source files (.bsv and .bsh) named
+##     in a dependence file written by leap-bsc-mkdepend.  The list is the
+##     transitive closure of imports and includes of the files for which
+##     the dependence was computed.
 ##
-def decorateBluespecLibraryCode(moduleList):
-    # get the baseline verilog
-    bsvBaselineArray = get_bluespec_verilog(moduleList.env)
+##     Results are remembered for as long as the dependence file is
+##     unchanged, which matters to a long-running build server.
+##
+bluespecSourceClosureCache = {}
+
+def getBluespecSourceClosure(dependsFile):
+    if not os.path.isfile(dependsFile):
+        return []
+
+    st = os.stat(dependsFile)
+    stamp = (st.st_mtime, st.st_size)
+    if ((dependsFile in bluespecSourceClosureCache) and
+        (bluespecSourceClosureCache[dependsFile][0] == stamp)):
+        return list(bluespecSourceClosureCache[dependsFile][1])
+
+    # Match .bsv and .bsh files
+    bsv_file_pattern = re.compile('\S+.[bB][sS][vVhH]$')
+
+    all_bsc_files = set()
+    df = open(dependsFile, 'r')
+    for ln in df:
+        all_bsc_files.update([f for f in re.split('[:\s]+', ln) if (bsv_file_pattern.match(f))])
+    df.close()
+
+    bluespecSourceClosureCache[dependsFile] = (stamp, tuple(sorted(all_bsc_files)))
+    return sorted(all_bsc_files)
+
+##
+## bscSignature --
+##     Content signature of a compilation: the command plus the contents
+##     of every source file.  Used to decide whether cached compiler output
+##     is still valid.
+##
+def bscSignature(cmd, srcFiles):
+    sig = hashlib.md5()
+    sig.update(cmd)
+    for f in sorted(set(srcFiles)):
+        sig.update(f)
+        if os.path.exists(f):
+            fh = open(f, 'rb')
+            sig.update(fh.read())
+            fh.close()
+    return sig.hexdigest()
+
+##
+## Global string tables.  The compiler writes one table per compiled module,
+## with records of the form:
+##
+##     <uid>,<string>X!gLb!X\n
+##
+## where <string> may span multiple lines.  The binary index form read by
+## global-strings.cpp is:
+##
+##     "GSTRIDX1" <count:u32> { <uid:u32> <offset:u32> <length:u32> }* <blob>
+##
+## with records sorted by UID and all values little endian.  Strings with
+## identical contents share storage in the blob.
+##
+GLOBAL_STRING_TAG = 'X!gLb!X'
+GLOBAL_STRING_IDX_MAGIC = 'GSTRIDX1'
+
+##
+## parseGlobalStrings --
+##     Return the list of (uid, string) records in a global string file.
+##
+def parseGlobalStrings(strFile):
+    fh = open(strFile, 'rb')
+    text = fh.read()
+    fh.close()
+
+    records = []
+    pos = 0
+    record_pattern = re.compile('\s*(\d+),')
+    while True:
+        m = record_pattern.match(text, pos)
+        if (m is None):
+            break
+        end = text.find(GLOBAL_STRING_TAG, m.end())
+        if (end < 0):
+            break
+        records.append((int(m.group(1)), text[m.end():end]))
+        pos = end + len(GLOBAL_STRING_TAG)
+
+    return records
+
+##
+## mergeGlobalStrings --
+##     Merge per-module global string files into a single table, removing
+##     duplicate UIDs.  Returns a dictionary mapping UID to string.  Two
+##     different strings sharing a UID is a fatal error.
+##
+def mergeGlobalStrings(strFiles):
+    table = {}
+    for strFile in strFiles:
+        for (uid, s) in parseGlobalStrings(strFile):
+            if (uid in table):
+                if (table[uid] != s):
+                    print 'Error: global strings "' + table[uid] + '" and "' + s + '" share UID ' + str(uid)
+                    sys.exit(1)
+            else:
+                table[uid] = s
+
+    return table
+
+##
+## globalStringTableText / globalStringTableIndex --
+##     Text and binary index forms of a merged global string table.
+##
+def globalStringTableText(table):
+    return ''.join([str(uid) + ',' + table[uid] + GLOBAL_STRING_TAG + '\n' for uid in sorted(table)])
+
+def globalStringTableIndex(table):
+    uids = sorted(table)
+
+    blob = []
+    blob_len = 0
+    offsets = {}
+    entries = []
+    for uid in uids:
+        s = table[uid]
+        if (s not in offsets):
+            offsets[s] = blob_len
+            blob.append(s)
+            blob_len += len(s)
+        entries.append(struct.pack('<III', uid, offsets[s], len(s)))
+
+    return GLOBAL_STRING_IDX_MAGIC + struct.pack('<I', len(uids)) + ''.join(entries) + ''.join(blob)
+
+##
+## writeIfChanged --
+##     Write a file only if its contents would change.  Unchanged files keep
+##     their time stamps, so nothing downstream is rebuilt.  Returns True if
+##     the file was written.
+##
+def writeIfChanged(path, contents):
+    if (os.path.exists(path)):
+        fh = open(path, 'rb')
+        old = fh.read()
+        fh.close()
+        if (old == contents):
+            return False
+
+    fh = open(path, 'wb')
+    fh.write(contents)
+    fh.close()
+    return True
+
+##
+## buildGlobalStringTable --
+##     SCons action merging per-module global string files.  target[0] is
+##     the text table and target[1] the binary index.  The text table is
+##     written first, so the index is never older than the table it
+##     describes.
+##
+def buildGlobalStringTable(target, source, env):
+    table = mergeGlobalStrings([str(s) for s in source])
+    changed = writeIfChanged(str(target[0]), globalStringTableText(table))
+    changed = writeIfChanged(str(target[1]), globalStringTableIndex(table)) or changed
+    if (not changed):
+        print 'Global string table ' + str(target[0]) + ' is unchanged'
+
+##
+## formatInterfaceRep --
+##     Format the Python representation of a Bluespec interface emitted by
+##     interfaceType.tcl.  Dictionary members are placed one per line,
+##     indented by nesting depth.  The representation is checked for
+##     syntax here, rather than failing later when wrapper generation
+##     evaluates it.
+##
+def formatInterfaceRep(rep, indentStr = '    '):
+    rep = rep.strip()
+    compile(rep, '<interface>', 'eval')
+
+    out = []
+    # Stack of open brackets.  Only dictionaries ('{') are broken across
+    # lines, so the indentation depth is the number of open dictionaries.
+    stack = []
+    depth = 0
+    pos = 0
+    while (pos < len(rep)):
+        c = rep[pos]
+
+        if ((c == "'") or (c == '"')):
+            ## Copy quoted strings verbatim
+            end = pos + 1
+            while ((end < len(rep)) and (rep[end] != c)):
+                if (rep[end] == '\\'):
+                    end += 1
+                end += 1
+            out.append(rep[pos:end + 1])
+            pos = end + 1
+            continue
+
+        if (c in '([{'):
+            stack.append(c)
+            out.append(c)
+            if ((c == '{') and (rep[pos + 1:].lstrip()[:1] != '}')):
+                depth += 1
+                out.append('\n' + indentStr * depth)
+                pos = len(rep) - len(rep[pos + 1:].lstrip()) - 1
+        elif (c in ')]}'):
+            opener = stack.pop()
+            if ((opener == '{') and (out[-1] != '{')):
+                depth -= 1
+                out.append('\n' + indentStr * depth)
+            out.append(c)
+        elif ((c == ',') and stack and (stack[-1] == '{')):
+            out.append(c + '\n' + indentStr * depth)
+            pos = len(rep) - len(rep[pos + 1:].lstrip()) - 1
+        else:
+            out.append(c)
 
-    # Is there tool specific code?
+        pos += 1
+
+    return ''.join(out) + '\n'
+
+##
+## formatInterfaceFiles --
+##     SCons action formatting, in place, the interface representations
+##     written to each target by interfaceType.tcl.
+##
+def formatInterfaceFiles(target, source, env):
+    for t in target:
+        fh = open(str(t), 'r')
+        rep = fh.read()
+        fh.close()
+
+        fh = open(str(t), 'w')
+        fh.write(formatInterfaceRep(rep))
+        fh.close()
+
+##
+## getBluespecLibraryInventory --
+##     Return the immutable, sorted set of Bluespec library Verilog files
+##     used by this build, keyed by the tool-specific flavor of the
+##     library.  The set is computed once and shared.
+##
+bluespecLibraryInventory = {}
+
+def getBluespecLibraryInventoryKey(moduleList):
     if (not moduleList.getAWBParamSafe('synthesis_tool', 'USE_VIVADO_SOURCES') is None):
-        bsvVerilog = get_bluespec_verilog(moduleList.env, resultArray = bsvBaselineArray, filePath = 'Verilog.Vivado').values()
+        return 'Verilog.Vivado'
     elif (not moduleList.getAWBParamSafe('synthesis_tool', 'USE_QUARTUS_SOURCES') is None):
-        bsvVerilog = get_bluespec_verilog(moduleList.env, resultArray = bsvBaselineArray, filePath = 'Verilog.Quartus').values()
+        return 'Verilog.Quartus'
     else:
-        bsvVerilog = bsvBaselineArray.values()
+        return 'Verilog'
 
+def getBluespecLibraryInventory(moduleList, key = None):
+    if (key is None):
+        key = getBluespecLibraryInventoryKey(moduleList)
 
-    for module in moduleList.synthBoundaries():
-        model.dictionary_list_create_append(module.moduleDependency, 'VERILOG_LIB', bsvVerilog)
+    if (key not in bluespecLibraryInventory):
+        # get the baseline verilog
+        bsvVerilog = get_bluespec_verilog(moduleList.env)
 
-    model.dictionary_list_create_append(moduleList.topModule.moduleDependency, 'VERILOG_LIB', bsvVerilog)
+        # Is there tool specific code?
+        if (key != 'Verilog'):
+            bsvVerilog = get_bluespec_verilog(moduleList.env, resultArray = bsvVerilog, filePath = key)
 
+        bluespecLibraryInventory[key] = tuple(sorted(bsvVerilog.values()))
+
+    return bluespecLibraryInventory[key]
+
+##
+## decorateBluespecLibraryCode --
+##     Decorates the module list with information about Bluespec library files.
+##
+##     The library set is attached once, to the top module, instead of
+##     a private copy of the list on every synthesis boundary.  Every
+##     consumer collects VERILOG_LIB with getAllDependencies(), so the set
+##     of files seen by the backends is unchanged.
+##
+def decorateBluespecLibraryCode(moduleList):
+    bsvVerilog = getBluespecLibraryInventory(moduleList)
 
+    libs = moduleList.topModule.moduleDependency.setdefault('VERILOG_LIB', [])
+    present = set(libs)
+    libs.extend([v for v in bsvVerilog if (v not in present)])
@@ -25,10 +25,12 @@ proc usage {} {
     puts "   switches from compile (see bsc help for more detail):"
     puts "      -p <path>       - path, if suppled to bsc command (i.e. -p obj:+)"
     puts "      --m module      - module to examine)"
+    puts "      --batch file    - examine many modules.  Each line of file is"
+    puts "                        a module name followed by an output file"
     exit
 }
 
-set valOptions [list --m -p]
+set valOptions [list --m -p --batch]
 set boolOptions [list -verilog]
 
 if { [catch [list ::utils::scanOptions $boolOptions $valOptions true OPT "$argv"] opts] } {
@@ -45,11 +47,6 @@ Bluetcl::flags set -wait-for-license
 Bluetcl::flags set -verilog
 Bluetcl::flags set -p $OPT(-p):[join $libs ":"]
 
-# set path to whatever we were given on the command line
-set moduleTarget $OPT(--m)
-module load $moduleTarget
-
-set outStr ""    
 
 
 ###
@@ -165,7 +162,7 @@ proc analyzePrimary { elem prim ports methods } {
         "Clock"  { return [list "Primary" "Prim_Clock('$methodsName','$osc', '$gate')"] }
         "Reset"  { return [list "Primary" "Prim_Reset('$methodsName','$port', '$clock')"] }
     }
-    puts "ERROR unhandled primary type"
+    error "ERROR unhandled primary type $primType"
 }
 
 #
@@ -448,22 +445,50 @@ proc analyzeInterface { elem ifc ports methods} {
 ### Finally we print out the interface's python representation.  
 ###
 
-# Ports needs some massaging since the top level is not in a good format. 
-# Methods are needed because ports seem to drop information. 
-set modulePorts [module ports $moduleTarget]
-#puts stderr "MODULE PORTS: $modulePorts"
-set moduleMethods [module methods $moduleTarget]
-set ifcMethods [list "top" $moduleMethods]
-#puts stderr "MODULE METHODS: $moduleMethods"
-set ifcList [getInterface $modulePorts]
-set ifcPorts [list "interface" "top" $ifcList]
-set ifc [module ifc $moduleTarget]
-
-  
-set finalIfc [analyzeSwitch $ifc $ifcPorts $ifcMethods]
-
-#Print out the final python interface representation for capture.
-puts [lindex $finalIfc 1]
-
-
+proc analyzeModule { moduleTarget } {
+    module load $moduleTarget
+
+    # Ports needs some massaging since the top level is not in a good format. 
+    # Methods are needed because ports seem to drop information. 
+    set modulePorts [module ports $moduleTarget]
+    #puts stderr "MODULE PORTS: $modulePorts"
+    set moduleMethods [module methods $moduleTarget]
+    set ifcMethods [list "top" $moduleMethods]
+    #puts stderr "MODULE METHODS: $moduleMethods"
+    set ifcList [getInterface $modulePorts]
+    set ifcPorts [list "interface" "top" $ifcList]
+    set ifc [module ifc $moduleTarget]
+
+    set finalIfc [analyzeSwitch $ifc $ifcPorts $ifcMethods]
+    return [lindex $finalIfc 1]
+}
 
+if { [info exists OPT(--batch)] } {
+    # Batch mode: analyze every module named in the batch file in this
+    # session, writing each representation to its own file.  A module
+    # that can't be analyzed fails the whole batch.
+    set batchStatus 0
+    set batchFile [open $OPT(--batch) r]
+    while { [gets $batchFile line] >= 0 } {
+        if { [llength $line] != 2 } {
+            continue
+        }
+        if { [catch {analyzeModule [lindex $line 0]} rep] } {
+            puts stderr "[lindex $line 0]: $rep"
+            set batchStatus 1
+            continue
+        }
+        set outFile [open [lindex $line 1] w]
+        puts $outFile $rep
+        close $outFile
+    }
+    close $batchFile
+    exit $batchStatus
+} else {
+    #Print out the final python interface representation for capture.
+    if { [catch {analyzeModule $OPT(--m)} rep] } {
+        puts stderr "$OPT(--m): $rep"
+        exit 1
+    }
+    puts $rep
+}
@@ -0,0 +1,293 @@
+##
+## Resource reports.
+##
+## Synthesis and fitting tools report the resources of a module in
+## their own text formats.  Each format is described here by the lines
+## that carry a resource and how to read the numbers on them.  All of a
+## format's line labels are compiled into one alternation, so a report
+## is parsed in a single pass with one regular expression match per
+## line.
+##
+## A parsed report becomes a resource record, stored as JSON in the
+## module's .resources file:
+##
+##   {"module": "<name>", "report": "<format>",
+##    "resources": {"LUT": {"used": 1234, "total": 5678}, ...}}
+##
+## "total" is null when the tool gives no capacity.  loadResources()
+## reads records, and also the older colon separated lines
+##
+##   <name>:LUT:1234:TotalLUT:5678:...
+##
+## still found in given .resources files and earlier builds, into the
+## dictionary used by assignResources() and the floorplanner.
+##
+
+import os
+import re
+import json
+
+## Capacity stood in for resources whose capacity Vivado doesn't report.
+UNBOUNDED = 10000000
+
+
+##
+## ReportField --
+##   One resource line of a report.  label is the literal text starting
+##   (or, for unanchored formats, contained in) the line.  value is a
+##   regular expression whose groups are the used count and optionally
+##   the capacity.  It is matched against the text after the label when
+##   afterLabel is set and against the whole line otherwise.  A unique
+##   field found twice is an error.
+##
+class ReportField():
+
+    def __init__(self, name, label, value, afterLabel=False, unique=False):
+        self.name = name
+        self.label = label
+        self.value = re.compile(value)
+        self.afterLabel = afterLabel
+        self.unique = unique
+
+
+class ReportFormat():
+
+    def __init__(self, name, fields, anchored=True, derived=[]):
+        self.name = name
+        self.fields = fields
+        self.anchored = anchored
+        # Fields read to compute others but left out of the record.
+        self.derived = derived
+        self.pattern = re.compile('|'.join(['(?P<f%d>%s)' % (index, re.escape(field.label))
+                                            for (index, field) in enumerate(fields)]))
+
+    ##
+    ## parse --
+    ##   Map field name -> [used, capacity or None] of a report.
+    ##
+    def parse(self, lines):
+        if (self.anchored):
+            find = self.pattern.match
+        else:
+            find = self.pattern.search
+
+        values = {}
+        for line in lines:
+            match = find(line)
+            if (match is None):
+                continue
+
+            field = self.fields[int(match.lastgroup[1:])]
+            if (field.afterLabel):
+                number = field.value.match(line, match.end())
+            else:
+                number = field.value.search(line)
+            if (number is None):
+                continue
+
+            if (field.unique and field.name in values):
+                raise ValueError('resource ' + field.name + ' found more than once in ' + self.name + ' report')
+
+            groups = number.groups()
+            used = _number(groups[0])
+            total = None
+            if (len(groups) > 1 and groups[1] is not None):
+                total = _number(groups[1])
+            values[field.name] = [used, total]
+
+        return values
+
+
+def _number(text):
+    value = float(text.replace(',', ''))
+    if (value == int(value)):
+        return int(value)
+    return value
+
+def _used(values, name):
+    if (name in values):
+        return values[name][0]
+    return 0
+
+
+##
+## Slice estimates.  Placement is done in slices, which most reports
+## don't give.  These conversions are device specific and approximate.
+##
+
+def _slicesXST(values):
+    # Assume 6 LUTs per slice.
+    if ('LUT' in values):
+        total = values['LUT'][1]
+        return [int(values['LUT'][0] / 6.0), None if total is None else int(total / 6.0)]
+    return [0, 0]
+
+def _slicesVirtex7(values):
+    # Some 4/5 LUTs take a whole slice. We'll conservatively assume
+    # that they all do.
+    slice4LUTs = _used(values, 'LUT6') + _used(values, 'LUT5') + _used(values, 'LUT4') + \
+                 _used(values, 'SRL16E') + _used(values, 'RAMS32') + \
+                 2 * _used(values, 'RAMD32') + 2 * _used(values, 'RAMD64E')
+    slice8LUTs = _used(values, 'LUT1') + _used(values, 'LUT2') + _used(values, 'LUT3')
+    return [int(slice8LUTs) // 8 + int(slice4LUTs) // 4, UNBOUNDED]
+
+def _slicesSynplify(values):
+    # Synplify's LUT counts include half-LUT packing, so dividing by 4
+    # is right for the 7 series.
+    lutSlices = int(_used(values, 'LUT') / 4.0)
+    regSlices = int(_used(values, 'Reg') / 8.0)
+    ramSlices = int(_used(values, 'BRAM') * 90.0)
+    return [max([lutSlices, regSlices, ramSlices]), None]
+
+def _slicesQuartus(values):
+    # Quartus reports logic array blocks, the nearest thing to slices.
+    if ('LAB' in values):
+        return values['LAB']
+    return [int(_used(values, 'LUT') / 10.0), None]
+
+
+_xstTotal = r'\D+(\d+)\D+(\d+)'
+_vivadoTotal = r'\D+(\d+\.?\d*)\D+\d+\D+(\d+)\D+'
+_vivadoPrimitive = r'\D+(\d+)\D+'
+_synplifyUsed = r'\D+:\D+(\d+)'
+_quartusCount = r'\s*:\s*([\d,]+)(?:\s*/\s*([\d,]+))?'
+
+FORMATS = {
+    'xst':
+        (ReportFormat('xst',
+                      [ReportField('LUT', ' Number of Slice LUTs', _xstTotal),
+                       ReportField('Reg', ' Slice Registers', _xstTotal),
+                       ReportField('BRAM', ' Block RAM Tile', _xstTotal)]),
+         _slicesXST),
+
+    'vivado':
+        (ReportFormat('vivado',
+                      [ReportField('LUT', '| Slice LUTs', _vivadoTotal, unique=True),
+                       ReportField('Reg', '| Slice Registers', _vivadoTotal, unique=True),
+                       ReportField('BRAM', '| Block RAM Tile', _vivadoTotal, unique=True)] +
+                      [ReportField(primitive, '| ' + primitive, _vivadoPrimitive, afterLabel=True)
+                       for primitive in ['LUT6', 'LUT5', 'LUT4', 'LUT3', 'LUT2', 'LUT1', 'SRL16E']] +
+                      [ReportField('Slice', '| Slice      ', _vivadoPrimitive, afterLabel=True)] +
+                      [ReportField(primitive, primitive, _vivadoPrimitive, afterLabel=True)
+                       for primitive in ['RAMD32', 'RAMS32', 'RAMD64E']],
+                      anchored=False,
+                      derived=['LUT6', 'LUT5', 'LUT4', 'LUT3', 'LUT2', 'LUT1', 'SRL16E',
+                               'Slice', 'RAMD32', 'RAMS32', 'RAMD64E']),
+         _slicesVirtex7),
+
+    'synplify_xilinx':
+        (ReportFormat('synplify_xilinx',
+                      [ReportField('LUT', 'Total  LUTs:', _synplifyUsed),
+                       ReportField('Reg', 'Register bits not including I/Os:', _synplifyUsed),
+                       ReportField('BRAM', 'Occupied Block RAM sites', _synplifyUsed)]),
+         _slicesSynplify),
+
+    'synplify_altera':
+        (ReportFormat('synplify_altera',
+                      [ReportField('LUT', 'Total combinational functions ', _synplifyUsed),
+                       ReportField('Reg', 'Total registers ', _synplifyUsed),
+                       ReportField('M9Ks', 'Occupied Block RAM sites', _synplifyUsed)]),
+         _slicesSynplify),
+
+    'quartus_fit':
+        (ReportFormat('quartus_fit',
+                      [ReportField('LUT', 'Total logic elements', _quartusCount, afterLabel=True),
+                       ReportField('LUT', 'Logic utilization (in ALMs)', _quartusCount, afterLabel=True),
+                       ReportField('Reg', 'Total registers', _quartusCount, afterLabel=True),
+                       ReportField('BRAM', 'Total RAM Blocks', _quartusCount, afterLabel=True),
+                       ReportField('MemoryBits', 'Total block memory bits', _quartusCount, afterLabel=True),
+                       ReportField('DSP', 'Total DSP Blocks', _quartusCount, afterLabel=True),
+                       ReportField('LAB', 'Total LABs', r'\D*?:\s*([\d,]+)(?:\s*/\s*([\d,]+))?', afterLabel=True)]),
+         _slicesQuartus),
+}
+
+
+##
+## parseResourceReport --
+##   The resource record of a module from a report in the named format.
+##
+def parseResourceReport(moduleName, reportFile, reportFormat):
+    (parser, slices) = FORMATS[reportFormat]
+
+    handle = open(reportFile, 'r')
+    values = parser.parse(handle)
+    handle.close()
+
+    values['SLICE'] = slices(values)
+
+    resources = {}
+    for name in values:
+        if (not name in parser.derived):
+            resources[name] = {'used': values[name][0], 'total': values[name][1]}
+
+    return {'module': moduleName, 'report': reportFormat, 'resources': resources}
+
+def writeResourceRecord(record, resourceFile):
+    handle = open(resourceFile, 'w')
+    json.dump(record, handle, sort_keys=True)
+    handle.write('\n')
+    handle.close()
+
+##
+## resourceReportClosure --
+##   SCons action writing the resource record of module from its report.
+##   The report is the action's first source unless reportFile is given.
+##
+def resourceReportClosure(module, reportFormat, reportFile=None):
+
+    def collect_resources(target, source, env):
+        report = reportFile
+        if (report is None):
+            report = str(source[0])
+        try:
+            record = parseResourceReport(module.name, report, reportFormat)
+        except ValueError, e:
+            print "ERROR: " + str(e)
+            return 1
+        writeResourceRecord(record, str(target[0]))
+
+    return collect_resources
+
+
+_loadedResources = {}
+
+##
+## loadResources --
+##   Resources of the modules in a .resources file: module name ->
+##   resource -> used, with capacities as Total<resource>.  Files are
+##   reread only when they change.
+##
+def loadResources(filename):
+    info = os.stat(filename)
+    stamp = (info.st_mtime, info.st_size)
+    if (not (filename in _loadedResources and _loadedResources[filename][0] == stamp)):
+        _loadedResources[filename] = (stamp, _readResources(filename))
+
+    # Callers may annotate the dictionaries they get.
+    return dict([(name, dict(values)) for (name, values) in _loadedResources[filename][1].items()])
+
+def _readResources(filename):
+
+    resources = {}
+    handle = open(filename, 'r')
+    for line in handle:
+        line = line.strip()
+        if (line == ''):
+            continue
+
+        if (line.startswith('{')):
+            record = json.loads(line)
+            moduleResources = {}
+            for (name, value) in record['resources'].items():
+                moduleResources[str(name)] = float(value['used'])
+                if (value['total'] is not None):
+                    moduleResources['Total' + str(name)] = float(value['total'])
+            resources[str(record['module'])] = moduleResources
+        else:
+            params = line.split(':')
+            moduleName = params.pop(0)
+            resources[moduleName] = {}
+            for index in range(len(params) / 2):
+                resources[moduleName][params[2 * index]] = float(params[2 * index + 1])
+    handle.close()
+    return resources
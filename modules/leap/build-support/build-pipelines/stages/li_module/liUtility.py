@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import hashlib
 import pygraph
 import cPickle as pickle
 
@@ -10,6 +11,7 @@ from liChain import LIChain
 from liService import LIService
 from liGraph import LIGraph
 from liModule import LIModule
+from liResources import loadResources
 from model import Module, Source, get_build_path
 
 try:
@@ -78,6 +80,46 @@ def parseLogfiles(logfiles):
             
     return connections
 
+##
+## parseLogfilesCached --
+##   Same as parseLogfiles(), but the connections found in each log are
+##   stored next to the log in a pickle tagged with the log's content
+##   hash.  Logs that have not changed since the last parse are not
+##   re-scanned.  The result is the union of connections from all logs.
+##
+def parseLogfilesCached(logfiles):
+    connections = []
+    for logfile in logfiles:
+        logPath = str(logfile)
+        cachePath = logPath + '.conns'
+
+        logHandle = open(logPath, 'rb')
+        digest = hashlib.md5(logHandle.read()).hexdigest()
+        logHandle.close()
+
+        logConnections = None
+        if (os.path.exists(cachePath)):
+            try:
+                pickleHandle = open(cachePath, 'rb')
+                (cacheDigest, cacheConnections) = pickle.load(pickleHandle)
+                pickleHandle.close()
+                if (cacheDigest == digest):
+                    logConnections = cacheConnections
+            except:
+                # A damaged cache is simply rebuilt.
+                logConnections = None
+
+        if (logConnections is None):
+            logConnections = parseLogfiles([logfile])
+            # Store the connections before anyone gets to match them.
+            pickleHandle = open(cachePath, 'wb')
+            pickle.dump((digest, logConnections), pickleHandle, protocol=-1)
+            pickleHandle.close()
+
+        connections += logConnections
+
+    return connections
+
 ##
 ## placement_cut --
 ##   Cut the tree based on the placement of logic in area groups.  This will
@@ -160,14 +202,7 @@ def assignResources(moduleList, environmentGraph = None, moduleGraph = None):
             print "Warning, no resources found at " + str(filename.from_bld()) + "\n"
             continue
 
-        logfile = open(str(filename.from_bld()), 'r')  
-        for line in logfile:
-            # There are several ways that we can get resource. One way is instrumenting the router. 
-            params = line.split(':')
-            moduleName = params.pop(0)
-            resources[moduleName] = {}
-            for index in range(len(params)/2):
-                resources[moduleName][params[2*index]] = float(params[2*index+1])
+        resources.update(loadResources(str(filename.from_bld())))
     if (pipeline_debug):        
         print "PLACER RESOURCES: " + str(resources)
 
@@ -234,7 +269,7 @@ def dump_lim_graph(moduleList):
     def dump_lim_graph(target, source, env):
         # Find the subset of sources that are log files and parse them
         logs = [s for s in source if (str(s)[-4:] == '.log')]
-        fullLIGraph = LIGraph(parseLogfiles(logs))
+        fullLIGraph = LIGraph(parseLogfilesCached(logs))
 
         # annotate modules with relevant object code (useful in
         # LIM compilation)
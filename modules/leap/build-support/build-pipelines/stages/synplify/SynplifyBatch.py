@@ -0,0 +1,290 @@
+##
+## Batched Synplify sessions.
+##
+## Each synthesis boundary normally gets its own synplify_premier run,
+## paying tool start-up and a license checkout per boundary.  With
+## SYNPLIFY_BATCH_SIZE set, boundaries whose builds are ready at about the
+## same time share a session instead.  The first boundary to arrive
+## waits up to SYNPLIFY_BATCH_WINDOW seconds for others and then runs a
+## session synthesizing all of them in turn:
+##
+##   project -new config/<boundary>.batch.prj
+##   source <boundary project>
+##   project -close
+##
+## A session holds the memory of every boundary it synthesizes, so under
+## the memory governor a boundary joins a session only while the
+## remembered peaks of its members fit the memory budget, and the
+## session reserves their sum.  Boundaries that took longer than
+## SYNPLIFY_BATCH_MAX_SECONDS last time gain nothing from sharing start
+## up and are run alone.
+##
+## Each boundary's share of the session log is copied to its own log,
+## and its compile time is reported and remembered by the memory
+## governor, where the batcher reads it back.
+##
+
+import os
+import re
+import time
+import threading
+import subprocess
+
+import SCons.Action
+
+import model
+import synthesis_library
+
+_doneMarker = re.compile(r'^LEAP_SYNPLIFY_DONE (\S+) (\d+) (\d+)')
+_startMarker = re.compile(r'^LEAP_SYNPLIFY_START (\S+)')
+
+
+class SynplifyJob():
+
+    def __init__(self, name, prjPath, logFile):
+        self.name = name
+        self.prjPath = prjPath
+        self.logFile = logFile
+        self.status = None
+        self.seconds = None
+
+
+class SynplifyBatcher():
+
+    def __init__(self, batchSize, window, maxSeconds, command, sessionDirectory,
+                 governor=None, environment=None, debug=False):
+        self.batchSize = batchSize
+        self.window = window
+        self.maxSeconds = maxSeconds
+        self.command = command
+        self.sessionDirectory = sessionDirectory
+        self.governor = governor
+        self.environment = environment
+        self.debug = debug
+
+        self.condition = threading.Condition()
+        self.pending = []
+        self.collecting = False
+        self.sessions = 0
+
+    def _key(self, job):
+        return 'synplify:' + job.name
+
+    def _estimate(self, job):
+        return self.governor.estimate(self._key(job))
+
+    ##
+    ## batchable --
+    ##   Whether a boundary may share a session.
+    ##
+    def batchable(self, job):
+        if (self.governor is None):
+            return True
+        seconds = self.governor.duration(self._key(job))
+        return (seconds is None or seconds <= self.maxSeconds)
+
+    ##
+    ## run --
+    ##   Synthesize a boundary, possibly in a session shared with others.
+    ##   Returns 0 on success.  Called from SCons job threads.
+    ##
+    def run(self, job):
+        if (not self.batchable(job)):
+            return self._session([job])
+
+        self.condition.acquire()
+        try:
+            self.pending.append(job)
+            self.condition.notifyAll()
+
+            # Wait for a session to take the job, or lead one.
+            while (job in self.pending and self.collecting):
+                self.condition.wait(1)
+            if (not job in self.pending):
+                while (job.status is None):
+                    self.condition.wait(1)
+                return job.status
+
+            self.collecting = True
+            deadline = time.time() + self.window
+            while (len(self.pending) < self.batchSize and time.time() < deadline):
+                self.condition.wait(max(0.1, deadline - time.time()))
+
+            jobs = self._select(job)
+            for member in jobs:
+                self.pending.remove(member)
+            self.collecting = False
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+        status = self._session(jobs)
+
+        self.condition.acquire()
+        self.condition.notifyAll()
+        self.condition.release()
+        return status
+
+    ##
+    ## _select --
+    ##   Members of the session led by job, which is always one of them.
+    ##   Called holding the lock.
+    ##
+    def _select(self, job):
+        jobs = [job]
+        if (self.governor is not None):
+            reserveMB = self._estimate(job)
+            budgetMB = self.governor.budgetMB
+
+        for other in self.pending:
+            if (len(jobs) >= self.batchSize):
+                break
+            if (other is job):
+                continue
+            if (self.governor is not None and budgetMB is not None):
+                if (reserveMB + self._estimate(other) > budgetMB):
+                    continue
+                reserveMB += self._estimate(other)
+            jobs.append(other)
+        return jobs
+
+    ##
+    ## _session --
+    ##   Run one synplify session for jobs, setting their status and
+    ##   compile time.  Returns the status of the first job.
+    ##
+    def _session(self, jobs):
+        self.condition.acquire()
+        self.sessions += 1
+        sessionName = 'synplify_batch_' + str(os.getpid()) + '_' + str(self.sessions)
+        self.condition.release()
+
+        script = os.path.join(self.sessionDirectory, sessionName + '.tcl')
+        sessionLog = os.path.join(self.sessionDirectory, sessionName + '.log')
+
+        handle = open(script, 'w')
+        for job in jobs:
+            handle.write('puts "LEAP_SYNPLIFY_START ' + job.name + '"\n')
+            handle.write('set leap_start [clock seconds]\n')
+            handle.write('set leap_status [catch {project -new {config/' + job.name + '.batch.prj}; ' +
+                         'source {' + job.prjPath + '}} leap_result]\n')
+            handle.write('if {$leap_status} {puts "ERROR: $leap_result"}\n')
+            handle.write('catch {project -close}\n')
+            handle.write('puts "LEAP_SYNPLIFY_DONE ' + job.name + ' $leap_status [expr {[clock seconds] - $leap_start}]"\n')
+        handle.close()
+
+        if (len(jobs) > 1 or self.debug):
+            print "Synplify session " + sessionName + ": " + ' '.join([job.name for job in jobs])
+
+        command = self.command + ' ' + script + ' > ' + sessionLog + ' 2>&1'
+        if (self.governor is None):
+            subprocess.call(command, shell=True, env=self.environment)
+        else:
+            # A boundary run alone is remembered under its own key.
+            key = 'synplify:batch'
+            if (len(jobs) == 1):
+                key = self._key(jobs[0])
+            self.governor.run(key, command, self.environment,
+                              reserveMB=sum([self._estimate(job) for job in jobs]))
+
+        self._splitLog(sessionLog, jobs)
+
+        for job in jobs:
+            # A job without an end marker died with the session.
+            if (job.status is None):
+                job.status = 1
+            if (job.seconds is not None):
+                print "Synplify: " + job.name + " compiled in " + str(job.seconds) + " s"
+                if (self.governor is not None and job.status == 0):
+                    self.governor.recordDuration(self._key(job), job.seconds)
+
+        return jobs[0].status
+
+    ##
+    ## _splitLog --
+    ##   Copy each job's part of a session log to the job's log, reading
+    ##   its status and compile time from the end marker.
+    ##
+    def _splitLog(self, sessionLog, jobs):
+        byName = dict([(job.name, job) for job in jobs])
+        if (not os.path.exists(sessionLog)):
+            return
+
+        log = None
+        for line in open(sessionLog, 'r'):
+            match = _startMarker.match(line)
+            if (match and match.group(1) in byName):
+                if (log is not None):
+                    log.close()
+                log = open(byName[match.group(1)].logFile, 'w')
+                continue
+
+            match = _doneMarker.match(line)
+            if (match and match.group(1) in byName):
+                job = byName[match.group(1)]
+                job.status = int(match.group(2))
+                job.seconds = int(match.group(3))
+                if (log is not None):
+                    log.close()
+                    log = None
+                continue
+
+            if (log is not None):
+                log.write(line)
+
+        if (log is not None):
+            log.close()
+
+
+_synplifyBatcher = None
+
+##
+## getSynplifyBatcher --
+##   The build's SynplifyBatcher, or None when each boundary gets its own
+##   session.
+##
+def getSynplifyBatcher(moduleList, command):
+    global _synplifyBatcher
+
+    if (not moduleList.getAWBParamSafe('synthesis_tool', 'SYNPLIFY_BATCH_SIZE')):
+        return None
+
+    if (_synplifyBatcher is None):
+        _synplifyBatcher = SynplifyBatcher(moduleList.getAWBParam('synthesis_tool', 'SYNPLIFY_BATCH_SIZE'),
+                                           moduleList.getAWBParam('synthesis_tool', 'SYNPLIFY_BATCH_WINDOW'),
+                                           moduleList.getAWBParam('synthesis_tool', 'SYNPLIFY_BATCH_MAX_SECONDS'),
+                                           command,
+                                           moduleList.compileDirectory,
+                                           governor=synthesis_library.getMemoryGovernor(moduleList),
+                                           environment=dict([(k, str(v)) for (k, v) in moduleList.env['ENV'].items()]),
+                                           debug=model.getBuildPipelineDebug(moduleList))
+    return _synplifyBatcher
+
+##
+## synplifyAction --
+##   An SCons action synthesizing module's project prjPath with command,
+##   logging to logFile.  Batched when the build's batcher is on, and
+##   otherwise run alone under the memory governor.  Either way the
+##   netlists may come from the netlist cache instead.  keyFiles are
+##   the files the project reads that aren't sources of the Command;
+##   the cache key covers their contents.
+##
+##   The batched action closes over strings only and finds the batcher
+##   when it runs, so that its signature is stable.
+##
+def synplifyAction(moduleList, module, command, prjPath, logFile, keyFiles=[]):
+    tool = command.split()[0]
+    if (getSynplifyBatcher(moduleList, command) is None):
+        return synthesis_library.cachedActions(moduleList, tool,
+                   synthesis_library.governedCommand(moduleList, 'synplify:' + module.wrapperName(),
+                                                     command + ' ' + prjPath + ' > ' + logFile),
+                   keyFiles)
+
+    name = module.wrapperName()
+
+    def synplify_batch(target, source, env):
+        return _synplifyBatcher.run(SynplifyJob(name, prjPath, logFile))
+
+    return synthesis_library.cachedActions(moduleList, tool,
+               SCons.Action.Action(synplify_batch, 'synplify (batched): ' + prjPath + ' > ' + logFile),
+               keyFiles)
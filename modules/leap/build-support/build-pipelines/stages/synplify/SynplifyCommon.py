@@ -1,10 +1,15 @@
 import os
 import errno
 import re
+import cStringIO
 import SCons.Script  
 
 import model
+import li_module
 import synthesis_library
+import SynplifyBatch
+
+SYNPLIFY_COMMAND = 'synplify_premier -batch -license_wait'
 
 #
 # Generate path string to add source file into the Synplify project
@@ -97,71 +102,54 @@ def _filter_file_add(file, moduleList):
 # Converts Xilinx SRR file into resource representation which can be used
 # by the LIM compiler to assign modules to execution platforms.
 def getSRRResourcesClosureXilinx(module):
-
-    attributes = {'LUT': "Total  LUTs:",'Reg': "Register bits not including I/Os:", 'BRAM': "Occupied Block RAM sites"}
-
-    return getSRRResourcesClosureBase(module, attributes)
+    return li_module.resourceReportClosure(module, 'synplify_xilinx')
 
 
 # Converts Altera SRR file into resource representation which can be used
 # by the LIM compiler to assign modules to execution platforms.
 def getSRRResourcesClosureAltera(module):
-
-    attributes = {'LUT': "Total combinational functions ",'Reg': "Total registers ", 'M9Ks:': "Occupied Block RAM sites"}
-
-    return getSRRResourcesClosureBase(module, attributes)
+    return li_module.resourceReportClosure(module, 'synplify_altera')
 
 
-# General function for building an attribute collection from a synthesis report. 
-# Used by the LIM compiler to assign modules to execution platforms.
-# Also used to do automated placement for LI Modules. 
-def getSRRResourcesClosureBase(module, attributes):
+def _synplify_file_include(file):
+    if (type(file) is str):
+        return _generate_synplify_include(file)
+    elif (isinstance(file, model.Source.Source)):
+        return _generate_synplify_include_source(file)
+    return None
 
-    def collect_srr_resources(target, source, env):
 
-        srrFile = str(source[0])
-        rscFile = str(target[0])
+_synplifyPrologues = {}
 
-        srrHandle = open(srrFile, 'r')
-        rscHandle = open(rscFile, 'w')
-        resources =  {}
-
-        for line in srrHandle:
-            for attribute in attributes:
-                if (re.match(attributes[attribute],line)):
-                    match = re.search(r'\D+:\D+(\d+)', line)
-                    if(match):
-                        resources[attribute] = [match.group(1)]
-
-        ## Synplify conveniently provides LUT estimates that include a
-        ## half-lut calculation. Thus dividing by 4 is correct for the 7 series. 
-        ## still need to bake this code out. 
-        lutSlices = 0 
-        regSlices = 0 
-        ramSlices = 0
-        resources['SLICE'] = ["0"]
+#
+# The project text shared by all boundaries of a build: include lines
+# for the global RTL (head) and for the given Synplify sources, netlists
+# and constraints (tail) as (file, include) pairs, the include path and
+# the options of the base project.  Computed once per RTL manifest.
+#
+def _synplify_prologue(moduleList, globalVerilogs, globalVHDs):
+    key = synthesis_library.rtlManifestOf(globalVerilogs, globalVHDs).digest
+    if (not key in _synplifyPrologues):
+        head = [(file, _synplify_file_include(file)) for file in globalVerilogs + globalVHDs]
+        tail = [(file, _synplify_file_include(file)) for file in
+                map(lambda x: moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + x, moduleList.getAllDependenciesWithPaths('GIVEN_SYNPLIFY_VERILOGS')) +
+                moduleList.getAllDependencies('NGC') +
+                moduleList.getAllDependencies('SDC')]
 
-        if ('LUT' in resources):
-            lutSlices = int(int(resources['LUT'][0]) / 4.0)
- 
-        if ('Reg' in resources):
-            regSlices = int(int(resources['Reg'][0]) / 8.0)
+        # establish an include path for synplify.  This is necessary for true text inclusion in verilog,
+        # as raw text files don't always compile standalone. Ugly yes, but it is verilog....
+        includePath = 'set_option -include_path {' + \
+                      ";".join(["../" + moduleList.env['DEFS']['ROOT_DIR_HW_INC']] + ["../" + moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath for moduleDir in moduleList.synthBoundaries()] + [moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath for moduleDir in moduleList.synthBoundaries()] + [moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath + '/.bsv/' for moduleDir in moduleList.synthBoundaries()]) + \
+                      '}\n'
 
-        if ('BRAM' in resources):
-            ramSlices = int(int(resources['BRAM'][0]) * 90.0)
-           
-        resources['SLICE'] = [str(max([lutSlices, regSlices, ramSlices]))]
-                
+        prjFile = open('config/' + moduleList.apmName  + '.synplify.prj','r');  
+        options = _filter_file_add(prjFile, moduleList)
+        prjFile.close()
 
-        resourceString = ':'.join([resource + ':' + resources[resource][0] for resource in resources]) + '\n'
+        _synplifyPrologues[key] = (head, tail, includePath, options)
 
-        rscHandle.write(module.name + ':')
-        rscHandle.write(resourceString)
-                                   
-        rscHandle.close()
-        srrHandle.close()
+    return _synplifyPrologues[key]
 
-    return collect_srr_resources
 
 def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCollector):
     MODEL_CLOCK_FREQ = moduleList.getAWBParam('clocks_device', 'MODEL_CLOCK_FREQ')
@@ -170,11 +158,10 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
     compile_dir = moduleList.env.Dir('.')
     compileDirectory = compile_dir.Dir('.')
 
-    # need to eventually break this out into a seperate function
     # first step - modify prj options file to contain any generated wrappers
-    prjFile = open('config/' + moduleList.apmName  + '.synplify.prj','r');  
+    (prologueHead, prologueTail, includePath, options) = _synplify_prologue(moduleList, globalVerilogs, globalVHDs)
     newPrjPath = 'config/' + module.wrapperName()  + '.modified.synplify.prj'
-    newPrjFile = open(newPrjPath,'w');  
+    newPrjFile = cStringIO.StringIO()
 
     # allow duplicate files, so long as they are not used...
     newPrjFile.write('set_option -dup {1}\n');      
@@ -183,29 +170,28 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
 
     annotationFiles, annotationDeps = synthesis_library.generateSynthesisTcl(moduleList, module, compileDirectory)
 
-    # now dump all the 'VERILOG' 
-    fileArray = globalVerilogs + globalVHDs + \
-                moduleList.getDependencies(module, 'VERILOG_STUB') + \
-                map(lambda x: moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + x, moduleList.getAllDependenciesWithPaths('GIVEN_SYNPLIFY_VERILOGS')) + \
-                moduleList.getAllDependencies('NGC') + \
-                moduleList.getAllDependencies('SDC') + annotationFiles
+    # now dump all the 'VERILOG'.  Only the boundary's own files
+    # need includes generated here.
+    fileIncludes = prologueHead + \
+                   [(file, _synplify_file_include(file)) for file in moduleList.getDependencies(module, 'VERILOG_STUB')] + \
+                   prologueTail + \
+                   [(file, _synplify_file_include(file)) for file in annotationFiles]
+    fileArray = [file for (file, include) in fileIncludes]
 
     # Replace any known black boxes
     blackBoxDeps = []
     blackBoxes = module.getAttribute('BLACK_BOX')
 
-    for file in fileArray:
+    for (file, include) in fileIncludes:
 
         if(not blackBoxes is None):
             if(file in blackBoxes):
                 file = blackBoxes[file]
                 blackBoxDeps.append(file)               
+                include = _synplify_file_include(file)
 
-
-        if (type(file) is str):
-            newPrjFile.write(_generate_synplify_include(file))        
-        elif (isinstance(file, model.Source.Source)):
-            newPrjFile.write(_generate_synplify_include_source(file))                    
+        if (not include is None):
+            newPrjFile.write(include)
         else:
             if (model.getBuildPipelineDebug(moduleList) != 0):
                 print type(file)
@@ -225,11 +211,7 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
         if err.errno != errno.EEXIST: raise 
 
 
-    # establish an include path for synplify.  This is necessary for true text inclusion in verilog,
-    # as raw text files don't always compile standalone. Ugly yes, but it is verilog....
-    newPrjFile.write('set_option -include_path {')
-    newPrjFile.write(";".join(["../" + moduleList.env['DEFS']['ROOT_DIR_HW_INC']] + ["../" + moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath for moduleDir in moduleList.synthBoundaries()] + [moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath for moduleDir in moduleList.synthBoundaries()] + [moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + moduleDir.buildPath + '/.bsv/' for moduleDir in moduleList.synthBoundaries()]))
-    newPrjFile.write('}\n')
+    newPrjFile.write(includePath)
 
     # once we get synth boundaries up, this will be needed only for top level
     newPrjFile.write('set_option -disable_io_insertion 1\n')
@@ -241,7 +223,7 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
 
     #dump synplify options file
     # MAYBE NOT A GOOD IDEA
-    newPrjFile.write(_filter_file_add(prjFile, moduleList))
+    newPrjFile.write(options)
 
     #write the tail end of the options file to actually do the synthesis
     newPrjFile.write('set_option -top_module '+ module.wrapperName() +'\n')
@@ -256,8 +238,7 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
     newPrjFile.write('project -run constraint_check\n');
     newPrjFile.write('project -run synthesis\n');
 
-    newPrjFile.close();
-    prjFile.close();
+    synthesis_library.writeIfChanged(newPrjPath, newPrjFile)
 
     edfFile = build_dir + '/' +  module.wrapperName() + '.edf'
     resourceFile = build_dir + '/' + module.wrapperName() + '.resources'
@@ -287,7 +268,9 @@ def buildSynplifyEDF(moduleList, module, globalVerilogs, globalVHDs, resourceCol
       [ newPrjPath ] + annotationFiles + annotationDeps +
       ['config/' + moduleList.apmName + '.synplify.prj'],
       [ SCons.Script.Delete(srrFile),
-        'synplify_premier -batch -license_wait ' + newPrjPath + ' > ' + build_dir + '.log',
+        SynplifyBatch.synplifyAction(moduleList, module, SYNPLIFY_COMMAND, newPrjPath, build_dir + '.log',
+                                     fileArray + blackBoxDeps +
+                                     map(model.modify_path_hw, moduleList.getAllDependenciesWithPaths('GIVEN_VERILOG_HS'))),
         # Files in coreip just copied from elsewhere and waste space
         SCons.Script.Delete(build_dir + '/coreip'),
         '@echo synplify_premier ' + module.wrapperName() + ' build complete.' ])    
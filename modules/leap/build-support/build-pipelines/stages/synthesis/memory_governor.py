@@ -0,0 +1,240 @@
+##
+## Memory-aware admission control for synthesis tool runs.
+##
+## SCons -j launches every ready synthesis boundary at once, and a single
+## Vivado or XST process may need many gigabytes.  Heavy tool commands
+## are routed through a MemoryGovernor instead.  Each run reserves the
+## peak memory its boundary needed in past builds, and runs are held
+## back until their reservations fit in the memory budget.  Peaks are
+## measured from the finished tool process and remembered per boundary,
+## along with how long the run took, for schedulers grouping runs.
+##
+## Held runs wait in their SCons job slot.  Lightweight actions keep the
+## other slots, so -j can stay high.
+##
+
+import os
+import time
+import errno
+import threading
+import subprocess
+import cPickle as pickle
+
+import SCons.Action
+
+import model
+
+## Peaks remembered per boundary.  Reservations use the largest.
+HISTORY_LENGTH = 5
+
+## Reservations are padded by this factor over the remembered peak.
+PEAK_MARGIN = 1.1
+
+
+##
+## _meminfo --
+##   A field of /proc/meminfo in MB, or None where that isn't available.
+##
+def _meminfo(field):
+    try:
+        for line in open('/proc/meminfo', 'r'):
+            if (line.startswith(field + ':')):
+                return int(line.split()[1]) // 1024
+    except IOError:
+        pass
+    return None
+
+
+class MemoryGovernor():
+
+    def __init__(self, historyFile, budgetMB=0, defaultPeakMB=8192, debug=False):
+        self.historyFile = historyFile
+        self.defaultPeakMB = defaultPeakMB
+        self.debug = debug
+
+        # Without an explicit budget, use the memory free when the build
+        # started, which leaves out whatever else runs on the machine.
+        if (budgetMB <= 0):
+            budgetMB = _meminfo('MemAvailable')
+            if (budgetMB is None):
+                budgetMB = _meminfo('MemTotal')
+        self.budgetMB = budgetMB
+
+        self.condition = threading.Condition()
+        self.reservedMB = 0
+        self.running = 0
+
+        self.history = {}
+        self.durations = {}
+        if (os.path.exists(historyFile)):
+            try:
+                handle = open(historyFile, 'rb')
+                history = pickle.load(handle)
+                handle.close()
+                # Older histories hold only peaks.
+                if (isinstance(history, tuple)):
+                    (self.history, self.durations) = history
+                else:
+                    self.history = history
+            except Exception:
+                print "Memory governor: ignoring unreadable history " + historyFile
+
+    ##
+    ## estimate --
+    ##   Memory (MB) to reserve for a run of key.
+    ##
+    def estimate(self, key):
+        peaks = self.history.get(key, [])
+        if (len(peaks) == 0):
+            return self.defaultPeakMB
+        return int(max(peaks) * PEAK_MARGIN)
+
+    ##
+    ## duration --
+    ##   Seconds the last run of key took, or None if it never ran.
+    ##
+    def duration(self, key):
+        return self.durations.get(key)
+
+    ##
+    ## admit --
+    ##   Block until a run needing reserveMB fits in the budget.  A run
+    ##   is always admitted when nothing else is running, so a boundary
+    ##   larger than the budget still builds, alone.
+    ##
+    def admit(self, key, reserveMB):
+        self.condition.acquire()
+        try:
+            waited = False
+            while (self.budgetMB is not None and self.running > 0 and
+                   self.reservedMB + reserveMB > self.budgetMB):
+                if (not waited):
+                    print "Memory governor: " + key + " waiting for " + str(reserveMB) + " MB (" + \
+                          str(self.reservedMB) + " of " + str(self.budgetMB) + " MB reserved)"
+                    waited = True
+                self.condition.wait(10)
+
+            self.reservedMB += reserveMB
+            self.running += 1
+        finally:
+            self.condition.release()
+
+    def release(self, reserveMB):
+        self.condition.acquire()
+        try:
+            self.reservedMB -= reserveMB
+            self.running -= 1
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+    ##
+    ## record --
+    ##   Remember the peak memory (MB) and, if known, the duration of a
+    ##   finished run of key.
+    ##
+    def record(self, key, peakMB, seconds=None):
+        self.condition.acquire()
+        try:
+            self.history[key] = (self.history.get(key, []) + [peakMB])[-HISTORY_LENGTH:]
+            if (seconds is not None):
+                self.durations[key] = seconds
+            self._store()
+        finally:
+            self.condition.release()
+
+    ##
+    ## recordDuration --
+    ##   Remember the duration of a run of key whose peak memory wasn't
+    ##   measured on its own, e.g. one of several runs in a tool session.
+    ##
+    def recordDuration(self, key, seconds):
+        self.condition.acquire()
+        try:
+            self.durations[key] = seconds
+            self._store()
+        finally:
+            self.condition.release()
+
+    def _store(self):
+        tmpFile = self.historyFile + '.' + str(os.getpid())
+        handle = open(tmpFile, 'wb')
+        pickle.dump((self.history, self.durations), handle, protocol=-1)
+        handle.close()
+        os.rename(tmpFile, self.historyFile)
+
+    ##
+    ## run --
+    ##   Run a shell command for key under admission control.  Returns the
+    ##   command's exit status.  reserveMB overrides the estimate for key.
+    ##
+    def run(self, key, command, environment=None, reserveMB=None):
+        if (reserveMB is None):
+            reserveMB = self.estimate(key)
+        self.admit(key, reserveMB)
+        try:
+            start = time.time()
+            process = subprocess.Popen(command, shell=True, env=environment)
+            # wait4 reports the peak resident set of the largest process
+            # the command waited on, in kB on Linux.
+            while True:
+                try:
+                    (pid, status, usage) = os.wait4(process.pid, 0)
+                    break
+                except OSError, e:
+                    if (e.errno != errno.EINTR):
+                        raise
+        finally:
+            self.release(reserveMB)
+
+        peakMB = usage.ru_maxrss // 1024
+        seconds = int(time.time() - start)
+        if (self.debug):
+            print "Memory governor: " + key + " peak " + str(peakMB) + " MB, reserved " + \
+                  str(reserveMB) + " MB, " + str(seconds) + " s"
+
+        if (os.WIFEXITED(status)):
+            status = os.WEXITSTATUS(status)
+            if (status == 0):
+                self.record(key, peakMB, seconds)
+            return status
+        return 1
+
+
+_memoryGovernor = None
+
+##
+## getMemoryGovernor --
+##   The build's MemoryGovernor, or None when admission control is off.
+##
+def getMemoryGovernor(moduleList):
+    global _memoryGovernor
+
+    if (not moduleList.getAWBParamSafe('synthesis_library', 'SYNTH_MEMORY_GOVERNOR')):
+        return None
+
+    if (_memoryGovernor is None):
+        _memoryGovernor = MemoryGovernor(moduleList.compileDirectory + '/synthesis_memory.pickle',
+                                         moduleList.getAWBParam('synthesis_library', 'SYNTH_MEMORY_BUDGET_MB'),
+                                         moduleList.getAWBParam('synthesis_library', 'SYNTH_MEMORY_DEFAULT_PEAK_MB'),
+                                         debug=model.getBuildPipelineDebug(moduleList))
+    return _memoryGovernor
+
+##
+## governedCommand --
+##   An SCons action running a heavy tool command for the boundary named
+##   key under the build's MemoryGovernor.  The plain command when
+##   admission control is off.
+##
+##   SCons signs a function action by its code and the values it closes
+##   over, so the action closes over strings only and finds the governor
+##   when it runs.
+##
+def governedCommand(moduleList, key, command):
+    if (getMemoryGovernor(moduleList) is None):
+        return command
+
+    def governed_command(target, source, env):
+        return _memoryGovernor.run(key, command, dict([(k, str(v)) for (k, v) in env['ENV'].items()]))
+
+    return SCons.Action.Action(governed_command, command)
@@ -0,0 +1,251 @@
+##
+## Content-addressed cache of synthesis and checkpoint outputs.
+##
+## Netlists (EDF/NGC) and Vivado checkpoints are expensive to produce and
+## depend only on the contents of their inputs.  The cache keys a tool
+## run by digests of the contents of its sources -- wrapper Verilog,
+## VERILOG_LIB and VERILOG_STUB files, the generated .xst/.tcl -- and of
+## the other files the run reads, such as the .prj, global VHDL, headers
+## and given netlists, together with the FPGA part, the tool
+## installation, the commands and the names of the outputs.  A run whose key is cached copies the outputs in place of
+## running the tool, so identical boundaries are shared across builds,
+## branches and, given a common SYNTH_NETLIST_CACHE_DIR, workspaces.
+##
+## Each entry is a directory named by the key holding every target of
+## the run.  Side outputs such as the utilization report (.util/.srp)
+## are targets too, so anything derived from them (.resources) is rebuilt
+## consistently from the restored copy.  Entries are evicted least
+## recently used first once the cache grows past its size limit.
+##
+
+import os
+import stat
+import shutil
+import hashlib
+
+import SCons.Action
+import SCons.Node.FS
+
+import model
+
+
+class NetlistCache():
+
+    def __init__(self, directory, maxBytes, debug=False):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.debug = debug
+
+    ##
+    ## key --
+    ##   Digest of a tool run.  sources are SCons nodes or paths of files
+    ##   read by the run; only their base names and contents matter, so
+    ##   the key is independent of where the workspace lives.
+    ##
+    def key(self, sources, extra):
+        digest = hashlib.md5()
+        for item in extra:
+            digest.update(str(item) + '\0')
+
+        for node in sources:
+            digest.update(os.path.basename(str(node)) + '\0')
+            if (isinstance(node, str)):
+                if (os.path.isfile(node)):
+                    digest.update(fileDigest(node) + '\0')
+                else:
+                    digest.update('missing\0')
+            elif (isinstance(node, SCons.Node.FS.File)):
+                digest.update(fileDigest(str(node)) + '\0')
+            else:
+                digest.update(str(node.get_contents()) + '\0')
+
+        return digest.hexdigest()
+
+    ##
+    ## fetch --
+    ##   Copy the outputs cached under key to targets.  Returns False,
+    ##   leaving the targets alone, unless every target was cached.
+    ##
+    def fetch(self, key, targets):
+        entry = os.path.join(self.directory, key)
+        cached = [os.path.join(entry, os.path.basename(t)) for t in targets]
+        for path in cached:
+            if (not os.path.isfile(path)):
+                return False
+
+        try:
+            for (path, target) in zip(cached, targets):
+                copyFile(path, target)
+        except (IOError, OSError):
+            # Evicted under us by another build.
+            return False
+
+        # Mark the entry as recently used.
+        os.utime(entry, None)
+        return True
+
+    ##
+    ## store --
+    ##   Cache the targets of a successful run under key.
+    ##
+    def store(self, key, targets):
+        entry = os.path.join(self.directory, key)
+        if (os.path.isdir(entry)):
+            os.utime(entry, None)
+            return
+
+        if (not os.path.isdir(self.directory)):
+            os.makedirs(self.directory)
+
+        # Fill a private directory and rename it into place so that
+        # concurrent builds never see a partial entry.
+        tmpEntry = entry + '.' + str(os.getpid())
+        try:
+            os.mkdir(tmpEntry)
+            for target in targets:
+                copyFile(target, os.path.join(tmpEntry, os.path.basename(target)))
+            os.rename(tmpEntry, entry)
+        except (IOError, OSError), e:
+            print "Netlist cache: failed to store " + key + ": " + str(e)
+            shutil.rmtree(tmpEntry, True)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if ((not os.path.isdir(path)) or ('.' in name)):
+                continue
+            size = sum([os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)])
+            entries.append((os.path.getmtime(path), size, path))
+            total += size
+
+        entries.sort()
+        for (mtime, size, path) in entries:
+            if (total <= self.maxBytes):
+                break
+            if (self.debug):
+                print "Netlist cache: evicting " + path
+            shutil.rmtree(path, True)
+            total -= size
+
+
+##
+## fileDigest --
+##   md5 of a file's contents, read in blocks since checkpoints are large.
+##
+def fileDigest(path):
+    digest = hashlib.md5()
+    handle = open(path, 'rb')
+    block = handle.read(1 << 20)
+    while (block != ''):
+        digest.update(block)
+        block = handle.read(1 << 20)
+    handle.close()
+    return digest.hexdigest()
+
+##
+## copyFile --
+##   Copy contents and permissions but not times, so that a restored
+##   file looks freshly built.
+##
+def copyFile(src, dst):
+    tmpDst = dst + '.' + str(os.getpid())
+    shutil.copyfile(src, tmpDst)
+    shutil.copymode(src, tmpDst)
+    os.rename(tmpDst, dst)
+
+
+_toolVersions = {}
+
+##
+## toolVersion --
+##   Identity of the installation of a tool: the resolved path of its
+##   executable with that file's size and time.  Install directories
+##   encode the release, and an upgrade in place changes the file.
+##
+def toolVersion(tool, path):
+    if (not tool in _toolVersions):
+        version = None
+        for directory in path.split(os.pathsep):
+            executable = os.path.join(directory, tool)
+            if (os.path.isfile(executable) and os.access(executable, os.X_OK)):
+                executable = os.path.realpath(executable)
+                info = os.stat(executable)
+                version = (executable, info[stat.ST_SIZE], int(info[stat.ST_MTIME]))
+                break
+        _toolVersions[tool] = version
+    return _toolVersions[tool]
+
+
+_netlistCache = None
+
+##
+## getNetlistCache --
+##   The build's NetlistCache, or None when caching is off.
+##
+def getNetlistCache(moduleList):
+    global _netlistCache
+
+    if (not moduleList.getAWBParamSafe('synthesis_library', 'SYNTH_NETLIST_CACHE')):
+        return None
+
+    if (_netlistCache is None):
+        directory = moduleList.getAWBParam('synthesis_library', 'SYNTH_NETLIST_CACHE_DIR')
+        if (directory == ''):
+            directory = moduleList.env['DEFS']['WORKSPACE_ROOT'] + '/var/netlist_cache'
+        maxBytes = int(moduleList.getAWBParam('synthesis_library', 'SYNTH_NETLIST_CACHE_MAX_GB') * (1 << 30))
+        _netlistCache = NetlistCache(os.path.expanduser(directory), maxBytes,
+                                     debug=model.getBuildPipelineDebug(moduleList))
+    return _netlistCache
+
+##
+## cachedActions --
+##   Wrap the actions of a Command that runs tool so that its targets
+##   come from the netlist cache when possible.  Returns the actions
+##   unchanged when caching is off.
+##
+##   The wrapped commands are part of both the cache key and the
+##   action's signature, so changing a tool option rebuilds the target.
+##   keyFiles are the paths of files the tool reads that aren't sources
+##   of the Command, such as files named by a project file.  Their
+##   contents are part of the key.  The closure holds only strings and
+##   the wrapped action; the cache itself is found through _netlistCache
+##   when the action runs.
+##
+def cachedActions(moduleList, tool, actions, keyFiles=[]):
+    if (getNetlistCache(moduleList) is None):
+        return actions
+
+    keyFiles = sorted(set([str(f) for f in keyFiles]))
+
+    part = moduleList.getAWBParamSafe('physical_platform_config', 'FPGA_PART_XILINX')
+    action = SCons.Action.Action(actions)
+    commands = action.get_contents([], [], moduleList.env)
+
+    def cached_actions(target, source, env):
+        targets = [str(t) for t in target]
+        key = _netlistCache.key(list(source) + keyFiles, [tool, toolVersion(tool, env['ENV']['PATH']), part, commands] +
+                                        [os.path.basename(t) for t in targets])
+
+        if (_netlistCache.fetch(key, targets)):
+            print tool + ' ' + ' '.join([os.path.basename(t) for t in targets]) + ' restored from netlist cache.'
+            return 0
+
+        status = action(target, source, env, show=0)
+        if (status == 0):
+            _netlistCache.store(key, targets)
+        return status
+
+    def cached_actions_string(target, source, env):
+        if (isinstance(action, SCons.Action.ListAction)):
+            wrapped = action.list
+        else:
+            wrapped = [action]
+        lines = [a.strfunction(target, source, env) for a in wrapped]
+        return '\n'.join([l for l in lines if l])
+
+    return SCons.Action.Action(cached_actions, strfunction=cached_actions_string)
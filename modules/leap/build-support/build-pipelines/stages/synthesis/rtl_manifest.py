@@ -0,0 +1,74 @@
+##
+## RTL manifest.
+##
+## The generated and given Verilog and VHDL of a build can appear
+## anywhere in the module tree.  The manifest walks the tree once per
+## build.  It keeps the files in the order found, which tools such as
+## Synplify use as the VHDL compile order, along with sorted views for
+## the project files that list sources in sorted order.  The project
+## files written for each synthesis boundary then only merge in the
+## boundary's own wrapper and stubs.
+##
+## digest identifies the manifest's set of files, whatever their order.
+## Tools may use it to name or check files shared by all boundaries of
+## a build.
+##
+
+import re
+import heapq
+import hashlib
+
+import model
+
+_systemVerilog = re.compile(r'\.sv\s*$')
+
+
+def isSystemVerilog(path):
+    return _systemVerilog.search(path) is not None
+
+
+class RTLManifest():
+
+    def __init__(self, verilogs, vhds):
+        self.verilogs = list(verilogs)
+        self.vhds = list(vhds)
+
+        self.sortedVerilogs = sorted(verilogs)
+
+        # XST can't compile system verilog, so project files for it use
+        # the plain view.
+        self.plainVerilogs = [v for v in self.sortedVerilogs if not isSystemVerilog(v)]
+        self.systemVerilogs = [v for v in self.sortedVerilogs if isSystemVerilog(v)]
+
+        # VHDL is either a path, compiled into work, or a Source object
+        # that may name a library.  Sort on the path: Source objects
+        # don't compare.
+        self.sortedVhds = sorted(vhds, key=str)
+
+        digest = hashlib.md5()
+        for vlog in self.sortedVerilogs:
+            digest.update('verilog ' + vlog + '\n')
+        for vhd in self.sortedVhds:
+            digest.update('vhdl ' + vhdLibrary(vhd) + ' ' + str(vhd) + '\n')
+        self.digest = digest.hexdigest()
+
+    ##
+    ## boundaryVerilogs --
+    ##   The manifest's Verilog merged with a boundary's own files, in
+    ##   sorted order.  System verilog is left out unless systemVerilog.
+    ##
+    def boundaryVerilogs(self, extras, systemVerilog=True):
+        if (systemVerilog):
+            return list(heapq.merge(self.sortedVerilogs, sorted(extras)))
+        return list(heapq.merge(self.plainVerilogs, sorted([v for v in extras if not isSystemVerilog(v)])))
+
+
+##
+## vhdLibrary --
+##   The library a VHDL source compiles into.
+##
+def vhdLibrary(vhd):
+    if (isinstance(vhd, model.Source.Source) and 'lib' in vhd.attributes):
+        return vhd.attributes['lib']
+    return 'work'
+
@@ -1,6 +1,7 @@
 import os
 import functools
 import re
+import cStringIO
 
 import SCons
 
@@ -9,6 +10,11 @@ import model
 import li_module
 import parameter_substitution 
 import wrapper_gen_tool 
+import memory_governor
+import netlist_cache
+import vivado_worker_pool
+import rtl_manifest
+import bsv_tool
 
 def getModuleRTLs(moduleList, module):
     moduleVerilogs = []
@@ -31,19 +37,54 @@ def getModuleRTLs(moduleList, module):
 
 # Construct a list of all generated and given Verilog and VHDL.  These
 # can appear anywhere in the code. The generated Verilog live in the
-# .bsc directory.
-def globalRTLs(moduleList, rtlModules):
-    globalVerilogs = moduleList.getAllDependencies('VERILOG_LIB')
+# .bsc directory.  The lists are computed once per build and kept, in
+# the order found, in an RTLManifest.
+
+_rtlManifests = {}
+
+def getRTLManifest(moduleList, rtlModules):
+    key = tuple([module.name for module in rtlModules])
+    if (not key in _rtlManifests):
+        globalVerilogs = list(moduleList.getAllDependencies('VERILOG_LIB'))
+        globalVHDs = []
+
+        for module in rtlModules + [moduleList.topModule]:
+            [moduleVerilogs, moduleVHDs] = getModuleRTLs(moduleList, module)
+            globalVerilogs += moduleVerilogs
+            globalVHDs += moduleVHDs
 
-    globalVHDs = []
+        _rtlManifests[key] = rtl_manifest.RTLManifest(globalVerilogs, globalVHDs)
 
-    for module in rtlModules + [moduleList.topModule]:
-         [moduleVerilogs, moduleVHDs] = getModuleRTLs(moduleList, module)
-         globalVerilogs += moduleVerilogs
-         globalVHDs += moduleVHDs
+        if (model.getBuildPipelineDebug(moduleList) != 0):
+            print "RTL manifest: " + str(len(globalVerilogs)) + " Verilog, " + str(len(globalVHDs)) + \
+                  " VHDL, digest " + _rtlManifests[key].digest
 
-    return [globalVerilogs, globalVHDs] 
+    return _rtlManifests[key]
 
+def globalRTLs(moduleList, rtlModules):
+    manifest = getRTLManifest(moduleList, rtlModules)
+    return [list(manifest.verilogs), list(manifest.vhds)]
+
+# The manifest of lists returned by globalRTLs.  Lists built some other
+# way get a manifest of their own.
+def rtlManifestOf(globalVerilogs, globalVHDs):
+    for manifest in _rtlManifests.values():
+        if (manifest.verilogs == globalVerilogs and manifest.vhds == globalVHDs):
+            return manifest
+    return rtl_manifest.RTLManifest(globalVerilogs, globalVHDs)
+
+# Files a boundary's synthesis project reads that aren't sources of its
+# Command: the global RTL it names and the given Verilog headers.  The
+# netlist cache digests them into its keys.
+def projectKeyFiles(moduleList, globalVerilogs, globalVHDs):
+    manifest = rtlManifestOf(globalVerilogs, globalVHDs)
+    return manifest.sortedVerilogs + [str(vhd) for vhd in manifest.sortedVhds] + \
+           map(model.modify_path_hw, moduleList.getAllDependenciesWithPaths('GIVEN_VERILOG_HS'))
+
+# Generated project files are written only when their text changes, so
+# their time stamps stay put when the project is the same.
+def writeIfChanged(path, textFile):
+    return bsv_tool.writeIfChanged(path, textFile.getvalue())
 
 
 # produce an XST-consumable prj file from a global template. 
@@ -58,7 +99,7 @@ def generateXST(moduleList, module, xstTemplate):
                     'HW_BUILD_DIR': module.buildPath}
 
     XSTPath = 'config/' + module.wrapperName() + '.modified.xst'
-    XSTFile = open(XSTPath, 'w')
+    XSTFile = cStringIO.StringIO()
 
     # dump the template file, substituting symbols as we find them
     for token in xstTemplate:
@@ -87,6 +128,7 @@ def generateXST(moduleList, module, xstTemplate):
     else:
         XSTFile.write('-iobuf no\n')
     XSTFile.write('-uc ' + moduleList.compileDirectory + '/' + moduleList.topModule.wrapperName() + '.xcf\n')
+    writeIfChanged(XSTPath, XSTFile)
     return XSTPath
 
 # We need to generate a prj for each synthesis boundary.  For
@@ -96,19 +138,19 @@ def generateXST(moduleList, module, xstTemplate):
 def generatePrj(moduleList, module, globalVerilogs, globalVHDs):
     # spit out a new top-level prj
     prjPath = 'config/' + module.wrapperName() + '.prj' 
-    newPRJFile = open(prjPath, 'w') 
+    newPRJFile = cStringIO.StringIO()
+    manifest = rtlManifestOf(globalVerilogs, globalVHDs)
  
-    # Emit verilog source and stub references
-    verilogs = globalVerilogs + [model.get_temp_path(moduleList,module) + module.wrapperName() + '.v']
+    # Emit verilog source and stub references.  Ignore system verilog
+    # files.  XST can't compile them anyway...
+    verilogs = [model.get_temp_path(moduleList,module) + module.wrapperName() + '.v']
     verilogs +=  moduleList.getDependencies(module, 'VERILOG_STUB')
-    for vlog in sorted(verilogs):
-        # ignore system verilog files.  XST can't compile them anyway...
-        if (not re.search('\.sv\s*$',vlog)):    
-            newPRJFile.write("verilog work " + vlog + "\n")
-    for vhd in sorted(globalVHDs):
-        newPRJFile.write("vhdl work " + vhd + "\n")
-
-    newPRJFile.close()
+    for vlog in manifest.boundaryVerilogs(verilogs, systemVerilog=False):
+        newPRJFile.write("verilog work " + vlog + "\n")
+    for vhd in manifest.sortedVhds:
+        newPRJFile.write("vhdl " + rtl_manifest.vhdLibrary(vhd) + " " + str(vhd) + "\n")
+
+    writeIfChanged(prjPath, newPRJFile)
     return prjPath
 
 
@@ -126,7 +168,7 @@ def generateSynthesisTcl(moduleList, module, compileDirectory):
 
     MODEL_CLOCK_FREQ = moduleList.getAWBParam('clocks_device', 'MODEL_CLOCK_FREQ')
     synthAnnotationsTclPath = compileDirectory.File(module.wrapperName() + '.annotations.tcl')
-    synthAnnotationsTclFile = open(str(synthAnnotationsTclPath), 'w') 
+    synthAnnotationsTclFile = cStringIO.StringIO()
 
     annotationFiles = [os.path.relpath(str(synthAnnotationsTclPath), str(compileDirectory))]
     clockDeps = [synthAnnotationsTclPath]
@@ -185,7 +227,7 @@ def generateSynthesisTcl(moduleList, module, compileDirectory):
 
     # we need some synthesis algorithms... 
 
-    synthAnnotationsTclFile.close()
+    writeIfChanged(str(synthAnnotationsTclPath), synthAnnotationsTclFile)
 
     return annotationFiles, tclFuncs + tclHeaders + tclParams + clockDeps
 
@@ -194,10 +236,11 @@ def generateSynthesisTcl(moduleList, module, compileDirectory):
 def generateVivadoTcl(moduleList, module, globalVerilogs, globalVHDs, vivadoCompileDirectory):
     # spit out a new top-level prj
     prjPath = vivadoCompileDirectory.File(module.wrapperName() + '.synthesis.tcl')
-    newTclFile = open(str(prjPath), 'w') 
+    newTclFile = cStringIO.StringIO()
+    manifest = rtlManifestOf(globalVerilogs, globalVHDs)
  
     # Emit verilog source and stub references
-    verilogs = globalVerilogs + [model.get_temp_path(moduleList,module) + module.wrapperName() + '.v']
+    verilogs = [model.get_temp_path(moduleList,module) + module.wrapperName() + '.v']
     verilogs +=  moduleList.getDependencies(module, 'VERILOG_STUB')
 
     givenNetlists = [ moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + netlist for netlist in moduleList.getAllDependenciesWithPaths('GIVEN_NGCS') + moduleList.getAllDependenciesWithPaths('GIVEN_EDFS') ]
@@ -205,7 +248,7 @@ def generateVivadoTcl(moduleList, module, globalVerilogs, globalVHDs, vivadoComp
     # Replace any known black boxes
     blackBoxDeps = []
     blackBoxes = module.getAttribute('BLACK_BOX')
-    for vlog in sorted(verilogs):
+    for vlog in manifest.boundaryVerilogs(verilogs):
         if(not blackBoxes is None):
             if(vlog in blackBoxes):
                 vlog = blackBoxes[vlog]
@@ -218,12 +261,11 @@ def generateVivadoTcl(moduleList, module, globalVerilogs, globalVHDs, vivadoComp
         relpath = model.rel_if_not_abspath(sysv, str(vivadoCompileDirectory))
         newTclFile.write("read_verilog -sv -quiet " + relpath + "\n")
     
-    for vhd in sorted(globalVHDs):
+    for vhd in manifest.sortedVhds:
         if(isinstance(vhd, model.Source.Source)):            
-            # Got a source object, potentially more work to do.
-            relpath = model.rel_if_not_abspath(vhd.file, str(vivadoCompileDirectory))
-            lib = 'work'
+            # Got a source object.  Only those naming a library are read.
             if('lib' in vhd.attributes):
+                relpath = model.rel_if_not_abspath(vhd.file, str(vivadoCompileDirectory))
                 newTclFile.write("read_vhdl -lib " + vhd.attributes['lib'] + " " + relpath + "\n")
         else:
             # Just got a string
@@ -296,132 +338,21 @@ def generateVivadoTcl(moduleList, module, globalVerilogs, globalVHDs, vivadoComp
     newTclFile.write("report_utilization -file " + module.wrapperName() + ".synth.opt.util\n")
     newTclFile.write("write_checkpoint -force " + module.wrapperName() + ".synth.dcp\n")
     newTclFile.write("close_project -quiet\n")
-    newTclFile.close()
+    writeIfChanged(str(prjPath), newTclFile)
     return [prjPath] + blackBoxDeps + annotationDeps
 
 
 # Converts SRP file into resource representation which can be used
 # by the LIM compiler to assign modules to execution platforms.
 def getSRPResourcesClosure(module):
+    return li_module.resourceReportClosure(module, 'xst')
 
-    def collect_srp_resources(target, source, env):
-
-        srpFile = str(source[0])
-        rscFile = str(target[0])
-
-        srpHandle = open(srpFile, 'r')
-        rscHandle = open(rscFile, 'w')
-        resources =  {}
-        #block ram seems to have floating values.
-        attributes = {'LUT': " Number of Slice LUTs",'Reg': " Slice Registers", 'BRAM': " Block RAM Tile"}
-
-        for line in srpHandle:
-            for attribute in attributes:
-                if (re.match(attributes[attribute],line)):
-                    match = re.search(r'\D+(\d+)\D+(\d+)', line)
-                    if(match):
-                        resources[attribute] = [match.group(1), match.group(2)]
-
-        ## This needs to be merged with the platform-specific LUT to slice
-        ## conversion code, currently only in Vivado support code.
-        ## For now, we just use a hack.
-        if ('LUT' in resources):
-            # Assume 6 LUTs per slice
-            resources['SLICE'] = [str(int(int(resources['LUT'][0]) / 6.0)),
-                                  str(int(int(resources['LUT'][1]) / 6.0))]
-        else:
-            resources['SLICE'] = ["0", "0"]
 
-        rscHandle.write(module.name + ':')
-        rscHandle.write(':'.join([resource + ':' + resources[resource][0] + ':Total' + resource + ':' + resources[resource][1] for resource in resources]) + '\n')
-                                   
-        rscHandle.close()
-        srpHandle.close()
-    return collect_srp_resources
-
-
-
-# Converts SRP file into resource representation which can be used
-# by the LIM compiler to assign modules to execution platforms.
+# Converts a Vivado utilization report into resource representation
+# which can be used by the LIM compiler to assign modules to execution
+# platforms.
 def getVivadoUtilResourcesClosure(module):
-
-    def collect_srp_resources(target, source, env):
-
-        srpFile = str(source[0])
-        rscFile = str(target[0])
-
-        srpHandle = open(srpFile, 'r')
-        rscHandle = open(rscFile, 'w')
-        resources =  {}
-
-        attributes = {'LUT': "\| Slice LUTs",'Reg': "\| Slice Registers", 'BRAM': "\| Block RAM Tile"} 
-
-        primitives = {'LUT6': "\| LUT6", 'LUT5': "\| LUT5", 'LUT4': "\| LUT4",  'LUT3': "\| LUT3",  'LUT2': "\| LUT2",  'LUT1': "\| LUT1", 'SRL16E': '\| SRL16E', "Slice": "\| Slice      ", "RAMD32":"\RAMD32", "RAMS32":"\RAMS32", "RAMD64E":"\RAMD64E"}
-
-        attributes.update(primitives)
-
-        for line in srpHandle:
-            for attribute in attributes:
-                if (re.search(attributes[attribute],line)):
-                    match = False
-                    if(attribute in primitives):
-                        match = re.search(attributes[attribute] + '\D+(\d+)\D+', line)
-                        if(match):
-                            # Since the primitives don't really have a
-                            # total, give an arbitrarly large number
-                            # here.
-                            resources[attribute] = [match.group(1), str(10000000)]
-                    else:
-                        match = re.search(r'\D+(\d+\.?\d*)\D+\d+\D+(\d+)\D+', line)
-                        if(match):
-                            if(attribute in resources):
-                                print "ERROR: Resource extractor found multiple pattern matches"
-                                exit(1)
-                            resources[attribute] = [match.group(1), match.group(2)]
-
-        # This function figures converts the primitive resource usage
-        # to a number of slices. This function is highly device
-        # specific. Probably we will need to factor this over to a
-        # device library at some point.
-        def getResourceCount(deviceResources, resourceType):
-            if(resourceType in deviceResources):
-                return int(deviceResources[resourceType][0])
-            return 0
-
-        def convertSlicesVirtex7(deviceResources):
-            slices = 0
-            baseLUTs = getResourceCount(deviceResources, 'LUT')
-            lut6s = getResourceCount(deviceResources, 'LUT6')
-            lut5s = getResourceCount(deviceResources, 'LUT5')
-            lut4s = getResourceCount(deviceResources, 'LUT4')
-            lut3s = getResourceCount(deviceResources, 'LUT3')
-            lut2s = getResourceCount(deviceResources, 'LUT2')
-            lut1s = getResourceCount(deviceResources, 'LUT1')            
-            ramd32s = getResourceCount(deviceResources, 'RAMD32')            
-            rams32s = getResourceCount(deviceResources, 'RAMS32')            
-            ram64es = getResourceCount(deviceResources, 'RAMD64E')            
-            srl16es = getResourceCount(deviceResources, 'SRL16E')            
-
-            # Some 4/5 LUTs take a whole slice. We'll conservatively
-            # assume that they all do.  We should use 'LUT' count to
-            # figure out combinability
-            slice4LUTs = lut6s + lut5s + lut4s + srl16es + rams32s + 2 * ramd32s + 2 * ram64es  
-            slice8LUTs = lut1s + lut2s + lut3s 
-            slices = slice8LUTs / 8 + slice4LUTs / 4
-
-            return slices
-
-        # we should really know how many slices we have. But I am not
-        # sure how to do that.
-        resources['SLICE'] = [str(convertSlicesVirtex7(resources)), str(10000000)]
-
-        rscHandle.write(module.name + ':')
-        rscHandle.write(':'.join([resource + ':' + resources[resource][0] + ':Total' + resource + ':' + resources[resource][1] for resource in resources if resource not in primitives]) + '\n')
-                                   
-        rscHandle.close()
-        srpHandle.close()
-
-    return collect_srp_resources
+    return li_module.resourceReportClosure(module, 'vivado')
 
     
 def linkNGC(moduleList, module, firstPassLIGraph):
@@ -430,7 +361,7 @@ def linkNGC(moduleList, module, firstPassLIGraph):
 def buildNGC(moduleList, module, globalVerilogs, globalVHDs, xstTemplate, xilinx_xcf):
     #Let's synthesize a xilinx .prj file for ths synth boundary.
     # spit out a new prj
-    generatePrj(moduleList, module, globalVerilogs, globalVHDs)
+    prjPath = generatePrj(moduleList, module, globalVerilogs, globalVHDs)
     newXSTPath = generateXST(moduleList, module, xstTemplate)
 
     compile_dir = moduleList.env.Dir(moduleList.compileDirectory)
@@ -450,10 +381,13 @@ def buildNGC(moduleList, module, globalVerilogs, globalVHDs, xstTemplate, xilinx
         sorted(model.convertDependencies(moduleList.getDependencies(module, 'VERILOG_STUB'))) +
         [ newXSTPath ] +
         xilinx_xcf,
-        [ SCons.Script.Delete(compile_dir.File(module.wrapperName() + '.srp')),
-          SCons.Script.Delete(compile_dir.File(module.wrapperName() + '_xst.xrpt')),
-          'xst -intstyle silent -ifn config/' + module.wrapperName() + '.modified.xst -ofn ' + compile_dir.File(module.wrapperName() + '.srp').path,
-          '@echo xst ' + module.wrapperName() + ' build complete.' ])
+        netlist_cache.cachedActions(moduleList, 'xst',
+            [ SCons.Script.Delete(compile_dir.File(module.wrapperName() + '.srp')),
+              SCons.Script.Delete(compile_dir.File(module.wrapperName() + '_xst.xrpt')),
+              memory_governor.governedCommand(moduleList, 'xst:' + module.wrapperName(),
+                  'xst -intstyle silent -ifn config/' + module.wrapperName() + '.modified.xst -ofn ' + compile_dir.File(module.wrapperName() + '.srp').path),
+              '@echo xst ' + module.wrapperName() + ' build complete.' ],
+            [prjPath] + projectKeyFiles(moduleList, globalVerilogs, globalVHDs)))
 
 
     module.moduleDependency['SRP'] = [srpFile]
@@ -491,6 +425,7 @@ def buildVivadoEDF(moduleList, module, globalVerilogs, globalVHDs):
     #Let's synthesize a xilinx .prj file for this synth boundary.
     # spit out a new prj
     tclDeps = generateVivadoTcl(moduleList, module, globalVerilogs, globalVHDs, vivadoCompileDirectory)
+    givenNetlists = [ moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + netlist for netlist in moduleList.getAllDependenciesWithPaths('GIVEN_NGCS') + moduleList.getAllDependenciesWithPaths('GIVEN_EDFS') ]
 
     checkpointFile = vivadoCompileDirectory.File(module.wrapperName() + '.synth.dcp')
     edfFile = vivadoCompileDirectory.File(module.wrapperName() + '.edf')
@@ -514,10 +449,16 @@ def buildVivadoEDF(moduleList, module, globalVerilogs, globalVHDs):
         sorted(moduleList.getAllDependencies('VERILOG_LIB')) +
         sorted(map(model.modify_path_hw,moduleList.getAllDependenciesWithPaths('GIVEN_VERILOGS'))) +
         sorted(model.convertDependencies(moduleList.getDependencies(module, 'VERILOG_STUB'))),
-        [ SCons.Script.Delete(vivadoCompileDirectory.File(module.wrapperName() + '.synth.opt.util')),
-          SCons.Script.Delete(vivadoCompileDirectory.File(module.wrapperName() + '_xst.xrpt')),
-          'cd ' + vivadoCompileDirectory.path + '; touch start.txt; vivado -nojournal -mode batch -source ' + module.wrapperName() + '.synthesis.tcl 2>&1 > ' + logFile,
-          '@echo vivado synthesis ' + module.wrapperName() + ' build complete.' ])
+        netlist_cache.cachedActions(moduleList, 'vivado',
+            [ SCons.Script.Delete(vivadoCompileDirectory.File(module.wrapperName() + '.synth.opt.util')),
+              SCons.Script.Delete(vivadoCompileDirectory.File(module.wrapperName() + '_xst.xrpt')),
+              vivado_worker_pool.tclAction(moduleList, vivadoCompileDirectory.path, module.wrapperName() + '.synthesis.tcl', logFile,
+                  memory_governor.governedCommand(moduleList, 'vivado:' + module.wrapperName(),
+                      'cd ' + vivadoCompileDirectory.path + '; touch start.txt; vivado -nojournal -mode batch -source ' + module.wrapperName() + '.synthesis.tcl 2>&1 > ' + logFile)),
+              '@echo vivado synthesis ' + module.wrapperName() + ' build complete.' ],
+            projectKeyFiles(moduleList, globalVerilogs, globalVHDs) +
+            map(model.modify_path_hw, moduleList.getAllDependenciesWithPaths('GIVEN_SYSTEM_VERILOGS')) +
+            givenNetlists))
 
     utilFile = moduleList.env.Command(resourceFile,
                                       srpFile,
@@ -0,0 +1,344 @@
+##
+## Timing database.
+##
+## Post-route timing used to be reduced to pass/fail by searching the
+## final report for a slack line.  Here timing reports -- Vivado
+## report_timing_summary output (.twr), including the per area group
+## .place.twr/.route.twr reports written by place_dcp -- are parsed
+## into records holding:
+##
+##   - design WNS/TNS, failing endpoints and hold slack,
+##   - per clock domain period and WNS/TNS,
+##   - the worst setup paths, with their endpoints mapped back to LEAP
+##     synthesis boundaries and, where the cell names show it, to LI
+##     channels.
+##
+## Each build's records are appended to a database in the compile
+## directory.  Comparing a build with the previous one ranks modules by
+## how much their worst slack moved, so Fmax regressions show up and can
+## be tracked to a module.
+##
+
+import os
+import re
+import time
+import cPickle as pickle
+
+## Builds kept in the database.
+DEFAULT_HISTORY = 50
+
+_designHeader = re.compile(r'^\s*WNS\(ns\)\s+TNS\(ns\)')
+_clockSummaryHeader = re.compile(r'^\|\s*Clock Summary')
+_intraClockHeader = re.compile(r'^\|\s*Intra Clock Table')
+_sectionHeader = re.compile(r'^\|\s*[A-Za-z]')
+_delayPaths = re.compile(r'^(Max|Min) Delay Paths')
+_clockRow = re.compile(r'^(\s*)(\S+)\s+\{[^}]*\}\s+([\d.]+)\s+([\d.]+)')
+_intraClockRow = re.compile(r'^(\S+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(\d+)\s+(\d+)')
+_number = re.compile(r'^-?[\d.]+$')
+_slack = re.compile(r'^Slack[^:]*:\s*(-?[\d.]+)\s*ns')
+_pathField = re.compile(r'^\s+(Source|Destination|Path Group|Requirement|Logic Levels):\s+(\S+)')
+
+
+##
+## parseTimingReport --
+##   Timing record of a report_timing_summary report.  Paths are the
+##   maxPaths worst, ordered by slack.  Missing sections leave their
+##   fields None or empty.
+##
+def parseTimingReport(reportFile, maxPaths=20):
+    record = {'report': reportFile,
+              'wns': None, 'tns': None, 'failingEndpoints': None, 'totalEndpoints': None,
+              'whs': None, 'ths': None,
+              'clocks': {},
+              'paths': []}
+
+    section = None
+    expectDesignRow = False
+    setupPaths = True
+    path = None
+
+    for line in open(reportFile, 'r'):
+        line = line.rstrip('\n')
+
+        if (_clockSummaryHeader.match(line)):
+            section = 'clocks'
+            continue
+        if (_intraClockHeader.match(line)):
+            section = 'intra'
+            continue
+        if (_sectionHeader.match(line)):
+            section = None
+            continue
+
+        if (_designHeader.match(line)):
+            expectDesignRow = True
+            continue
+        if (expectDesignRow):
+            fields = line.split()
+            if (len(fields) >= 6 and _number.match(fields[0])):
+                record['wns'] = float(fields[0])
+                record['tns'] = float(fields[1])
+                record['failingEndpoints'] = int(fields[2])
+                record['totalEndpoints'] = int(fields[3])
+                record['whs'] = float(fields[4])
+                record['ths'] = float(fields[5])
+                expectDesignRow = False
+            continue
+
+        # Only setup paths limit Fmax.
+        match = _delayPaths.match(line)
+        if (match):
+            section = None
+            setupPaths = (match.group(1) == 'Max')
+            path = None
+            continue
+
+        if (section == 'clocks'):
+            match = _clockRow.match(line)
+            if (match):
+                clock = record['clocks'].setdefault(match.group(2), {})
+                clock['period'] = float(match.group(3))
+                clock['frequency'] = float(match.group(4))
+                clock['generated'] = (match.group(1) != '')
+            continue
+
+        if (section == 'intra'):
+            match = _intraClockRow.match(line)
+            if (match and match.group(1) in record['clocks']):
+                clock = record['clocks'][match.group(1)]
+                clock['wns'] = float(match.group(2))
+                clock['tns'] = float(match.group(3))
+                clock['failingEndpoints'] = int(match.group(4))
+            continue
+
+        match = _slack.match(line)
+        if (match and setupPaths and not 'hold' in line):
+            path = {'slack': float(match.group(1)),
+                    'source': None, 'destination': None, 'group': None,
+                    'requirement': None, 'levels': None}
+            record['paths'].append(path)
+            continue
+
+        if (path is not None):
+            match = _pathField.match(line)
+            if (match):
+                (name, value) = match.groups()
+                if (name == 'Source'):
+                    path['source'] = value
+                elif (name == 'Destination'):
+                    path['destination'] = value
+                elif (name == 'Path Group'):
+                    path['group'] = value
+                elif (name == 'Requirement'):
+                    path['requirement'] = float(value.rstrip('ns'))
+                else:
+                    path['levels'] = int(value)
+
+    record['paths'].sort(key=lambda p: p['slack'])
+    del record['paths'][maxPaths:]
+
+    # Reports without a summary table (ISE) still list path slacks.
+    if (record['wns'] is None and len(record['paths']) > 0):
+        record['wns'] = record['paths'][0]['slack']
+
+    return record
+
+
+##
+## EndpointMapper --
+##   Names the synthesis boundary and LI channel of a cell path.
+##   boundaryPaths maps the instance path of a boundary (an area group's
+##   source path) to its module.  channels are (channel, module) pairs;
+##   a channel matches a cell path containing its name with
+##   non-identifier characters replaced by '_'.
+##
+class EndpointMapper():
+
+    def __init__(self, boundaryPaths={}, channels=[]):
+        self.boundaryPaths = sorted(boundaryPaths.items(), key=lambda (path, module): -len(path))
+        self.channels = [(re.sub(r'\W', '_', name), name, module) for (name, module) in channels]
+
+    def boundary(self, cell):
+        if (cell is None):
+            return None
+        for (path, module) in self.boundaryPaths:
+            if (cell == path or cell.startswith(path + '/')):
+                return module
+        return None
+
+    def channel(self, cell):
+        if (cell is None):
+            return None
+        for (pattern, name, module) in self.channels:
+            if (pattern in cell):
+                return name
+        return None
+
+    def annotate(self, record, module=None):
+        for path in record['paths']:
+            for end in ['source', 'destination']:
+                boundary = self.boundary(path[end])
+                if (boundary is None):
+                    boundary = module
+                path[end + 'Boundary'] = boundary
+                path[end + 'Channel'] = self.channel(path[end])
+        return record
+
+
+class TimingDatabase():
+
+    def __init__(self, dbPath, history=DEFAULT_HISTORY):
+        self.dbPath = dbPath
+        self.history = history
+
+        # List of builds, oldest first.  A build is a dictionary with
+        # 'time', 'label', 'design' (a timing record), 'reportTime' (the
+        # modification time of the design report) and 'modules' (module
+        # name -> timing record).
+        self.builds = []
+        if (os.path.exists(dbPath)):
+            try:
+                handle = open(dbPath, 'rb')
+                self.builds = pickle.load(handle)
+                handle.close()
+            except Exception:
+                print "Timing database: ignoring unreadable " + dbPath
+
+    def record(self, label, design, modules):
+        self.builds.append({'time': time.time(),
+                            'label': label,
+                            'design': design,
+                            'reportTime': os.path.getmtime(design['report']),
+                            'modules': modules})
+        del self.builds[:-self.history]
+        self.store()
+
+    ##
+    ## recorded --
+    ##   True if the latest build was recorded from this very report.
+    ##
+    def recorded(self, reportFile):
+        if (len(self.builds) == 0):
+            return False
+        latest = self.builds[-1]
+        return (latest['design']['report'] == reportFile and
+                latest.get('reportTime') == os.path.getmtime(reportFile))
+
+    def store(self):
+        tmpPath = self.dbPath + '.' + str(os.getpid())
+        handle = open(tmpPath, 'wb')
+        pickle.dump(self.builds, handle, protocol=-1)
+        handle.close()
+        os.rename(tmpPath, self.dbPath)
+
+    ##
+    ## moduleSlacks --
+    ##   Worst slack per module in a build: the module's own report if it
+    ##   has one, else the worst design path ending in it.
+    ##
+    def moduleSlacks(self, build):
+        slacks = {}
+        for (module, record) in build['modules'].items():
+            if (record['wns'] is not None):
+                slacks[module] = record['wns']
+
+        for path in build['design']['paths']:
+            module = path.get('destinationBoundary')
+            if (module is not None and not module in build['modules']):
+                slacks[module] = min(path['slack'], slacks.get(module, path['slack']))
+        return slacks
+
+    ##
+    ## regressions --
+    ##   (module, previous slack, latest slack) for modules in both of
+    ##   the last two builds, most worsened first.
+    ##
+    def regressions(self):
+        if (len(self.builds) < 2):
+            return []
+
+        previous = self.moduleSlacks(self.builds[-2])
+        latest = self.moduleSlacks(self.builds[-1])
+        changes = [(module, previous[module], latest[module]) for module in latest if module in previous]
+        changes.sort(key=lambda (module, before, after): after - before)
+        return changes
+
+    ##
+    ## summary --
+    ##   Text report of the latest build against the previous one.
+    ##
+    def summary(self):
+        if (len(self.builds) == 0):
+            return ''
+
+        latest = self.builds[-1]
+        design = latest['design']
+        lines = ['Timing summary for ' + latest['label']]
+        if (design['wns'] is not None):
+            lines.append('  WNS %.3f ns  TNS %.3f ns  failing endpoints %s' %
+                         (design['wns'], design['tns'] or 0.0, design['failingEndpoints']))
+        if (len(self.builds) > 1 and self.builds[-2]['design']['wns'] is not None and design['wns'] is not None):
+            lines.append('  WNS change since previous build: %+.3f ns' % (design['wns'] - self.builds[-2]['design']['wns']))
+
+        for clock in sorted(design['clocks']):
+            values = design['clocks'][clock]
+            if ('wns' in values):
+                lines.append('  clock %-24s %8.3f MHz  WNS %8.3f ns' % (clock, values['frequency'], values['wns']))
+
+        for path in design['paths'][:5]:
+            lines.append('  path slack %8.3f ns  %s -> %s%s' %
+                         (path['slack'],
+                          path.get('sourceBoundary') or '?',
+                          path.get('destinationBoundary') or '?',
+                          ('  (channel ' + (path.get('destinationChannel') or path.get('sourceChannel')) + ')')
+                          if (path.get('destinationChannel') or path.get('sourceChannel')) else ''))
+
+        regressions = [r for r in self.regressions() if r[2] < r[1]]
+        if (len(regressions) > 0):
+            lines.append('  Worst slack regressions by module:')
+            for (module, before, after) in regressions[:10]:
+                lines.append('    %-32s %8.3f -> %8.3f ns' % (module, before, after))
+
+        return '\n'.join(lines) + '\n'
+
+
+##
+## timingDatabaseClosure --
+##   SCons action recording a build's timing, for a Command whose source
+##   is the final timing report and whose target is the text summary.
+##   moduleReports maps modules to candidate reports of their own, the
+##   first existing one being used.  mapper is a function returning the
+##   build's EndpointMapper, called when the action runs.
+##
+##   SCons signs the action by the values it closes over, so mapper
+##   should close over plain values only.  A report already recorded
+##   isn't recorded again.
+##
+def timingDatabaseClosure(moduleList, label, moduleReports, mapper):
+    moduleReports = sorted(moduleReports.items())
+    dbPath = moduleList.compileDirectory + '/timing.db.pickle'
+    history = moduleList.getAWBParam('synthesis_library', 'TIMING_DATABASE_HISTORY')
+    maxPaths = moduleList.getAWBParam('synthesis_library', 'TIMING_DATABASE_PATHS')
+
+    def timing_database(target, source, env):
+        designReport = str(source[0])
+        db = TimingDatabase(dbPath, history)
+
+        if (not db.recorded(designReport)):
+            endpoints = mapper()
+            design = endpoints.annotate(parseTimingReport(designReport, maxPaths))
+            modules = {}
+            for (module, reportFiles) in moduleReports:
+                for reportFile in reportFiles:
+                    if (os.path.exists(reportFile)):
+                        modules[module] = endpoints.annotate(parseTimingReport(reportFile, maxPaths), module)
+                        break
+            db.record(label, design, modules)
+
+        summary = db.summary()
+        print summary
+        handle = open(str(target[0]), 'w')
+        handle.write(summary)
+        handle.close()
+
+    return timing_database
@@ -0,0 +1,385 @@
+##
+## Pool of long-lived Vivado Tcl workers.
+##
+## Each synthesis boundary and each edf_to_dcp and place_dcp checkpoint
+## step used to start "vivado -mode batch" afresh, and Vivado takes tens
+## of seconds just to start.  A VivadoWorkerPool keeps up to N tool
+## processes in Tcl mode and feeds each job's generated script to an
+## idle one over its stdin.  For each job the worker is sent:
+##
+##   cd <job directory>
+##   source <job script>            (errors caught)
+##   <reset: close any open project and designs>
+##   puts <end marker> <status>
+##
+## Everything the worker prints up to the end marker goes to the job's
+## log file.  A worker that dies mid-job is replaced and the job is run
+## again on the fresh worker.  Workers are recycled after a number of
+## jobs to bound leaked tool state and memory.
+##
+## Any Tcl shell can stand in for Vivado, so the pool can be exercised
+## with tclsh:
+##
+##   python vivado_worker_pool.py -c tclsh -n 2 dir1/a.tcl dir2/b.tcl ...
+##
+
+import os
+import sys
+import time
+import getopt
+import random
+import threading
+import subprocess
+
+DEFAULT_COMMAND = 'vivado -nojournal -nolog -mode tcl'
+
+## Tcl run after every job to leave the worker as if freshly started.
+## Commands unknown to a stand-in shell are caught.
+RESET_TCL = 'catch {close_project -quiet}\n' + \
+            'catch {foreach leap_design [get_designs -quiet] {current_design $leap_design; close_design}}\n'
+
+## A job whose worker crashes is run this many times in all.
+JOB_ATTEMPTS = 2
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+##
+## processTree --
+##   pid and its descendants, found through /proc.  Vivado runs below
+##   the shell and launcher script that the worker command starts.
+##
+def processTree(pid):
+    parents = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return [pid]
+    for entry in entries:
+        if (not entry.isdigit()):
+            continue
+        try:
+            stat = open('/proc/' + entry + '/stat').read()
+        except IOError:
+            continue
+        # The command name in parentheses may contain spaces.
+        parents[int(entry)] = int(stat[stat.rfind(')') + 2:].split()[1])
+
+    tree = [pid]
+    for p in tree:
+        tree += [c for c in parents if (parents[c] == p)]
+    return tree
+
+##
+## resetPeakMemory --
+##   Restart peak resident set (VmHWM) tracking of the processes in pids.
+##   Returns False where the kernel doesn't support it.
+##
+def resetPeakMemory(pids):
+    try:
+        for pid in pids:
+            handle = open('/proc/' + str(pid) + '/clear_refs', 'w')
+            handle.write('5')
+            handle.close()
+    except IOError:
+        return False
+    return True
+
+##
+## peakMemoryMB --
+##   Summed peak resident sets of the processes in pids, or None if
+##   they can't be read.
+##
+def peakMemoryMB(pids):
+    peakKB = 0
+    try:
+        for pid in pids:
+            for line in open('/proc/' + str(pid) + '/status'):
+                if (line.startswith('VmHWM:')):
+                    peakKB += int(line.split()[1])
+    except (IOError, ValueError):
+        return None
+    return peakKB // 1024
+
+
+class VivadoWorker():
+
+    def __init__(self, command, environment=None):
+        self.command = command
+        self.jobs = 0
+        # Peak memory of the last job, in MB, or None if unmeasured.
+        self.peakMB = None
+        self.process = subprocess.Popen(command, shell=True, env=environment,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    ##
+    ## run --
+    ##   Source script in directory, copying the worker's output to
+    ##   logFile.  Returns the Tcl status of the script (0 for success).
+    ##   Raises WorkerCrashed if the worker exits first.  The peak memory
+    ##   tracking of the worker's processes is reset before the job, so
+    ##   peakMB afterwards is the job's own.
+    ##
+    def run(self, directory, script, logFile):
+        self.jobs += 1
+        self.peakMB = None
+        measured = resetPeakMemory(processTree(self.process.pid))
+        marker = 'LEAP_WORKER_DONE_%016x' % random.getrandbits(64)
+
+        job = 'cd {' + os.path.abspath(directory) + '}\n' + \
+              'set leap_status [catch {source {' + script + '}} leap_result]\n' + \
+              'if {$leap_status} {puts "ERROR: $leap_result"}\n' + \
+              RESET_TCL + \
+              'cd {' + os.getcwd() + '}\n' + \
+              'puts "\\n' + marker + ' $leap_status"\n' + \
+              'flush stdout\n'
+
+        log = open(logFile, 'w')
+        try:
+            try:
+                self.process.stdin.write(job)
+                self.process.stdin.flush()
+            except IOError:
+                raise WorkerCrashed(self.command)
+
+            while True:
+                line = self.process.stdout.readline()
+                if (line == ''):
+                    raise WorkerCrashed(self.command)
+
+                # Tcl mode prompts have no newline, so the marker may
+                # follow one on the same line.
+                position = line.find(marker)
+                if (position >= 0):
+                    log.write(line[:position])
+                    if (measured):
+                        self.peakMB = peakMemoryMB(processTree(self.process.pid))
+                    return int(line[position + len(marker):].split()[0])
+                log.write(line)
+        finally:
+            log.close()
+
+    def close(self):
+        if (not self.alive()):
+            return
+        try:
+            self.process.stdin.write('exit\n')
+            self.process.stdin.close()
+        except IOError:
+            pass
+        self.process.wait()
+
+
+class VivadoWorkerPool():
+
+    def __init__(self, size, command=DEFAULT_COMMAND, jobsPerWorker=20, environment=None, debug=False):
+        self.size = size
+        self.command = command
+        self.jobsPerWorker = jobsPerWorker
+        self.environment = environment
+        self.debug = debug
+
+        self.condition = threading.Condition()
+        self.idle = []
+        self.started = 0
+
+    ##
+    ## acquire --
+    ##   An idle worker, started if the pool isn't full.  Blocks while
+    ##   all size workers are busy.
+    ##
+    def acquire(self):
+        self.condition.acquire()
+        try:
+            while (len(self.idle) == 0 and self.started >= self.size):
+                self.condition.wait(10)
+
+            if (len(self.idle) > 0):
+                return self.idle.pop()
+            self.started += 1
+        finally:
+            self.condition.release()
+
+        try:
+            return VivadoWorker(self.command, self.environment)
+        except OSError:
+            self._forget()
+            raise
+
+    def release(self, worker):
+        if (worker.alive() and worker.jobs < self.jobsPerWorker):
+            self.condition.acquire()
+            self.idle.append(worker)
+            self.condition.notify()
+            self.condition.release()
+        else:
+            worker.close()
+            self._forget()
+
+    def _forget(self):
+        self.condition.acquire()
+        self.started -= 1
+        self.condition.notify()
+        self.condition.release()
+
+    ##
+    ## run --
+    ##   Run a Tcl script on a pooled worker.  Returns 0 on success.
+    ##   When a MemoryGovernor is given the job is admitted under it as
+    ##   a run of key and its peak memory and duration are recorded.
+    ##   Only the duration is recorded where the kernel can't measure
+    ##   the peak of a single job.
+    ##
+    def run(self, directory, script, logFile, governor=None, key=None):
+        if (governor is None):
+            return self._run(directory, script, logFile)[0]
+
+        reserveMB = governor.estimate(key)
+        governor.admit(key, reserveMB)
+        try:
+            start = time.time()
+            (status, peakMB) = self._run(directory, script, logFile)
+        finally:
+            governor.release(reserveMB)
+
+        if (status == 0):
+            seconds = int(time.time() - start)
+            if (peakMB is None):
+                governor.recordDuration(key, seconds)
+            else:
+                governor.record(key, peakMB, seconds)
+        return status
+
+    ##
+    ## _run --
+    ##   Run a job, retrying once on a fresh worker if its worker dies.
+    ##   Returns the job's status and peak memory in MB (None if unknown).
+    ##
+    def _run(self, directory, script, logFile):
+        for attempt in range(JOB_ATTEMPTS):
+            worker = self.acquire()
+            try:
+                status = worker.run(directory, script, logFile)
+            except WorkerCrashed:
+                print "Vivado worker pool: worker died running " + os.path.join(directory, script) + \
+                      ('; retrying' if attempt + 1 < JOB_ATTEMPTS else '')
+                worker.close()
+                self._forget()
+                continue
+
+            self.release(worker)
+            if (self.debug):
+                print "Vivado worker pool: " + os.path.join(directory, script) + " status " + str(status) + \
+                      ('' if worker.peakMB is None else ', peak ' + str(worker.peakMB) + ' MB')
+            return (status, worker.peakMB)
+
+        return (1, None)
+
+    def close(self):
+        self.condition.acquire()
+        idle = self.idle
+        self.idle = []
+        self.condition.release()
+        for worker in idle:
+            worker.close()
+
+
+_workerPool = None
+
+##
+## getWorkerPool --
+##   The build's VivadoWorkerPool, or None when batch runs are used.
+##
+def getWorkerPool(moduleList):
+    global _workerPool
+
+    if (not moduleList.getAWBParamSafe('synthesis_library', 'VIVADO_WORKER_POOL')):
+        return None
+
+    if (_workerPool is None):
+        # Imported here so that the pool runs outside SCons too.
+        import atexit
+        import model
+
+        _workerPool = VivadoWorkerPool(moduleList.getAWBParam('synthesis_library', 'VIVADO_WORKER_POOL'),
+                                       moduleList.getAWBParam('synthesis_library', 'VIVADO_WORKER_COMMAND'),
+                                       moduleList.getAWBParam('synthesis_library', 'VIVADO_WORKER_JOBS'),
+                                       environment=dict([(k, str(v)) for (k, v) in moduleList.env['ENV'].items()]),
+                                       debug=model.getBuildPipelineDebug(moduleList))
+        atexit.register(_workerPool.close)
+    return _workerPool
+
+##
+## tclAction --
+##   An SCons action sourcing script in directory on a pooled Vivado
+##   worker, logging to logFile (relative to directory).  batchAction,
+##   the equivalent "vivado -mode batch" action, is returned instead
+##   when the pool is off.
+##
+##   Pooled jobs are admitted by the build's MemoryGovernor, if any, as
+##   runs of "vivado:<script name>", so each checkpoint step of a module
+##   keeps its own history.  Like governedCommand, the action closes over
+##   strings only and finds the pool and the governor when it runs.
+##
+def tclAction(moduleList, directory, script, logFile, batchAction):
+    if (getWorkerPool(moduleList) is None):
+        return batchAction
+
+    import SCons.Action
+    import memory_governor
+
+    memory_governor.getMemoryGovernor(moduleList)
+    key = 'vivado:' + script
+    logPath = os.path.join(directory, logFile)
+
+    def vivado_worker_tcl(target, source, env):
+        import memory_governor
+        open(os.path.join(directory, 'start.txt'), 'a').close()
+        return _workerPool.run(directory, script, logPath, memory_governor._memoryGovernor, key)
+
+    return SCons.Action.Action(vivado_worker_tcl,
+                               'vivado worker: ' + os.path.join(directory, script) + ' > ' + logFile)
+
+if __name__ == '__main__':
+    try:
+        (opts, scripts) = getopt.getopt(sys.argv[1:], 'c:n:j:', ['command=', 'workers=', 'jobs='])
+    except getopt.GetoptError, e:
+        print str(e)
+        print "usage: vivado_worker_pool.py [-c command] [-n workers] [-j jobs per worker] script.tcl ..."
+        sys.exit(2)
+
+    command = DEFAULT_COMMAND
+    workers = 2
+    jobs = 20
+    for (opt, value) in opts:
+        if (opt in ('-c', '--command')):
+            command = value
+        elif (opt in ('-n', '--workers')):
+            workers = int(value)
+        elif (opt in ('-j', '--jobs')):
+            jobs = int(value)
+
+    pool = VivadoWorkerPool(workers, command, jobs, debug=True)
+    results = {}
+
+    def runScript(path):
+        results[path] = pool.run(os.path.dirname(path) or '.', os.path.basename(path),
+                                 path + '.log')
+
+    threads = [threading.Thread(target=runScript, args=(path,)) for path in scripts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    for path in scripts:
+        print path + ': ' + ('ok' if results.get(path) == 0 else 'failed')
+    sys.exit(max([0] + [1 for path in scripts if results.get(path) != 0]))
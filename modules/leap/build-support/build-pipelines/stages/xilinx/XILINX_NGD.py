@@ -37,7 +37,7 @@ class NGD():
 
         moduleList.env.Command( 
             [area_group_file],
-            area_constraints.areaConstraintsFile(),
+            area_constraints.areaGroupDependencies(),
             area_group_ucf_closure(moduleList)
             )                   
 
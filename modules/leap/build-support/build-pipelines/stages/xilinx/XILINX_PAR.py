@@ -1,6 +1,7 @@
 import os
 import SCons.Script
 from model import  *
+import ise_guide
 
 #this might be better implemented as a 'Node' in scons, but 
 #I want to get something working before exploring that path
@@ -37,7 +38,13 @@ class PAR():
     multi_thread = ''
     if(xilinx_version > 120):
       placer_table = ' '
-      multi_thread = '-mt 4 ' 
+      threads = moduleList.getAWBParam('xilinx_par', 'PAR_THREADS')
+      if(threads > 1):
+        multi_thread = '-mt ' + str(threads) + ' ' 
+
+    # Parallel PAR runs pass their own cost tables.
+    if(str(moduleList.getAWBParam('xilinx_par', 'PAR_COST_TABLES')).strip() != ''):
+      placer_table = ' '
 
     fpga_part_xilinx = moduleList.env['DEFS']['FPGA_PART_XILINX']
     xilinx_apm_name = moduleList.compileDirectory + '/' + moduleList.apmName
@@ -56,7 +63,12 @@ class PAR():
         SCons.Script.Delete(xilinx_apm_name + '_par.xpi'),
         SCons.Script.Delete(xilinx_apm_name + '_par_pad.csv'),
         SCons.Script.Delete(xilinx_apm_name + '_par_pad.txt'),
-        'par -w -ol high ' + moduleList.smartguide + placer_table + multi_thread + xilinx_apm_name + '_map.ncd $TARGET ' + xilinx_apm_name + '.pcf' ]
+        # The guide, if any, is chosen when par runs.
+        ise_guide.parClosure(moduleList,
+                             '-w -ol high' + placer_table + multi_thread,
+                             xilinx_apm_name + '_map.ncd',
+                             xilinx_apm_name + '.pcf',
+                             moduleList.getAllDependencies('SYNTHESIS')) ]
         + memoize_ncd_command)
 
 
@@ -0,0 +1,363 @@
+##
+## Guided and parallel ISE place and route.
+##
+## Smart guide lets PAR start from an earlier routed NCD.  It pays off
+## when the design changed little since then and may otherwise slow PAR
+## down or make it fail.  Instead of a single cached NCD per APM, routed
+## NCDs are kept in a GuideCache with a fingerprint of the netlists they
+## came from.  The guide for a build is the cached NCD whose netlists are
+## most alike (by size, the share of netlists with identical contents).
+##
+## A GuidePolicy decides whether to use it, from the outcomes of earlier
+## PAR runs of the APM:
+##
+##   - never below ISE_GUIDE_MIN_SIMILARITY,
+##   - never once guided runs fail more often than ISE_GUIDE_MIN_SUCCESS
+##     allows,
+##   - with enough runs of both kinds, only if guided runs were faster,
+##   - otherwise, try it.
+##
+## A guided run that fails is repeated unguided.
+##
+## PAR may also run as several variants in parallel, one per cost table
+## in PAR_COST_TABLES.  The variant with the best timing score becomes
+## the build's NCD.
+##
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import subprocess
+import cPickle as pickle
+
+import SCons.Action
+
+import model
+import synthesis_library
+
+## PAR runs remembered per APM.
+POLICY_HISTORY = 20
+
+## Runs of each kind needed before their times are compared.
+POLICY_MIN_RUNS = 2
+
+## Files PAR writes next to its output NCD.
+PAR_OUTPUTS = ['.ncd', '.par', '.pad', '.unroutes', '.xpi', '.ptwx', '_pad.csv', '_pad.txt']
+
+_timingScore = re.compile(r'Timing Score:\s*(\d+)')
+
+
+##
+## netlistFingerprint --
+##   Base name -> (digest, size) of netlists.
+##
+def netlistFingerprint(netlists):
+    fingerprint = {}
+    for netlist in netlists:
+        path = str(netlist)
+        if (os.path.isfile(path)):
+            fingerprint[os.path.basename(path)] = (synthesis_library.fileDigest(path), os.path.getsize(path))
+    return fingerprint
+
+##
+## similarity --
+##   Share, by size, of the netlists of two fingerprints that are the
+##   same in both.  1.0 for identical designs.
+##
+def similarity(a, b):
+    total = 0
+    same = 0
+    for name in set(a.keys()) | set(b.keys()):
+        size = max([f[name][1] for f in [a, b] if name in f])
+        total += size
+        if (name in a and name in b and a[name][0] == b[name][0]):
+            same += size
+    if (total == 0):
+        return 0.0
+    return float(same) / total
+
+
+class GuideCache():
+
+    def __init__(self, directory, maxEntries=8, debug=False):
+        self.directory = directory
+        self.maxEntries = maxEntries
+        self.debug = debug
+
+    def _entries(self):
+        if (not os.path.isdir(self.directory)):
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if os.path.isfile(os.path.join(self.directory, name, 'guide.pickle'))]
+
+    ##
+    ## best --
+    ##   (similarity, NCD) of the cached guide for part most like the
+    ##   fingerprint, or (0.0, None).
+    ##
+    def best(self, fingerprint, part):
+        best = (0.0, None)
+        for entry in self._entries():
+            try:
+                handle = open(os.path.join(entry, 'guide.pickle'), 'rb')
+                info = pickle.load(handle)
+                handle.close()
+            except Exception:
+                continue
+            if (info['part'] != part):
+                continue
+            score = similarity(fingerprint, info['fingerprint'])
+            if (score > best[0]):
+                best = (score, os.path.join(entry, 'guide.ncd'))
+
+        if (best[1] is not None):
+            os.utime(os.path.dirname(best[1]), None)
+        return best
+
+    ##
+    ## store --
+    ##   Cache a routed NCD built from the netlists of fingerprint.
+    ##
+    def store(self, ncd, fingerprint, part):
+        digest = hashlib.md5(part)
+        for name in sorted(fingerprint):
+            digest.update(name + ' ' + fingerprint[name][0] + '\n')
+        entry = os.path.join(self.directory, digest.hexdigest())
+        if (os.path.isdir(entry)):
+            os.utime(entry, None)
+            return
+
+        tmpEntry = entry + '.' + str(os.getpid())
+        try:
+            os.makedirs(tmpEntry)
+            shutil.copyfile(ncd, os.path.join(tmpEntry, 'guide.ncd'))
+            handle = open(os.path.join(tmpEntry, 'guide.pickle'), 'wb')
+            pickle.dump({'part': part, 'fingerprint': fingerprint, 'time': time.time()}, handle, protocol=-1)
+            handle.close()
+            os.rename(tmpEntry, entry)
+        except (IOError, OSError), e:
+            print "Guide cache: failed to store " + ncd + ": " + str(e)
+            shutil.rmtree(tmpEntry, True)
+            return
+
+        entries = sorted([(os.path.getmtime(e), e) for e in self._entries()])
+        for (mtime, old) in entries[:max(0, len(entries) - self.maxEntries)]:
+            if (self.debug):
+                print "Guide cache: evicting " + old
+            shutil.rmtree(old, True)
+
+
+class GuidePolicy():
+
+    def __init__(self, historyFile, mode='auto', minSimilarity=0.8, minSuccess=0.75):
+        self.historyFile = historyFile
+        self.mode = mode
+        self.minSimilarity = minSimilarity
+        self.minSuccess = minSuccess
+
+        # PAR runs, oldest first: dictionaries with 'guided',
+        # 'similarity', 'seconds' and 'success'.
+        self.runs = []
+        if (os.path.exists(historyFile)):
+            try:
+                handle = open(historyFile, 'rb')
+                self.runs = pickle.load(handle)
+                handle.close()
+            except Exception:
+                print "Guide policy: ignoring unreadable history " + historyFile
+
+    ##
+    ## decide --
+    ##   (use the guide, reason) for a guide of the given similarity.
+    ##
+    def decide(self, similarity):
+        if (self.mode == 'off'):
+            return (False, 'guided PAR is off')
+        if (similarity <= 0.0):
+            return (False, 'no cached guide')
+        if (self.mode == 'always'):
+            return (True, 'guided PAR is always used')
+        if (similarity < self.minSimilarity):
+            return (False, 'best guide only %.0f%% alike' % (100 * similarity))
+
+        guided = [run for run in self.runs if run['guided']]
+        if (len(guided) >= POLICY_MIN_RUNS):
+            successRate = float(len([run for run in guided if run['success']])) / len(guided)
+            if (successRate < self.minSuccess):
+                return (False, 'guided PAR succeeded in only %.0f%% of runs' % (100 * successRate))
+
+        guidedTimes = [run['seconds'] for run in guided if run['success'] and run['similarity'] >= self.minSimilarity]
+        plainTimes = [run['seconds'] for run in self.runs if (not run['guided']) and run['success']]
+        if (len(guidedTimes) >= POLICY_MIN_RUNS and len(plainTimes) >= POLICY_MIN_RUNS):
+            guidedMean = sum(guidedTimes) / float(len(guidedTimes))
+            plainMean = sum(plainTimes) / float(len(plainTimes))
+            if (guidedMean >= plainMean):
+                return (False, 'guided PAR averaged %d s against %d s unguided' % (guidedMean, plainMean))
+            return (True, 'guided PAR averaged %d s against %d s unguided' % (guidedMean, plainMean))
+
+        return (True, 'guide %.0f%% alike, too few runs to compare' % (100 * similarity))
+
+    def record(self, guided, similarity, seconds, success):
+        self.runs.append({'guided': guided, 'similarity': similarity,
+                          'seconds': seconds, 'success': success})
+        del self.runs[:-POLICY_HISTORY]
+
+        tmpFile = self.historyFile + '.' + str(os.getpid())
+        handle = open(tmpFile, 'wb')
+        pickle.dump(self.runs, handle, protocol=-1)
+        handle.close()
+        os.rename(tmpFile, self.historyFile)
+
+
+##
+## timingScore --
+##   Timing score of a PAR report; lower is better.  None if the report
+##   has none.
+##
+def timingScore(parReport):
+    if (not os.path.exists(parReport)):
+        return None
+    score = None
+    for line in open(parReport, 'r'):
+        match = _timingScore.search(line)
+        if (match):
+            score = int(match.group(1))
+    return score
+
+##
+## runPAR --
+##   Run PAR once per cost table in costTables (once with the default
+##   table if empty), in parallel, and leave the best result at output.
+##   Returns 0 on success.
+##
+def runPAR(parOptions, costTables, mapNCD, output, pcf, environment):
+    base = output[:-len('.ncd')]
+    if (len(costTables) <= 1):
+        table = ''
+        if (len(costTables) == 1):
+            table = ' -t ' + str(costTables[0])
+        command = 'par ' + parOptions + table + ' ' + mapNCD + ' ' + output + ' ' + pcf
+        print command
+        return subprocess.call(command, shell=True, env=environment)
+
+    variants = []
+    for table in costTables:
+        variant = base + '_t' + str(table)
+        command = 'par ' + parOptions + ' -t ' + str(table) + ' ' + mapNCD + ' ' + variant + '.ncd ' + pcf + \
+                  ' > ' + variant + '.log 2>&1'
+        print command
+        variants.append((table, variant, subprocess.Popen(command, shell=True, env=environment)))
+
+    results = []
+    for (table, variant, process) in variants:
+        if (process.wait() == 0):
+            score = timingScore(variant + '.par')
+            print "PAR cost table " + str(table) + ": timing score " + str(score)
+            results.append((score is None, score, table, variant))
+        else:
+            print "PAR cost table " + str(table) + " failed, see " + variant + '.log'
+
+    if (len(results) == 0):
+        return 1
+
+    (noScore, score, table, variant) = min(results)
+    print "PAR: using cost table " + str(table)
+    for suffix in PAR_OUTPUTS:
+        if (os.path.exists(variant + suffix)):
+            shutil.copyfile(variant + suffix, base + suffix)
+    return 0
+
+
+##
+## guideMode --
+##   The build's ISE_GUIDE_POLICY.  The older USE_SMARTGUIDE switch
+##   forces guides on.
+##
+def guideMode(moduleList):
+    if (moduleList.env['ENV'].has_key('USE_SMARTGUIDE')):
+        return 'always'
+    return moduleList.getAWBParam('xilinx_par', 'ISE_GUIDE_POLICY')
+
+
+_guideCache = None
+
+##
+## getGuideCache --
+##   The build's GuideCache.
+##
+def getGuideCache(moduleList):
+    global _guideCache
+
+    if (_guideCache is None):
+        _guideCache = GuideCache(moduleList.smartguide_cache_dir + '/guides',
+                                 moduleList.getAWBParam('xilinx_par', 'ISE_GUIDE_CACHE_ENTRIES'),
+                                 model.getBuildPipelineDebug(moduleList))
+    return _guideCache
+
+
+_guidePolicy = None
+
+##
+## getGuidePolicy --
+##   The build's GuidePolicy.
+##
+def getGuidePolicy(moduleList):
+    global _guidePolicy
+
+    if (_guidePolicy is None):
+        _guidePolicy = GuidePolicy(moduleList.smartguide_cache_dir + '/' + moduleList.apmName + '_guide_policy.pickle',
+                                   guideMode(moduleList),
+                                   moduleList.getAWBParam('xilinx_par', 'ISE_GUIDE_MIN_SIMILARITY') / 100.0,
+                                   moduleList.getAWBParam('xilinx_par', 'ISE_GUIDE_MIN_SUCCESS') / 100.0)
+    return _guidePolicy
+
+##
+## parClosure --
+##   SCons action placing and routing mapNCD into target[0], choosing
+##   the guide, if any, when it runs.
+##
+##   SCons signs the action by the values it closes over, so it holds
+##   only strings and numbers and finds the guide cache and policy when
+##   it runs.
+##
+def parClosure(moduleList, parOptions, mapNCD, pcf, netlists):
+    part = moduleList.env['DEFS']['FPGA_PART_XILINX']
+    mode = guideMode(moduleList)
+    memoize = bool(moduleList.getAWBParam('xilinx_par', 'MEMOIZE_NCD') or (mode != 'off'))
+    costTables = model.Utils.clean_split(str(moduleList.getAWBParam('xilinx_par', 'PAR_COST_TABLES')), sep = ' ')
+    netlists = [str(netlist) for netlist in netlists]
+
+    getGuideCache(moduleList)
+    getGuidePolicy(moduleList)
+
+    def ise_par(target, source, env):
+        output = str(target[0])
+        environment = dict([(k, str(v)) for (k, v) in env['ENV'].items()])
+
+        fingerprint = netlistFingerprint(netlists)
+        (score, guide) = _guideCache.best(fingerprint, part)
+        (guided, reason) = _guidePolicy.decide(score)
+        print "PAR guide: " + (guide if guided else 'none') + ' (' + reason + ')'
+
+        options = parOptions
+        if (guided):
+            options += ' -smartguide ' + guide
+
+        start = time.time()
+        status = runPAR(options, costTables, mapNCD, output, pcf, environment)
+        if (mode != 'off'):
+            _guidePolicy.record(guided, score, int(time.time() - start), status == 0)
+
+        if (status != 0 and guided):
+            print "Guided PAR failed, retrying without the guide."
+            start = time.time()
+            status = runPAR(parOptions, costTables, mapNCD, output, pcf, environment)
+            _guidePolicy.record(False, score, int(time.time() - start), status == 0)
+
+        if (status == 0 and memoize):
+            _guideCache.store(output, fingerprint, part)
+        return status
+
+    return SCons.Action.Action(ise_par, 'par ' + parOptions + ' ' + mapNCD + ' $TARGET ' + pcf)
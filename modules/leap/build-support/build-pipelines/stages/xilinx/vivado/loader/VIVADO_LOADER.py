@@ -4,6 +4,12 @@ import SCons.Script
 from SCons.Errors import BuildError
 import model 
 import synthesis_library
+import wrapper_gen_tool
+
+try:
+    import area_group_tool
+except ImportError:
+    pass # we won't be using this tool.
 
 #this might be better implemented as a 'Node' in scons, but 
 #I want to get something working before exploring that path
@@ -89,6 +95,8 @@ class LOADER():
       [],
       leap_xilinx_loader(xilinx_apm_name))
 
+    timingDatabase = self.timingDatabase(moduleList, xilinx_apm_name)
+
     dependOnSW = moduleList.getAWBParam(['xilinx_loader'], 'DEPEND_ON_SW')
     summary = 0
     if(dependOnSW):   
@@ -112,6 +120,43 @@ class LOADER():
 
 
     moduleList.env.Depends(summary, loader)
+    moduleList.env.Depends(summary, timingDatabase)
 
     moduleList.topModule.moduleDependency['LOADER'] = [summary]
     moduleList.topDependency = moduleList.topDependency + [summary]     
+
+  ##
+  ## timingDatabase --
+  ##   Record the final and per area group timing reports in the build's
+  ##   timing database whenever the final report changes.
+  ##
+  def timingDatabase(self, moduleList, xilinx_apm_name):
+    moduleReports = {}
+    for module in moduleList.synthBoundaries():
+      physicalDirectory = moduleList.compileDirectory + '/' + module.name + '_physical/'
+      moduleReports[module.name] = [physicalDirectory + module.name + '.route.twr',
+                                    physicalDirectory + module.name + '.place.twr']
+
+    areaConstraintsFile = None
+    if (moduleList.getAWBParamSafe('area_group_tool', 'AREA_GROUPS_ENABLE')):
+      areaConstraintsFile = area_group_tool.AreaConstraints(moduleList).areaConstraintsFile()
+
+    def endpointMapper():
+      boundaryPaths = {}
+      if (not areaConstraintsFile is None):
+        boundaryPaths = area_group_tool.areaGroupSourcePaths(areaConstraintsFile)
+
+      channels = []
+      firstPassLIGraph = wrapper_gen_tool.getFirstPassLIGraph()
+      if (not firstPassLIGraph is None):
+        channels = [(channel.name, channel.module_name) for channel in firstPassLIGraph.getChannels()]
+
+      return synthesis_library.EndpointMapper(boundaryPaths, channels)
+
+    return moduleList.env.Command(
+      xilinx_apm_name + '.timing.summary',
+      xilinx_apm_name + '.par.twr',
+      synthesis_library.timingDatabaseClosure(moduleList,
+                                              moduleList.apmName,
+                                              moduleReports,
+                                              endpointMapper))
@@ -88,7 +88,7 @@ class PostSynthesize():
 
         moduleList.env.Command( 
             [self.area_group_file],
-            self.area_constraints.areaConstraintsFile(),
+            self.area_constraints.areaGroupDependencies(),
             area_group_ucf_closure(moduleList)
             )                             
 
@@ -329,6 +329,12 @@ class PostSynthesize():
     newTclFile.write(dumpPBlockCmd('par'))
     newTclFile.write("report_timing_summary -file " + apm_name + ".par.twr\n\n")
 
+    # Timing between area groups, for channel buffering in the next build.
+    if ('AREA_GROUPS' in moduleList.topModule.moduleDependency):
+        channelTimingFile = self.area_constraints.channelTimingFile()
+        if (channelTimingFile is not None):
+            newTclFile.write('dumpPBlockTiming "' + channelTimingFile + '" ' + str(self.area_constraints.channelTimingSlack()) + '\n\n')
+
     newTclFile.write("report_utilization -hierarchical -file " + apm_name + ".par.util\n")
     newTclFile.write("report_drc -file " + topWrapper + ".drc\n\n")
  
@@ -338,7 +344,7 @@ class PostSynthesize():
 
     # generate bitfile
     xilinx_bit = moduleList.env.Command(
-      apm_name + '_par.bit',
+      [apm_name + '_par.bit', apm_name + '.par.twr'],
       synthDeps + self.tcl_algs + self.tcl_defs + self.tcl_funcs + self.tcl_ag + [self.paramTclFile] + dcps + [postSynthTcl], 
       ['touch start.txt; vivado -verbose -mode batch -source ' + postSynthTcl + ' -log ' + moduleList.compileDirectory + '/postsynth.log'])
 
@@ -363,11 +369,17 @@ class PostSynthesize():
       gen_netlists = module.getDependencies('GEN_NGCS')
       given_netlists = [ moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + netlist for netlist in moduleList.getAllDependenciesWithPaths('GIVEN_NGCS') + moduleList.getAllDependenciesWithPaths('GIVEN_EDFS') ]
 
+      # Only platform/user-defined area groups read their constraints
+      # here, so other modules' checkpoints are independent of placement.
+      isBlackBoxAreaGroup = (not self.firstPassLIGraph is None) and (module.name in self.firstPassLIGraph.modules) and \
+                            (not self.firstPassLIGraph.modules[module.name].getAttribute('BLACK_BOX_AREA_GROUP') is None)
+
       constraintsFile = []
       area_constraints = None
       if(moduleList.getAWBParamSafe('area_group_tool', 'AREA_GROUPS_ENABLE')):
           area_constraints = area_group_tool.AreaConstraints(moduleList)
-          constraintsFile = [area_constraints.areaConstraintsFile()]
+          if(isBlackBoxAreaGroup):
+              constraintsFile = area_constraints.areaGroupDependencies([module.name])
  
       def edf_to_dcp_tcl_closure(moduleList):
 
@@ -381,10 +393,9 @@ class PostSynthesize():
                refName = module.wrapperName()
 
                # If this is an platform/user-defined area group, the wrapper name may be different.
-               if((not self.firstPassLIGraph is None) and (module.name in self.firstPassLIGraph.modules)):
-                   if (not self.firstPassLIGraph.modules[module.name].getAttribute('BLACK_BOX_AREA_GROUP') is None):
-                       area_constraints.loadAreaConstraints()
-                       refName =  area_constraints.constraints[module.name].attributes['MODULE_NAME']           
+               if(isBlackBoxAreaGroup):
+                   area_constraints.loadAreaConstraints()
+                   refName =  area_constraints.constraints[module.name].attributes['MODULE_NAME']           
                
                if(module.getAttribute('TOP_MODULE') is None):
                    edfTclFile.write("link_design -mode out_of_context -top " +  refName + " -part " + self.part  + "\n")
@@ -410,7 +421,9 @@ class PostSynthesize():
       return moduleList.env.Command(
           [dcp],
           [gen_netlists] + [given_netlists] + [edfTcl], 
-          ['cd ' + edfCompileDirectory + '; touch start.txt; vivado -mode batch -source ' +  module.name + ".synth.tcl" + ' -log ' + module.name + '.synth.checkpoint.log'])
+          synthesis_library.cachedActions(moduleList, 'vivado',
+              [synthesis_library.tclAction(moduleList, edfCompileDirectory, module.name + ".synth.tcl", module.name + '.synth.checkpoint.log',
+                  'cd ' + edfCompileDirectory + '; touch start.txt; vivado -mode batch -source ' +  module.name + ".synth.tcl" + ' -log ' + module.name + '.synth.checkpoint.log')]))
 
 
   def place_dcp(self, moduleList, module):
@@ -431,8 +444,6 @@ class PostSynthesize():
 
            def place_dcp_tcl(target, source, env):
 
-               # TODO: Eventually, we'll need to examine the contstraints to decide if we need to rebuild.
-
                area_constraints.loadAreaConstraints()
 
                edfTclFile = open(edfTcl,'w')
@@ -450,7 +461,7 @@ class PostSynthesize():
                    refName =  area_constraints.constraints[module.name].attributes['MODULE_NAME']           
 
                if((self.firstPassLIGraph.modules[module.name].getAttribute('BLACK_BOX_AREA_GROUP') is None) or moduleList.getAWBParamSafe('area_group_tool', 'AREA_GROUPS_PAR_DEVICE_AG')):               
-                   if(not area_constraints.emitModuleConstraintsVivado(constraintsTclFile, module.name, useSourcePath=False) is None):
+                   if(not area_constraints.emitModuleConstraintsVivado(constraintsTclFile, module.name, useSourcePath=False, annotateArea=False) is None):
                        # for platform modules, we need to insert the tcl environment.  
 
                        constraintsTclFile.write('set IS_TOP_BUILD 0\n')
@@ -511,9 +522,15 @@ class PostSynthesize():
  
            return place_dcp_tcl
  
+      # Only this module's area group affects its placement.  The
+      # scripts are regenerated whenever the group's fragment changes,
+      # but the checkpoint below is rebuilt only if their text or the
+      # synthesized checkpoint changed.  Settings baked into the text
+      # are sources too, so that changing them regenerates it.
       moduleList.env.Command(
           [edfTcl, constraintsTcl],
-          [area_constraints.areaConstraintsFile()],
+          area_constraints.areaGroupDependencies([module.name]) +
+          [moduleList.env.Value(repr([self.routeAG, self.part] + map(str, [self.paramTclFile] + self.tcl_headers + self.tcl_defs + self.tcl_funcs + self.tcl_algs)))],
           place_dcp_tcl_closure(moduleList)
           )
 
@@ -521,8 +538,10 @@ class PostSynthesize():
       # generate checkpoint
       return moduleList.env.Command(
           [dcp],
-          [checkpoint] + [edfTcl, constraintsTcl]  +  self.tcl_headers + self.tcl_algs + self.tcl_defs + self.tcl_funcs, 
-          ['cd ' + placeCompileDirectory + '; touch start.txt; vivado -mode batch -source ' + module.name + ".place.tcl" + ' -log ' + module.name + '.place.log'])
+          [checkpoint] + [edfTcl, constraintsTcl, self.paramTclFile]  +  self.tcl_headers + self.tcl_algs + self.tcl_defs + self.tcl_funcs, 
+          synthesis_library.cachedActions(moduleList, 'vivado',
+              [synthesis_library.tclAction(moduleList, placeCompileDirectory, module.name + ".place.tcl", module.name + '.place.log',
+                  'cd ' + placeCompileDirectory + '; touch start.txt; vivado -mode batch -source ' + module.name + ".place.tcl" + ' -log ' + module.name + '.place.log')]))
 
 
   def ag_constraints(self, moduleList, module):
@@ -538,8 +557,6 @@ class PostSynthesize():
 
            def ag_tcl(target, source, env):
 
-               # TODO: Eventually, we'll need to examine the contstraints to decide if we need to rebuild.
-
                area_constraints.loadAreaConstraints()
                # give our area constraint is a MODULE_NAME, if it doesn't have one. 
                if(not 'MODULE_NAME' in area_constraints.constraints[module.name].attributes):
@@ -554,7 +571,7 @@ class PostSynthesize():
  
       moduleList.env.Command(
           [agTcl],
-          [area_constraints.areaConstraintsFile()],
+          area_constraints.areaGroupDependencies([module.name]),
           ag_tcl_closure(moduleList)
           )
      
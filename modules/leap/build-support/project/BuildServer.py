@@ -0,0 +1,499 @@
+############################################################################
+############################################################################
+##
+## LEAP build server.
+##
+## An optional, long-running process that serves SCons build requests for
+## one model build directory over a local socket.  The server pays the
+## start-up costs of a build once: Python start-up, importing SCons and the
+## build pipeline packages, and loading state that rarely changes (the first
+## pass LI graph and parsed Bluespec dependence).  Each request is run by a
+## child forked from the warm server, so every build starts with that state
+## already in memory.  SCons still reads the SConscript files and elaborates
+## the ModuleList in the child, since SCons keeps global state that can not
+## be reused across builds.
+##
+## Every request runs SCons, which decides what is up to date.  The server
+## watches only the files its resident state came from, using inotify: the
+## LI graph is reloaded when lim.li changes and changes to the build scripts
+## restart the server.  Parsed Bluespec dependence is checked against its
+## dependence file on every use, so needs no watching.
+##
+## Usage, from the model build directory:
+##
+##     python site_scons/model/BuildServer.py start
+##     python site_scons/model/BuildServer.py build [scons args]
+##     python site_scons/model/BuildServer.py status
+##     python site_scons/model/BuildServer.py stop
+##
+## "build" falls back to running scons directly when no server is running.
+## Makefile.top supports the server with "make SERVER=1".
+##
+## Only the standard library may be imported at the top of this file.  It
+## is run as a script before SCons is on the Python path.
+##
+############################################################################
+############################################################################
+
+import os
+import sys
+import time
+import errno
+import select
+import socket
+import signal
+import struct
+import ctypes
+import ctypes.util
+import subprocess
+import json
+
+
+BUILD_SERVER_SOCKET = '.leap-build-server'
+BUILD_SERVER_LOG = '.leap-build-server.log'
+
+# Last line of every reply, carrying the build's exit status.
+BUILD_SERVER_EXIT_TAG = '@@leap-build-server-exit'
+
+# Changes to these files in the build directory require a server restart.
+BUILD_SERVER_SCRIPTS = ['SConstruct', 'SConscript']
+
+
+##
+## InotifyWatcher --
+##     Minimal ctypes binding of the Linux inotify interface.  Directories
+##     are watched non-recursively.  pending() returns the full paths of
+##     files changed since the last call.
+##
+class InotifyWatcher():
+
+    IN_MODIFY      = 0x00000002
+    IN_ATTRIB      = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_NONBLOCK    = 0x00000800
+    IN_CLOEXEC     = 0x00080000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+                  IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if (self.fd < 0):
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        # Set when the kernel event queue overflowed and events were lost.
+        self.overflow = False
+
+    def fileno(self):
+        return self.fd
+
+    def watch(self, dirPath):
+        if (dirPath in self.watches.values()):
+            return
+        wd = self.libc.inotify_add_watch(self.fd, dirPath, self.WATCH_MASK)
+        if (wd >= 0):
+            self.watches[wd] = dirPath
+
+    def pending(self):
+        changed = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except OSError, e:
+                if (e.errno == errno.EAGAIN):
+                    break
+                raise
+
+            pos = 0
+            while (pos + 16 <= len(buf)):
+                (wd, mask, cookie, nameLen) = struct.unpack('iIII', buf[pos:pos + 16])
+                name = buf[pos + 16:pos + 16 + nameLen].rstrip('\0')
+                pos += 16 + nameLen
+
+                if (mask & self.IN_Q_OVERFLOW):
+                    self.overflow = True
+                elif (wd in self.watches):
+                    changed.add(os.path.join(self.watches[wd], name))
+
+        return changed
+
+
+##
+## PollingWatcher --
+##     Fallback for systems without inotify.  Compares modification times of
+##     the files in the watched directories each time pending() is called.
+##
+class PollingWatcher():
+
+    def __init__(self):
+        self.dirs = set()
+        self.stamps = {}
+        self.overflow = False
+
+    def fileno(self):
+        return None
+
+    def scan(self, dirPath):
+        stamps = {}
+        try:
+            for name in os.listdir(dirPath):
+                path = os.path.join(dirPath, name)
+                try:
+                    stamps[path] = os.stat(path).st_mtime
+                except OSError:
+                    pass
+        except OSError:
+            pass
+        return stamps
+
+    def watch(self, dirPath):
+        if (dirPath not in self.dirs):
+            self.dirs.add(dirPath)
+            self.stamps.update(self.scan(dirPath))
+
+    def pending(self):
+        stamps = {}
+        for dirPath in self.dirs:
+            stamps.update(self.scan(dirPath))
+
+        changed = set([p for p in stamps if (self.stamps.get(p) != stamps[p])])
+        changed.update([p for p in self.stamps if (p not in stamps)])
+        self.stamps = stamps
+        return changed
+
+
+##
+## findSConsEngine --
+##     Make the SCons engine importable, mirroring the search done by the
+##     scons launcher script.
+##
+def findSConsEngine():
+    try:
+        import SCons.Script
+        return
+    except ImportError:
+        pass
+
+    candidates = []
+    if ('SCONS_LIB_DIR' in os.environ):
+        candidates.append(os.environ['SCONS_LIB_DIR'])
+
+    for binDir in os.environ.get('PATH', '').split(':'):
+        launcher = os.path.join(binDir, 'scons')
+        if (os.path.exists(launcher)):
+            prefix = os.path.dirname(os.path.dirname(os.path.realpath(launcher)))
+            libDir = os.path.join(prefix, 'lib')
+            if (os.path.isdir(libDir)):
+                for d in sorted(os.listdir(libDir), reverse=True):
+                    if (d.startswith('scons')):
+                        candidates.append(os.path.join(libDir, d))
+                candidates.append(libDir)
+            break
+
+    for c in candidates:
+        if (os.path.isdir(os.path.join(c, 'SCons'))):
+            sys.path.insert(0, c)
+            return
+
+    print "Build server: failed to find the SCons engine.  Set SCONS_LIB_DIR."
+    sys.exit(1)
+
+
+##
+## LEAPBuildServer --
+##     The server itself.  Runs in the model build directory.
+##
+class LEAPBuildServer():
+
+    def __init__(self, buildDir):
+        self.buildDir = os.path.abspath(buildDir)
+        self.socketPath = os.path.join(self.buildDir, BUILD_SERVER_SOCKET)
+
+        try:
+            self.watcher = InotifyWatcher()
+        except (OSError, AttributeError):
+            self.watcher = PollingWatcher()
+
+        self.restartPending = False
+
+    ##
+    ## Resident state.  Loading happens in the server, so forked builds
+    ## inherit it.
+    ##
+    def loadPackages(self):
+        findSConsEngine()
+        import SCons.Script
+
+        siteDir = os.path.join(self.buildDir, 'site_scons')
+        if (siteDir not in sys.path):
+            sys.path.insert(0, siteDir)
+
+        for pkg in sorted(os.listdir(siteDir)):
+            if (os.path.isfile(os.path.join(siteDir, pkg, '__init__.py'))):
+                try:
+                    __import__(pkg)
+                except Exception, e:
+                    print "Build server: failed to preload " + pkg + ": " + str(e)
+
+    def loadLIGraph(self):
+        if ('wrapper_gen_tool.wrapper_gen' not in sys.modules):
+            return
+        wrapper_gen = sys.modules['wrapper_gen_tool.wrapper_gen']
+        wrapper_gen._cacheFirstPassLIGraph = None
+        if (wrapper_gen.getFirstPassLIGraph() is not None):
+            print "Build server: first pass LI graph loaded"
+
+    def loadDependence(self):
+        if ('bsv_tool' not in sys.modules):
+            return
+        bsv_tool = sys.modules['bsv_tool']
+
+        paths = []
+        for (dirPath, dirNames, fileNames) in os.walk(os.path.join(self.buildDir, 'hw')):
+            paths += [os.path.join(dirPath, f) for f in fileNames if (f.startswith('.depends-bsv'))]
+
+        # Builds look closures up by paths relative to the build directory.
+        for p in paths:
+            bsv_tool.getBluespecSourceClosure(os.path.relpath(p, self.buildDir))
+
+    ##
+    ## Watched files: the build scripts and the LI graph.
+    ##
+    def setupWatches(self):
+        self.watcher.watch(self.buildDir)
+        for (dirPath, dirNames, fileNames) in os.walk(os.path.join(self.buildDir, 'site_scons')):
+            self.watcher.watch(dirPath)
+
+    def processChanges(self):
+        changed = self.watcher.pending()
+        if (self.watcher.overflow):
+            # Events were lost.  Reload everything.
+            self.watcher.overflow = False
+            self.restartPending = True
+            return
+
+        for path in changed:
+            name = os.path.basename(path)
+            if (os.path.dirname(path) == self.buildDir):
+                if (name in BUILD_SERVER_SCRIPTS):
+                    self.restartPending = True
+                elif (name == 'lim.li'):
+                    self.loadLIGraph()
+            elif (name[-3:] == '.py'):
+                self.restartPending = True
+
+    ##
+    ## Requests
+    ##
+    def reply(self, conn, msg, status):
+        try:
+            if (msg != ''):
+                msg += '\n'
+            conn.sendall(msg + BUILD_SERVER_EXIT_TAG + ' ' + str(status) + '\n')
+        except socket.error:
+            pass
+
+    def build(self, conn, args):
+        # Output buffered before the fork belongs in the server log, not
+        # the child's reply.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if (pid == 0):
+            ## Child: run SCons with the warm interpreter
+            status = 2
+            try:
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                os.dup2(conn.fileno(), 1)
+                os.dup2(conn.fileno(), 2)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+                import SCons.Script
+                sys.argv = ['scons'] + args
+                try:
+                    SCons.Script.main()
+                    status = 0
+                except SystemExit, e:
+                    status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+
+        ## Parent: keep tracking changes while the build runs.
+        while True:
+            (done, rawStatus) = os.waitpid(pid, os.WNOHANG)
+            if (done != 0):
+                break
+            self.waitForEvents([], 0.2)
+
+        status = os.WEXITSTATUS(rawStatus) if os.WIFEXITED(rawStatus) else 1
+        self.reply(conn, '', status)
+
+    def handle(self, conn):
+        f = conn.makefile('rb')
+        try:
+            request = json.loads(f.readline())
+        except ValueError:
+            self.reply(conn, 'Build server: malformed request', 1)
+            return
+        finally:
+            f.close()
+
+        cmd = request.get('cmd')
+        if (cmd == 'build'):
+            self.processChanges()
+            self.build(conn, [str(a) for a in request.get('args', [])])
+        elif (cmd == 'status'):
+            self.reply(conn, 'Build server ' + str(os.getpid()) + ' serving ' + self.buildDir, 0)
+        elif (cmd == 'stop'):
+            self.reply(conn, 'Build server stopping', 0)
+            raise KeyboardInterrupt
+        else:
+            self.reply(conn, 'Build server: unknown request ' + str(cmd), 1)
+
+    def waitForEvents(self, extra, timeout):
+        fds = list(extra)
+        if (self.watcher.fileno() is not None):
+            fds.append(self.watcher.fileno())
+        try:
+            (ready, w, x) = select.select(fds, [], [], timeout)
+        except select.error:
+            return []
+        self.processChanges()
+        return ready
+
+    def serve(self):
+        os.chdir(self.buildDir)
+
+        if (os.path.exists(self.socketPath)):
+            os.unlink(self.socketPath)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socketPath)
+        listener.listen(4)
+
+        self.loadPackages()
+        self.loadLIGraph()
+        self.loadDependence()
+        self.setupWatches()
+        self.watcher.pending()
+        print "Build server " + str(os.getpid()) + " ready in " + self.buildDir
+        sys.stdout.flush()
+
+        try:
+            while True:
+                ready = self.waitForEvents([listener], 1.0)
+                if (listener in ready):
+                    (conn, addr) = listener.accept()
+                    try:
+                        self.handle(conn)
+                    finally:
+                        conn.close()
+
+                if (self.restartPending):
+                    print "Build scripts changed.  Restarting build server."
+                    sys.stdout.flush()
+                    listener.close()
+                    os.unlink(self.socketPath)
+                    os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), 'serve'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            if (os.path.exists(self.socketPath)):
+                os.unlink(self.socketPath)
+
+
+##
+## buildServerRequest --
+##     Send a request to the server in the current directory, echoing the
+##     reply.  Returns the exit status or None if no server is running.
+##
+def buildServerRequest(request):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(BUILD_SERVER_SOCKET)
+    except socket.error:
+        return None
+
+    conn.sendall(json.dumps(request) + '\n')
+    conn.shutdown(socket.SHUT_WR)
+
+    status = 1
+    pending = ''
+    while True:
+        data = conn.recv(65536)
+        if (not data):
+            break
+        pending += data
+        # Hold back the last partial line, which may be the exit tag.
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for ln in lines:
+            # The tag may follow build output lacking a final newline.
+            tag = ln.find(BUILD_SERVER_EXIT_TAG)
+            if (tag >= 0):
+                if (tag > 0):
+                    sys.stdout.write(ln[:tag] + '\n')
+                status = int(ln[tag:].split()[1])
+            else:
+                sys.stdout.write(ln + '\n')
+        sys.stdout.flush()
+
+    if (pending != ''):
+        sys.stdout.write(pending)
+    conn.close()
+    return status
+
+
+def buildServerMain(argv):
+    if (len(argv) < 1):
+        print "Usage: BuildServer.py start | serve | stop | status | build [scons args]"
+        return 1
+
+    cmd = argv[0]
+    if (cmd == 'serve'):
+        LEAPBuildServer(os.getcwd()).serve()
+        return 0
+
+    if (cmd == 'start'):
+        if (buildServerRequest({'cmd': 'status'}) is not None):
+            return 0
+        log = open(BUILD_SERVER_LOG, 'a')
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'],
+                         stdin=open(os.devnull), stdout=log, stderr=subprocess.STDOUT,
+                         preexec_fn=os.setsid)
+        # Wait for the socket to appear
+        for i in range(600):
+            if (os.path.exists(BUILD_SERVER_SOCKET)):
+                print "Build server started.  Log: " + BUILD_SERVER_LOG
+                return 0
+            time.sleep(0.1)
+        print "Build server failed to start.  See " + BUILD_SERVER_LOG
+        return 1
+
+    if (cmd == 'build'):
+        args = argv[1:]
+        status = buildServerRequest({'cmd': 'build', 'args': args})
+        if (status is None):
+            # No server.  Build the usual way.
+            status = subprocess.call(['scons'] + args)
+        return status
+
+    status = buildServerRequest({'cmd': cmd})
+    if (status is None):
+        print "No build server running in " + os.getcwd()
+        return (0 if (cmd == 'stop') else 1)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(buildServerMain(sys.argv[1:]))
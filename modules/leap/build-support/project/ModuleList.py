@@ -257,16 +257,25 @@ class ModuleList:
   def getAllDependencies(self, key):
       # we must check to see if the dependencies actually exist.
       # generally we have to make sure to remove duplicates
+      # Membership is tracked in a set, since some keys (e.g. VERILOG_LIB)
+      # have hundreds of entries.
       allDeps = [] 
-      if (self.topModule.moduleDependency.has_key(key)):
-          for dep in self.topModule.moduleDependency[key]:
-              if (allDeps.count(dep) == 0):
-                  allDeps.extend(dep if isinstance(dep, list) else [dep])
-      for module in self.moduleList:
+      seen = set()
+      for module in [self.topModule] + self.moduleList:
           if (module.moduleDependency.has_key(key)):
-              for dep in module.moduleDependency[key]: 
-                  if (allDeps.count(dep) == 0):
-                      allDeps.extend(dep if isinstance(dep, list) else [dep])
+              for dep in module.moduleDependency[key]:
+                  if (isinstance(dep, list)):
+                      allDeps.extend(dep)
+                      seen.update(dep)
+                  else:
+                      try:
+                          if (dep not in seen):
+                              allDeps.append(dep)
+                              seen.add(dep)
+                      except TypeError:
+                          # Unhashable, e.g. an SCons node list
+                          if (allDeps.count(dep) == 0):
+                              allDeps.append(dep)
 
       if (len(allDeps) == 0 and CommandLine.getBuildPipelineDebug(self) > 1):
           sys.stderr.write("Warning: no dependencies were found")
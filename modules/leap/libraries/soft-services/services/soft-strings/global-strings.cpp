@@ -31,6 +31,7 @@
 
 #include <stdio.h>
 #include <string.h>
+#include <sys/stat.h>
 
 #include "asim/syntax.h"
 #include "asim/mesg.h"
@@ -189,6 +190,19 @@ GLOBAL_STRINGS::AddString(GLOBAL_STRING_UID uid, const string& str)
 void
 GLOBAL_STRINGS::ProcessSwitchString(const char *db)
 {
+    //
+    // The build writes a binary index next to the text database.  Prefer
+    // it when it is at least as new as the text.
+    //
+    string idx = string(db) + ".idx";
+    struct stat dbStat, idxStat;
+    if ((stat(idx.c_str(), &idxStat) == 0) &&
+        ((stat(db, &dbStat) != 0) || (idxStat.st_mtime >= dbStat.st_mtime)) &&
+        LoadIndex(idx.c_str()))
+    {
+        return;
+    }
+
     FILE *f;
 
     f = fopen(db, "r");
@@ -232,6 +246,69 @@ GLOBAL_STRINGS::ProcessSwitchString(const char *db)
 }
 
 
+//
+// Read in the binary index form of the global string database.  The format,
+// written by the Bluespec build stage, is:
+//
+//   "GSTRIDX1" <count:u32> { <uid:u32> <offset:u32> <length:u32> }* <blob>
+//
+// All values are little endian.  Returns false if the file is not a valid
+// index, in which case the caller falls back to the text database.
+//
+bool
+GLOBAL_STRINGS::LoadIndex(const char *idx)
+{
+    FILE *f = fopen(idx, "rb");
+    if (f == NULL)
+    {
+        return false;
+    }
+
+    fseek(f, 0, SEEK_END);
+    long size = ftell(f);
+    fseek(f, 0, SEEK_SET);
+
+    vector<unsigned char> buf(size > 0 ? size : 0);
+    bool ok = (size >= 12) && (fread(&buf[0], 1, size, f) == (size_t)size);
+    fclose(f);
+
+    if (! ok || (memcmp(&buf[0], "GSTRIDX1", 8) != 0))
+    {
+        return false;
+    }
+
+    // Little endian decode, independent of host byte order
+    #define GSTR_U32(p) (UINT32((p)[0]) | (UINT32((p)[1]) << 8) | \
+                         (UINT32((p)[2]) << 16) | (UINT32((p)[3]) << 24))
+
+    UINT64 count = GSTR_U32(&buf[8]);
+    UINT64 blobStart = 12 + count * 12;
+    if (blobStart > UINT64(size))
+    {
+        return false;
+    }
+
+    uidToString.reserve(uidToString.size() + count);
+    stringToUID.reserve(stringToUID.size() + count);
+
+    for (UINT64 i = 0; i < count; i++)
+    {
+        const unsigned char *e = &buf[12 + i * 12];
+        GLOBAL_STRING_UID uid = GSTR_U32(e);
+        UINT64 offset = blobStart + GSTR_U32(e + 4);
+        UINT64 length = GSTR_U32(e + 8);
+        VERIFY(offset + length <= UINT64(size),
+               "Corrupt global string index " << idx);
+
+        AddString(uid, string((const char *)&buf[offset], length));
+    }
+
+    #undef GSTR_U32
+
+    return true;
+}
+
+
 GLOBAL_STRINGS::GLOBAL_STRINGS() :
     COMMAND_SWITCH_STRING_CLASS("global-strings")
 {
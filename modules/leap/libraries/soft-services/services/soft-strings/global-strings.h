@@ -34,6 +34,7 @@
 
 #include <string>
 #include <unordered_map>
+#include <vector>
 
 #include "asim/syntax.h"
 #include "awb/provides/command_switches.h"
@@ -72,6 +73,9 @@ class GLOBAL_STRINGS : public COMMAND_SWITCH_STRING_CLASS
 
     static void AddString(GLOBAL_STRING_UID uid, const string& str);
 
+    // Load the binary index form of a string database
+    static bool LoadIndex(const char *idx);
+
     static GLOBAL_STRING_UID nextAllocId;
 
   public: